@@ -0,0 +1,79 @@
+"""
+Benchmark: IVF approximate index recall and latency vs exact search.
+
+Sweeps nlist/nprobe and reports recall@k against SimilarityEngine so
+DETECT_IVF_NLIST / DETECT_IVF_NPROBE can be picked per deployment.
+
+Run from backend/WEB3:
+    python -m benchmarks.ann_recall --suspects 100000 --nlist 256 1024 --nprobe 4 8 16 32
+    python -m benchmarks.ann_recall --from-store services/detect/data/embeddings --model text-embedding-004
+"""
+import argparse
+import time
+import numpy as np
+
+from services.detect.engine import SimilarityEngine
+from services.detect.ann import IVFIndex
+from services.detect.store import EmbeddingStore
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int = 500, seed: int = 0):
+    """Clustered vectors (topics + noise), closer to real embeddings than pure noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def recall_at_k(approx, exact):
+    hits = sum(len({i for i, _ in a} & {i for i, _ in e}) for a, e in zip(approx, exact))
+    return hits / max(1, sum(len(e) for e in exact))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suspects", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, nargs="+", default=[256, 1024])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--from-store", help="embedding store root to benchmark on real vectors")
+    parser.add_argument("--model", default="text-embedding-004")
+    args = parser.parse_args()
+
+    if args.from_store:
+        corpus = EmbeddingStore(args.from_store, args.model).all_vectors()
+    else:
+        corpus = synthetic_corpus(args.suspects, args.dim)
+
+    # Queries are perturbed corpus members, like near-copies hitting /detect
+    rng = np.random.default_rng(1)
+    picks = rng.choice(corpus.shape[0], min(args.queries, corpus.shape[0]), replace=False)
+    queries = corpus[picks] + 0.3 * rng.standard_normal((len(picks), corpus.shape[1])).astype(np.float32)
+
+    exact_engine = SimilarityEngine(corpus)
+    t0 = time.perf_counter()
+    exact = [exact_engine.search(q, k=args.k) for q in queries]
+    exact_ms = (time.perf_counter() - t0) / len(queries) * 1000
+
+    print(f"corpus={corpus.shape[0]} dim={corpus.shape[1]} queries={len(queries)} k={args.k}")
+    print(f"exact: {exact_ms:8.3f} ms/query  recall=1.000")
+    print(f"{'nlist':>6} {'nprobe':>6} {'ms/query':>9} {'speedup':>8} {'recall':>7}")
+
+    for nlist in args.nlist:
+        index = IVFIndex(corpus.shape[1], nlist=nlist)
+        t0 = time.perf_counter()
+        index.add(corpus)
+        print(f"  (built nlist={index.nlist} in {time.perf_counter() - t0:.1f}s)")
+        for nprobe in args.nprobe:
+            if nprobe > index.nlist:
+                continue
+            t0 = time.perf_counter()
+            approx = [index.search(q, k=args.k, nprobe=nprobe) for q in queries]
+            ms = (time.perf_counter() - t0) / len(queries) * 1000
+            print(f"{index.nlist:>6} {nprobe:>6} {ms:>9.3f} {exact_ms / ms:>7.1f}x {recall_at_k(approx, exact):>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Benchmark + accuracy suite: end-to-end run_detection on synthetic corpora.
+
+For every corpus size a fresh process builds a synthetic suspect corpus with
+planted near-copies and paraphrases of a set of registered texts, ingests it
+through the offline hashing embedding backend and runs detection for every
+registered text. Reported per size: build time, p50/p99 latency, throughput
+(single and batch), peak RSS, and precision/recall of the infringement flag
+(similarity > 0.85) against the planted pairs.
+
+Results are written as JSON (one file per run) so runs can be compared over time.
+DETECT_* / LOCAL_EMBEDDING_* environment variables are passed through, e.g.
+DETECT_INDEX=ivf or DETECT_VECTOR_MODE=int8.
+
+Run from backend/WEB3:
+    python -m benchmarks.detection_suite --sizes 1000 10000 100000
+    python -m benchmarks.detection_suite --sizes 1000000 --queries 100 --output results/1m.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = Path(__file__).resolve().parent.parent  # backend/WEB3
+INGEST_CHUNK = 50000
+
+
+# ----------------------------
+# Synthetic corpus
+# ----------------------------
+def make_vocabulary(size: int, rng) -> np.ndarray:
+    syllables = np.array(["ka", "ri", "mo", "te", "lu", "sa", "ne", "po", "di", "ga", "hu", "zo", "ve", "ba", "chi"])
+    lengths = rng.integers(2, 5, size)
+    return np.array(["".join(rng.choice(syllables, n)) + str(i) for i, n in enumerate(lengths)])
+
+
+def make_texts(n: int, words: int, vocab: np.ndarray, rng) -> list:
+    """Zipf-like word draws, so common words are shared across documents like real text."""
+    p = 1.0 / (np.arange(len(vocab)) + 10.0)
+    idx = rng.choice(len(vocab), size=(n, words), p=p / p.sum())
+    return [" ".join(vocab[row]) for row in idx]
+
+
+def near_copy(text: str, rng, edit_rate: float = 0.03) -> str:
+    """Light edits: a few words dropped or duplicated, different casing/spacing."""
+    out = []
+    for word in text.split():
+        r = rng.random()
+        if r < edit_rate / 2:
+            continue
+        out.append(word)
+        if r > 1 - edit_rate / 2:
+            out.append(word)
+    return "  ".join(out).upper() if rng.random() < 0.5 else " ".join(out)
+
+
+def paraphrase(text: str, synonyms: dict, rng, swap_rate: float = 0.2) -> str:
+    """Synonym swaps plus sentence (12-word chunk) reordering."""
+    words = [synonyms.get(w, w) if rng.random() < swap_rate else w for w in text.split()]
+    chunks = [words[i:i + 12] for i in range(0, len(words), 12)]
+    order = rng.permutation(len(chunks))
+    return " ".join(w for i in order for w in chunks[i])
+
+
+def build_corpus(size: int, queries: int, words: int, seed: int):
+    """Return (suspects, registered_texts, truth) where truth maps query -> {url: kind}."""
+    rng = np.random.default_rng(seed)
+    vocab = make_vocabulary(20000, rng)
+    synonyms = dict(zip(vocab, rng.permutation(vocab)))
+    registered = make_texts(queries, words, vocab, rng)
+
+    planted, truth = [], {q: {} for q in range(queries)}
+    for q in range(0, queries, 2):  # every other registered text has copies in the corpus
+        for kind, text in (("near_copy", near_copy(registered[q], rng)),
+                           ("paraphrase", paraphrase(registered[q], synonyms, rng))):
+            url = f"https://planted.example/{q}/{kind}"
+            planted.append({"url": url, "text": text, "tags": ["planted"]})
+            truth[q][url] = kind
+
+    background = make_texts(max(0, size - len(planted)), words, vocab, rng)
+    suspects = [
+        {"url": f"https://corpus{i % 97}.example/{i}", "text": t, "tags": ["background"]}
+        for i, t in enumerate(background)
+    ]
+    for record, pos in zip(planted, rng.integers(0, len(suspects) + 1, len(planted))):
+        suspects.insert(int(pos), record)
+    return suspects, registered, truth
+
+
+# ----------------------------
+# Measurements
+# ----------------------------
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(samples, pct: float) -> float:
+    return round(float(np.percentile(samples, pct)), 3) if samples else 0.0
+
+
+def run_size(args) -> dict:
+    """Runs in its own process (fresh data dir, clean peak RSS)."""
+    from services.detect import detect
+
+    t0 = time.perf_counter()
+    suspects, registered, truth = build_corpus(args.size, args.queries, args.words, args.seed)
+    generate_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for start in range(0, len(suspects), INGEST_CHUNK):
+        detect.ingest_suspects(suspects[start:start + INGEST_CHUNK])
+    detect.load_corpus()
+    build_s = time.perf_counter() - t0
+
+    latencies, flagged = [], {}
+    t0 = time.perf_counter()
+    for q, text in enumerate(registered):
+        started = time.perf_counter()
+        results = detect.run_detection(text, top_k=args.k)["results"]
+        latencies.append((time.perf_counter() - started) * 1000)
+        flagged[q] = {r["url"] for r in results if r["infringement"]}
+    single_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    detect.result_cache.set_version(None)  # batch pass must not be served from the cache
+    detect.run_detection_batch([{"registered_text": t} for t in registered], top_k=args.k)
+    batch_s = time.perf_counter() - t0
+
+    positives = sum(len(t) for t in truth.values())
+    hits = {kind: 0 for kind in ("near_copy", "paraphrase")}
+    true_flags = false_flags = 0
+    for q, urls in flagged.items():
+        for url in urls:
+            if url in truth[q]:
+                true_flags += 1
+                hits[truth[q][url]] += 1
+            else:
+                false_flags += 1
+    per_kind = {kind: sum(k == kind for t in truth.values() for k in t.values()) for kind in hits}
+
+    return {
+        "suspects": len(suspects),
+        "queries": len(registered),
+        "generate_s": round(generate_s, 2),
+        "build_s": round(build_s, 2),
+        "latency_ms_p50": percentile(latencies, 50),
+        "latency_ms_p99": percentile(latencies, 99),
+        "throughput_qps": round(len(registered) / single_s, 2),
+        "batch_throughput_qps": round(len(registered) / batch_s, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "threshold": detect.INFRINGEMENT_THRESHOLD,
+        "precision": round(true_flags / (true_flags + false_flags), 4) if true_flags + false_flags else None,
+        "recall": round(true_flags / positives, 4) if positives else None,
+        "recall_by_kind": {kind: round(hits[kind] / per_kind[kind], 4) if per_kind[kind] else None for kind in hits},
+        "false_positives": false_flags,
+    }
+
+
+def run_in_subprocess(size: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, EMBEDDING_BACKEND="local", DETECT_DATA_DIR=data_dir, DETECT_RESCAN="false")
+        cmd = [
+            sys.executable, "-m", "benchmarks.detection_suite", "--worker",
+            "--size", str(size), "--queries", str(args.queries), "--words", str(args.words),
+            "--k", str(args.k), "--seed", str(args.seed),
+        ]
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"size={size} failed:\n{proc.stderr[-2000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200, help="registered texts (half have planted copies)")
+    parser.add_argument("--words", type=int, default=120, help="words per document")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/detection-<time>.json)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        # Detection logs go to stderr; stdout carries the JSON result line
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        result = run_size(args)
+        stdout.write(json.dumps(result) + "\n")
+        return
+
+    started = datetime.now(timezone.utc)
+    report = {
+        "started_at": started.isoformat(),
+        "commit": git_commit(),
+        "settings": {
+            "queries": args.queries, "words": args.words, "k": args.k, "seed": args.seed,
+            "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith(("DETECT_", "LOCAL_EMBEDDING_"))},
+        },
+        "runs": [],
+    }
+    print(f"{'suspects':>9} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} {'q/s':>8} {'batch q/s':>10} "
+          f"{'RSS MB':>8} {'prec':>6} {'recall':>6} {'near':>6} {'para':>6}")
+    for size in args.sizes:
+        run = run_in_subprocess(size, args)
+        report["runs"].append(run)
+        print(f"{run['suspects']:>9} {run['build_s']:>8} {run['latency_ms_p50']:>8} {run['latency_ms_p99']:>8} "
+              f"{run['throughput_qps']:>8} {run['batch_throughput_qps']:>10} {str(run['peak_rss_mb']):>8} "
+              f"{str(run['precision']):>6} {str(run['recall']):>6} "
+              f"{str(run['recall_by_kind']['near_copy']):>6} {str(run['recall_by_kind']['paraphrase']):>6}")
+
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results" / f"detection-{started.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
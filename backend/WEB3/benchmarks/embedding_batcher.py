@@ -0,0 +1,56 @@
+"""
+Benchmark: embedding throughput with and without the micro-batcher.
+
+Simulates many concurrent detection workers each embedding one registered
+text against the offline HashingEmbeddingBackend (fixed per-request latency and
+a cap on concurrent requests, standing in for the Vertex quota).
+
+Run from backend/WEB3:
+    python -m benchmarks.embedding_batcher --callers 64 --requests 512 --latency-ms 80 --model-concurrency 4
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.embeddings import EmbeddingMicroBatcher, HashingEmbeddingBackend
+
+
+def run(embed_fn, callers: int, requests: int):
+    texts = [f"registered asset text number {i}" for i in range(requests)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(lambda t: embed_fn([t]), texts))
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--model-concurrency", type=int, default=4, help="0 = unlimited")
+    parser.add_argument("--max-batch-size", type=int, default=250)
+    parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[1, 5, 20])
+    args = parser.parse_args()
+
+    model = HashingEmbeddingBackend(latency_ms=args.latency_ms, per_text_ms=0.5,
+                                    max_concurrency=args.model_concurrency or None)
+    direct = model.embed
+
+    elapsed = run(direct, args.callers, args.requests)
+    print(f"callers={args.callers} requests={args.requests} model latency={args.latency_ms}ms "
+          f"concurrency={args.model_concurrency or 'unlimited'}")
+    print(f"{'mode':<22} {'req/s':>9} {'model calls':>12} {'avg batch':>10}")
+    print(f"{'direct':<22} {args.requests / elapsed:>9.1f} {model.calls:>12} {1.0:>10.2f}")
+
+    for wait_ms in args.max_wait_ms:
+        model.calls = 0
+        batcher = EmbeddingMicroBatcher(direct, max_batch_size=args.max_batch_size, max_wait_ms=wait_ms)
+        elapsed = run(batcher.embed, args.callers, args.requests)
+        stats = batcher.stats()
+        label = f"batched (wait {wait_ms:g}ms)"
+        print(f"{label:<22} {args.requests / elapsed:>9.1f} {model.calls:>12} {stats['avg_batch_texts']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
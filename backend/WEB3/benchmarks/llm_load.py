@@ -0,0 +1,143 @@
+"""
+Load test: agent generation through the offline mock LLM backend.
+
+Fires a burst of review (interactive) and docs-style (bulk) jobs at the real
+prompt assembly, long-document map-reduce, prompt cache, scheduler and
+streaming code, with the Gemini call replaced by the local mock
+(LLM_BACKEND=local, no network). Reports latency percentiles per module,
+throughput, failures, the cache / scheduler counters and the per-call
+metrics (per-module queue / model latency, tokens, retries, cost; the raw
+call records are written under LLM_METRICS_DIR).
+
+The mock is tuned with LOCAL_LLM_* variables (LATENCY_MS, LATENCY_SIGMA,
+CHUNK_MS, CHUNK_TOKENS, OUTPUT_TOKENS, ERROR_RATE, QUOTA_ERROR_RATE,
+EMPTY_RATE, SEED); LLM_MAX_IN_FLIGHT / LLM_REQUESTS_PER_MINUTE /
+LLM_TOKENS_PER_MINUTE configure the scheduler as in production.
+
+Run from backend/WEB3:
+    python -m benchmarks.llm_load --jobs 200 --repeat 0.3 --bulk 0.3 --long 0.05
+    LOCAL_LLM_QUOTA_ERROR_RATE=0.05 LLM_MAX_IN_FLIGHT=8 python -m benchmarks.llm_load --stream
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("LLM_CACHE_DIR", tempfile.mkdtemp(prefix="llm-cache-"))
+os.environ.setdefault("LLM_METRICS_DIR", tempfile.mkdtemp(prefix="llm-metrics-"))
+
+from services import review
+from services.utils import run_vertex_async, llm_cache, llm_scheduler, llm_metrics
+from services.llm import get_llm_backend
+from services.prompts import PromptField, build_prompt
+
+WORDS = "the party shall agree notice term breach court section claim license payment within days".split()
+
+
+def make_document(rng, words: int) -> str:
+    sentences = [" ".join(rng.choice(WORDS, rng.integers(8, 25))).capitalize() + "." for _ in range(words // 15 + 1)]
+    return "\n\n".join(" ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6))
+
+
+def make_jobs(args, rng) -> list:
+    jobs = []
+    for i in range(args.jobs):
+        if jobs and rng.random() < args.repeat:
+            jobs.append(dict(jobs[rng.integers(len(jobs))]))  # re-run of an earlier document
+            continue
+        words = args.long_words if rng.random() < args.long else args.words
+        jobs.append({
+            "module": "docs" if rng.random() < args.bulk else "review",
+            "payload": {
+                "document_id": i,
+                "title": f"Document {i}",
+                "description": "Service agreement between two parties",
+                "requirements": {"jurisdiction": "Kenya", "focus": ["liability", "termination"]},
+                "metadata": {"source": "load-test", "empty": None},
+                "extracted_text": make_document(rng, words),
+            },
+        })
+    return jobs
+
+
+async def run_job(job: dict, stream: bool) -> dict:
+    partials = []
+    on_partial = partials.append if stream else None
+    started = time.perf_counter()
+    try:
+        if job["module"] == "review":
+            await review.process(job["payload"], on_partial=on_partial)
+        else:
+            payload = job["payload"]
+            prompt, _ = build_prompt([
+                PromptField("Document title", payload["title"], priority=0),
+                PromptField("Description", payload["description"], priority=1),
+                PromptField("Metadata", payload["metadata"], priority=3),
+            ])
+            await run_vertex_async(prompt, system_prompt="Generate metadata tags.", module="docs", on_partial=on_partial)
+        error = None
+    except Exception as e:
+        error = type(e).__name__
+    return {"module": job["module"], "ms": (time.perf_counter() - started) * 1000, "error": error,
+            "partials": len(partials)}
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    summary = {"jobs": len(results), "elapsed_s": round(elapsed, 2), "jobs_per_s": round(len(results) / elapsed, 2),
+               "modules": {}}
+    for module in sorted({r["module"] for r in results}):
+        rows = [r for r in results if r["module"] == module]
+        ok = [r["ms"] for r in rows if not r["error"]]
+        summary["modules"][module] = {
+            "jobs": len(rows),
+            "failed": len(rows) - len(ok),
+            "p50_ms": round(float(np.percentile(ok, 50)), 1) if ok else None,
+            "p99_ms": round(float(np.percentile(ok, 99)), 1) if ok else None,
+            "avg_partials": round(sum(r["partials"] for r in rows) / len(rows), 1),
+        }
+    return summary
+
+
+async def main_async(args):
+    rng = np.random.default_rng(args.seed)
+    jobs = make_jobs(args, rng)
+    started = time.perf_counter()
+    results = await asyncio.gather(*[run_job(job, args.stream) for job in jobs])
+    summary = summarize(results, time.perf_counter() - started)
+    summary["backend_calls"] = getattr(get_llm_backend(), "calls", None)
+    summary["cache"] = llm_cache.stats()
+    summary["scheduler"] = llm_scheduler.stats()
+    summary["calls"] = llm_metrics.stats()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--repeat", type=float, default=0.3, help="fraction of jobs re-running an earlier document")
+    parser.add_argument("--bulk", type=float, default=0.3, help="fraction of bulk (docs) jobs")
+    parser.add_argument("--long", type=float, default=0.05, help="fraction of long (map-reduce) documents")
+    parser.add_argument("--words", type=int, default=800)
+    parser.add_argument("--long-words", type=int, default=20000)
+    parser.add_argument("--stream", action="store_true", help="stream generations (partial callbacks)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the summary as JSON")
+    args = parser.parse_args()
+
+    # Agent logs go to stderr; the summary is the only stdout output
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    summary = asyncio.run(main_async(args))
+    sys.stdout = stdout
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Report: memory footprint, latency and recall of compact vector modes.
+
+For each DETECT_VECTOR_MODE (float32/float16/int8) and DETECT_VECTOR_DIMS
+truncation, prints resident matrix size, ms/query and recall@k against exact
+float32 search, both without and with the exact float32 rerank.
+
+Run from backend/WEB3:
+    python -m benchmarks.quantization --suspects 100000 --dims 0 384 256
+    python -m benchmarks.quantization --from-store services/detect/data/embeddings --model text-embedding-004
+"""
+import argparse
+import time
+import numpy as np
+
+from services.detect.engine import SimilarityEngine
+from services.detect.quantize import QuantizedEngine, VECTOR_MODES
+from services.detect.store import EmbeddingStore
+from benchmarks.ann_recall import synthetic_corpus, recall_at_k
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suspects", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", type=int, nargs="+", default=[0, 384, 256], help="0 = full dimension")
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--from-store", help="embedding store root to report on real vectors")
+    parser.add_argument("--model", default="text-embedding-004")
+    args = parser.parse_args()
+
+    if args.from_store:
+        corpus = EmbeddingStore(args.from_store, args.model).all_vectors()
+    else:
+        corpus = synthetic_corpus(args.suspects, args.dim)
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(corpus.shape[0], min(args.queries, corpus.shape[0]), replace=False)
+    queries = corpus[picks] + 0.3 * rng.standard_normal((len(picks), corpus.shape[1])).astype(np.float32)
+
+    exact_engine = SimilarityEngine(corpus)
+    exact = exact_engine.search_batch(queries, k=args.k)
+    baseline_mb = exact_engine.matrix.nbytes / 2**20
+
+    print(f"corpus={corpus.shape[0]} dim={corpus.shape[1]} queries={len(queries)} k={args.k} "
+          f"rerank_factor={args.rerank_factor}")
+    print(f"{'mode':<8} {'dims':>5} {'MB':>9} {'vs f32':>7} {'ms/q':>7} {'recall':>7} "
+          f"{'ms/q+rr':>8} {'recall+rr':>9}")
+
+    full = exact_engine.matrix
+    for mode in VECTOR_MODES:
+        for dims in args.dims:
+            engine = QuantizedEngine(corpus, mode=mode, dims=dims or None)
+            t0 = time.perf_counter()
+            approx = [engine.search(q, k=args.k) for q in queries]
+            ms = (time.perf_counter() - t0) / len(queries) * 1000
+
+            engine.rerank_fn = lambda ids: full[ids]
+            engine.rerank_factor = args.rerank_factor
+            t0 = time.perf_counter()
+            reranked = [engine.search(q, k=args.k) for q in queries]
+            ms_rr = (time.perf_counter() - t0) / len(queries) * 1000
+
+            mb = engine.nbytes / 2**20
+            print(f"{mode:<8} {engine.dims:>5} {mb:>9.1f} {mb / baseline_mb:>6.0%} {ms:>7.2f} "
+                  f"{recall_at_k(approx, exact):>7.3f} {ms_rr:>8.2f} {recall_at_k(reranked, exact):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
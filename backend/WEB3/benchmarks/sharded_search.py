@@ -0,0 +1,63 @@
+"""
+Benchmark: sharded multi-process search throughput from 1 to N worker processes.
+
+Each configuration splits the corpus into one shard per worker and times
+batches of queries; results are checked against the in-process
+SimilarityEngine. Speedup is relative to 1 worker.
+
+Run from backend/WEB3:
+    python -m benchmarks.sharded_search --suspects 1000000 --workers 1 2 4 8 --batch 32
+"""
+import os
+import argparse
+import tempfile
+import time
+import numpy as np
+
+from services.detect.engine import SimilarityEngine
+from services.detect.shards import ShardedEngine, get_shard_pool
+from benchmarks.ann_recall import synthetic_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suspects", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=128)
+    parser.add_argument("--batch", type=int, default=32, help="queries per search_batch call")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.suspects, args.dim)
+    queries = synthetic_corpus(args.queries, args.dim, seed=1)
+    batches = [queries[i:i + args.batch] for i in range(0, args.queries, args.batch)]
+
+    exact = SimilarityEngine(vectors)
+    t0 = time.perf_counter()
+    expected = [hit for batch in batches for hit in exact.search_batch(batch, k=args.k)]
+    in_process_qps = args.queries / (time.perf_counter() - t0)
+
+    print(f"suspects={args.suspects} dim={args.dim} queries={args.queries} batch={args.batch} "
+          f"k={args.k} cpus={os.cpu_count()}")
+    print(f"  in-process SimilarityEngine      : {in_process_qps:9.1f} queries/s")
+
+    base_qps = None
+    with tempfile.TemporaryDirectory() as root:
+        for workers in sorted(set(args.workers)):
+            engine = ShardedEngine(vectors, root, shards=workers, workers=workers)
+            get_shard_pool(workers)
+            engine.search_batch(batches[0], k=args.k)  # warm-up: spawn + map shards
+
+            t0 = time.perf_counter()
+            got = [hit for batch in batches for hit in engine.search_batch(batch, k=args.k)]
+            qps = args.queries / (time.perf_counter() - t0)
+            base_qps = base_qps or qps
+
+            agree = np.mean([[i for i, _ in g] == [i for i, _ in e] for g, e in zip(got, expected)])
+            print(f"  sharded, {workers:2d} worker(s)            : {qps:9.1f} queries/s  "
+                  f"({qps / base_qps:4.2f}x)  top-k agreement {agree:.3f}")
+
+
+if __name__ == "__main__":
+    main()
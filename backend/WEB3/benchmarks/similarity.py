@@ -0,0 +1,71 @@
+"""
+Benchmark: vectorized SimilarityEngine vs the old per-suspect cosine loop.
+
+Run from backend/WEB3:
+    python -m benchmarks.similarity --suspects 10000 --dim 768 --queries 20
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from services.detect.engine import SimilarityEngine
+
+
+def legacy_loop(query, suspects):
+    """The original run_detection scoring: one cosine_similarity call per suspect."""
+    results = []
+    for emb in suspects:
+        similarity = cosine_similarity(
+            np.array(query).reshape(1, -1),
+            np.array(emb).reshape(1, -1)
+        )[0][0]
+        results.append(float(similarity))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suspects", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--legacy-queries", type=int, default=3, help="queries timed on the slow loop")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    suspects = rng.standard_normal((args.suspects, args.dim)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    t0 = time.perf_counter()
+    engine = SimilarityEngine(suspects)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for q in queries:
+        engine.search(q, k=args.top_k)
+    single_ms = (time.perf_counter() - t0) / args.queries * 1000
+
+    t0 = time.perf_counter()
+    engine.search_batch(queries, k=args.top_k)
+    batch_ms = (time.perf_counter() - t0) / args.queries * 1000
+
+    n_legacy = min(args.legacy_queries, args.queries)
+    t0 = time.perf_counter()
+    for q in queries[:n_legacy]:
+        legacy = legacy_loop(q, suspects)
+    legacy_ms = (time.perf_counter() - t0) / n_legacy * 1000
+
+    # Sanity check: both paths agree on the best suspect
+    best_engine = engine.search(queries[n_legacy - 1], k=1)[0]
+    assert best_engine[0] == int(np.argmax(legacy)), "engine and legacy loop disagree on top hit"
+
+    print(f"suspects={args.suspects} dim={args.dim} top_k={args.top_k}")
+    print(f"  engine build         : {build_s * 1000:9.2f} ms")
+    print(f"  legacy loop / query  : {legacy_ms:9.2f} ms")
+    print(f"  engine.search / query: {single_ms:9.2f} ms  ({legacy_ms / single_ms:,.0f}x)")
+    print(f"  search_batch / query : {batch_ms:9.2f} ms  ({legacy_ms / batch_ms:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: cold start of the FastAPI agent app.
+
+Each run starts a fresh interpreter that imports main (with -X importtime),
+then runs the background integration warm-up to completion. Reported: the
+median time until `main.app` is importable (what a worker waits for before
+accepting requests), the slowest imports, and per-component init time /
+errors from the integration registry.
+
+Run from backend/WEB3:
+    python -m benchmarks.startup --runs 5
+    LLM_BACKEND=local EMBEDDING_BACKEND=local python -m benchmarks.startup --top 15
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent  # backend/WEB3
+
+
+def worker():
+    import asyncio
+
+    # Logs go to stderr; stdout carries the JSON result line
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    started = time.perf_counter()
+    import main
+    import_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    asyncio.run(main.integrations.warmup())
+    warmup_ms = (time.perf_counter() - started) * 1000
+    stdout.write(json.dumps({
+        "import_ms": round(import_ms, 1),
+        "warmup_ms": round(warmup_ms, 1),
+        "components": main.integrations.stats(),
+    }) + "\n")
+
+
+def parse_importtime(stderr: str) -> dict:
+    """{module: cumulative_us} from -X importtime output."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = [part.strip() for part in line[len("import time:"):].split("|")]
+        if len(fields) != 3 or not fields[1].isdigit():  # header line
+            continue
+        cumulative[fields[2]] = max(cumulative.get(fields[2], 0), int(fields[1]))
+    return cumulative
+
+
+def run_once() -> tuple:
+    cmd = [sys.executable, "-X", "importtime", "-m", "benchmarks.startup", "--worker"]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, env=dict(os.environ))
+    if proc.returncode != 0:
+        raise RuntimeError(f"startup run failed:\n{proc.stderr[-3000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to show")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker()
+        return
+
+    runs, imports = [], {}
+    for _ in range(args.runs):
+        result, cumulative = run_once()
+        runs.append(result)
+        for name, us in cumulative.items():
+            imports.setdefault(name, []).append(us)
+
+    print(f"runs={args.runs}  LLM_BACKEND={os.getenv('LLM_BACKEND', 'vertex')}  "
+          f"EMBEDDING_BACKEND={os.getenv('EMBEDDING_BACKEND', 'vertex')}")
+    print(f"  import main (ready to serve) : {statistics.median(r['import_ms'] for r in runs):8.1f} ms (median)")
+    print(f"  background warm-up           : {statistics.median(r['warmup_ms'] for r in runs):8.1f} ms (median)")
+
+    print("  components (last run):")
+    for name, status in runs[-1]["components"].items():
+        state = "ready" if status["ready"] else f"error: {status['error']}"
+        print(f"    {name:<12} {str(status['init_ms']):>9} ms  {state}")
+
+    top_level = {name: us for name, us in imports.items() if "." not in name}
+    print("  slowest top-level packages (median cumulative import time):")
+    for name, samples in sorted(top_level.items(), key=lambda item: -statistics.median(item[1]))[:args.top]:
+        print(f"    {name:<28} {statistics.median(samples) / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
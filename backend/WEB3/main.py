@@ -1,13 +1,26 @@
 import os
-import uvicorn
+import json
+import time
+import threading
+import concurrent.futures
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from services.router import router as services_router
-from services.detect.detect import run_detection
+from services.detect.detect import (
+    run_detection, run_detection_batch, iter_detection, get_detection_stats, embedding_batcher, result_cache,
+    ingest_suspects, suspect_store, load_corpus, index_persister,
+)
+from services.detect.executor import detection_executor, DetectionOverloaded
+from services.detect.rescan import asset_registry, rescan_scheduler, RESCAN_ENABLED
 from services.integrations import icp  # <-- ICP integration -->
+from services.integrations.registry import integrations
+from services.embeddings import get_embedding_backend
+from services.llm import get_llm_backend
+from services.utils import llm_metrics, llm_scheduler
 from pydantic import BaseModel
 from typing import List, Optional
 from fastapi import Body
@@ -16,11 +29,38 @@ from services.integrations import icp
 
 AI_AGENT_PORT = int(os.getenv("AI_AGENT_PORT", 8001))
 AI_AGENT_HOST = os.getenv("AI_AGENT_HOST", "0.0.0.0")
+STREAM_QUEUE_SIZE = int(os.getenv("DETECT_STREAM_QUEUE_SIZE", 64))  # events buffered ahead of a slow client
+# A stream whose client stops reading for this long is abandoned and its detection worker freed
+STREAM_PUT_TIMEOUT_SECONDS = float(os.getenv("DETECT_STREAM_PUT_TIMEOUT_SECONDS", 30))
+STREAM_DISCONNECT_POLL_SECONDS = float(os.getenv("DETECT_STREAM_DISCONNECT_POLL_SECONDS", 0.5))
+INTEGRATIONS_WARMUP = os.getenv("INTEGRATIONS_WARMUP", "true").lower() in ["1", "true", "yes"]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup: warm integrations in the background (requests are served
+    meanwhile) and start the re-scan loop. Shutdown: stop both, save the
+    pending corpus indexes and flush the LLM call log.
+    """
+    warmup = asyncio.create_task(integrations.warmup()) if INTEGRATIONS_WARMUP else None
+    if RESCAN_ENABLED:
+        rescan_scheduler.start(icp.register_story_metadata_batch)
+    try:
+        yield
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+        await rescan_scheduler.stop()
+        await asyncio.to_thread(index_persister.flush)
+        llm_metrics.close()
+
 
 app = FastAPI(
     title="HakiChain Vertex AI Agent",
     description="FastAPI + Google Vertex AI agent for HakiLens, HakiDraft, HakiReview, and HakiDocs",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -33,10 +73,52 @@ app.add_middleware(
 
 app.include_router(services_router, prefix="/agent", tags=["Agent Services"])
 
+# ----------------------------
+# Lazy Integrations + Background Warm-up
+# ----------------------------
+# Story / ICP / Pinata register themselves in their modules; the model and
+# corpus components below only warm caches that are otherwise filled on first use.
+def warm_llm():
+    backend = get_llm_backend()
+    getattr(backend, "model", None)  # loads Gemini on the Vertex backend
+    return backend
+
+
+def warm_embeddings():
+    backend = get_embedding_backend()
+    backend.warmup()
+    return backend
+
+
+def warm_detection():
+    load_corpus()
+    return True
+
+
+integrations.register("llm", warm_llm)
+integrations.register("embeddings", warm_embeddings)
+integrations.register("detect", warm_detection)
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "message": "HakiChain Vertex AI Agent is running."}
 
+@app.get("/integrations")
+async def integration_status():
+    """Per-component readiness, init time and last init error."""
+    return integrations.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus-format LLM call metrics (latency / token histograms, retries, cost) and Gemini queue gauges."""
+    scheduler = llm_scheduler.stats()
+    return llm_metrics.prometheus({
+        "llm_in_flight": scheduler["in_flight"],
+        "llm_queue_depth_interactive": scheduler["queue_depth"]["interactive"],
+        "llm_queue_depth_bulk": scheduler["queue_depth"]["bulk"],
+    })
+
 # ----------------------------
 # Pydantic Models
 # ----------------------------
@@ -44,6 +126,12 @@ class Metadata(BaseModel):
     description: Optional[str] = ""
     tags: List[str] = []
 
+class MetadataFilter(BaseModel):
+    tags: List[str] = []
+    jurisdiction: List[str] = []
+    category: List[str] = []
+    domain: List[str] = []  # host names taken from suspect URLs, e.g. "example.com"
+
 class DetectionPayload(BaseModel):
     assetId: int
     title: str
@@ -51,15 +139,96 @@ class DetectionPayload(BaseModel):
     metadata: Metadata
     owner: str
     text: str = ""
+    chunked: bool = False  # passage-level matching with matched-span offsets
+    filters: Optional[MetadataFilter] = None  # only score suspects matching every given field
+    boost: Optional[MetadataFilter] = None    # rank suspects matching any given field higher
 
 class Match(BaseModel):
     url: str
     similarity: float
     excerpt: Optional[str] = None
+    matchType: Optional[str] = None             # "exact" | "near_duplicate" (lexical) | "semantic"
+    registeredSpan: Optional[List[int]] = None  # [start, end] in the registered text (chunked mode)
+    suspectSpan: Optional[List[int]] = None     # [start, end] in the suspect text (chunked mode)
 
 class DetectionResponse(BaseModel):
     matches: List[Match]
 
+class SuspectEntry(BaseModel):
+    url: str = ""
+    text: str
+    tags: List[str] = []
+    jurisdiction: Optional[str] = None
+    category: Optional[str] = None
+
+class IngestionResponse(BaseModel):
+    added: int
+    duplicates: int
+    rejected: int
+    version: int
+    ids: List[str]
+
+class AssetDetectionResult(BaseModel):
+    assetId: int
+    matches: List[Match]
+
+class BatchDetectionResponse(BaseModel):
+    results: List[AssetDetectionResult]
+
+
+def overloaded_response(e: DetectionOverloaded) -> HTTPException:
+    """503 with Retry-After when the detection queue is full."""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def to_matches(results: list) -> list:
+    """Transform run_detection results to the frontend Match structure."""
+    return [
+        {
+            "url": r["url"],
+            "similarity": r["similarity"],
+            "excerpt": r.get("excerpt") or r["text"][:200],
+            "matchType": r.get("match_type"),
+            "registeredSpan": r.get("registered_span"),
+            "suspectSpan": r.get("suspect_span"),
+        }
+        for r in results
+    ]
+
+
+def to_icp_record(payload: DetectionPayload, matches: list) -> dict:
+    """Story metadata record for icp.register_story_metadata_hash."""
+    return {
+        "document_id": payload.assetId,
+        "metadata": {
+            "description": payload.metadata.description,
+            "tags": payload.metadata.tags,
+            "text": payload.text
+        },
+        "matches": [
+            {"url": m["url"], "similarity": m["similarity"], "excerpt": m["excerpt"] or ""}
+            for m in matches
+        ],
+    }
+
+def register_assets(payloads: list, detections: list):
+    """Remember detected assets (and their flagged matches) for background re-scans."""
+    for payload, detection in zip(payloads, detections):
+        asset_registry.register(
+            payload.assetId,
+            registered_text=payload.text,
+            metadata_description=payload.metadata.description,
+            metadata_tags=payload.metadata.tags,
+            matched_urls=[r["url"] for r in detection["results"] if r["infringement"]],
+        )
+
+
+async def register_assets_async(payloads: list, detections: list):
+    try:
+        await asyncio.to_thread(register_assets, payloads, detections)
+    except Exception as e:
+        print("❌ Warning: Failed to register assets for re-scan:", e)
+
 # ----------------------------
 # Detection Endpoint
 # ----------------------------
@@ -68,55 +237,232 @@ async def detect_ip(payload: DetectionPayload):
     try:
         print(f"🚀 Detection triggered for asset ID {payload.assetId} by {payload.owner}")
         
-        # Run detection
-        results = run_detection(
+        # Run detection on the bounded detection pool (keeps the event loop free)
+        results = await detection_executor.run(
+            run_detection,
             registered_text=payload.text,
             metadata_description=payload.metadata.description,
-            metadata_tags=payload.metadata.tags
+            metadata_tags=payload.metadata.tags,
+            chunked=payload.chunked,
+            filters=payload.filters.dict() if payload.filters else None,
+            boost=payload.boost.dict() if payload.boost else None
         )
 
         # Transform to frontend structure
-        matches = [
-            {
-                "url": r["url"],
-                "similarity": r["similarity"],
-                "excerpt": r["text"][:200]
-            }
-            for r in results["results"]
-        ]
+        matches = to_matches(results["results"])
+        asyncio.create_task(register_assets_async([payload], [results]))
 
         # --- NEW: Trigger ICP store_story_metadata asynchronously ---
         try:
-            icp_matches = [
-                {
-                    "url": m["url"],
-                    "similarity": m["similarity"],
-                    "excerpt": m["excerpt"] or ""
-                }
-                for m in matches
-            ]
-
             # Fire-and-forget
-            asyncio.create_task(
-                icp.register_story_metadata_hash(
-                    document_id=payload.assetId,
-                    metadata={
-                        "description": payload.metadata.description,
-                        "tags": payload.metadata.tags,
-                        "text": payload.text
-                    },
-                    matches=icp_matches
-                )
-            )
+            asyncio.create_task(icp.register_story_metadata_hash(**to_icp_record(payload, matches)))
         except Exception as e:
             print("❌ Warning: Failed to trigger ICP store_story_metadata:", e)
 
         return {"matches": matches}
 
+    except DetectionOverloaded as e:
+        print(f"⏳ Detection rejected for asset ID {payload.assetId}: {e}")
+        raise overloaded_response(e)
     except Exception as e:
         print("❌ Detection failed:", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# ----------------------------
+# Streaming Detection Endpoint
+# ----------------------------
+def format_event(event: str, data: dict, fmt: str) -> str:
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, **data}) + "\n"
+
+
+@app.post("/detect/stream")
+async def detect_ip_stream(payload: DetectionPayload, request: Request, format: str = "ndjson"):
+    """
+    Streaming /detect (`format=ndjson`, one JSON object per line, or
+    `format=sse`). `match` events marked `provisional` are sent as their
+    block/shard of the corpus is scored and they enter the running top-k, so
+    they are not strongest-first overall and may later be pushed out of the
+    top-k. The closing `summary` event carries the final matches, ranked
+    strongest-first and trimmed to top-k. Events pass through a small
+    bounded queue, so a slow client applies backpressure to detection; a
+    client that disconnects, or stops reading for STREAM_PUT_TIMEOUT_SECONDS,
+    releases the detection worker.
+    """
+    fmt = "sse" if format.lower() == "sse" else "ndjson"
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    closed = threading.Event()
+
+    def publish(item):
+        """Hand an event to the response (blocks while the queue is full); False once the client is gone."""
+        future = asyncio.run_coroutine_threadsafe(events.put(item), loop)
+        deadline = time.monotonic() + STREAM_PUT_TIMEOUT_SECONDS
+        while not closed.is_set() and time.monotonic() < deadline:
+            try:
+                future.result(timeout=min(1, STREAM_PUT_TIMEOUT_SECONDS))
+                return True
+            except concurrent.futures.TimeoutError:
+                continue
+        future.cancel()
+        closed.set()
+        return False
+
+    def produce():
+        try:
+            for event in iter_detection(
+                registered_text=payload.text,
+                metadata_description=payload.metadata.description,
+                metadata_tags=payload.metadata.tags,
+                chunked=payload.chunked,
+                filters=payload.filters.dict() if payload.filters else None,
+                boost=payload.boost.dict() if payload.boost else None,
+            ):
+                if closed.is_set() or not publish(event):
+                    return
+        except Exception as e:
+            print("❌ Streaming detection failed:", e)
+            publish(("error", {"detail": str(e)}))
+        finally:
+            if not closed.is_set():
+                publish(None)
+
+    print(f"🚀 Streaming detection triggered for asset ID {payload.assetId} by {payload.owner}")
+    try:
+        producing = detection_executor.submit(produce)
+    except DetectionOverloaded as e:
+        print(f"⏳ Streaming detection rejected for asset ID {payload.assetId}: {e}")
+        raise overloaded_response(e)
+
+    async def watch_disconnect():
+        """Stops the producer when the client goes away, even if the body never started."""
+        try:
+            while not closed.is_set() and not producing.done():
+                if await request.is_disconnected():
+                    print(f"🔌 Client left streaming detection for asset ID {payload.assetId}")
+                    break
+                await asyncio.sleep(STREAM_DISCONNECT_POLL_SECONDS)
+        finally:
+            if not producing.done():
+                closed.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+
+    async def body():
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                event, data = item
+                if event == "match":
+                    yield format_event("match", {
+                        **to_matches([data])[0],
+                        "infringement": data["infringement"],
+                        "provisional": data.get("provisional", False),
+                    }, fmt)
+                elif event == "summary":
+                    results = data.pop("results")
+                    if results is not None:
+                        matches = to_matches(results)
+                        data["matches"] = matches
+                        asyncio.create_task(register_assets_async([payload], [{"results": results}]))
+                        asyncio.create_task(icp.register_story_metadata_hash(**to_icp_record(payload, matches)))
+                    yield format_event("summary", data, fmt)
+                else:
+                    yield format_event(event, data, fmt)
+        finally:
+            closed.set()
+            watcher.cancel()
+
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type)
+
+# ----------------------------
+# Batch Detection Endpoint
+# ----------------------------
+@app.post("/detect/batch", response_model=BatchDetectionResponse)
+async def detect_ip_batch(payloads: List[DetectionPayload]):
+    """
+    Score many assets in one request: registered texts are embedded in as few
+    batches as the model allows and scored against the corpus together.
+    ICP writes are grouped into one background bulk write.
+    Batch mode always scores whole texts (the `chunked` flag is ignored).
+    """
+    try:
+        print(f"🚀 Batch detection triggered for {len(payloads)} assets")
+
+        batch_results = await detection_executor.run(run_detection_batch, [
+            {
+                "registered_text": p.text,
+                "metadata_description": p.metadata.description,
+                "metadata_tags": p.metadata.tags,
+                "filters": p.filters.dict() if p.filters else None,
+                "boost": p.boost.dict() if p.boost else None,
+            }
+            for p in payloads
+        ])
+
+        asyncio.create_task(register_assets_async(payloads, batch_results))
+
+        results = []
+        icp_records = []
+        for payload, detection in zip(payloads, batch_results):
+            matches = to_matches(detection["results"])
+            results.append({"assetId": payload.assetId, "matches": matches})
+            icp_records.append(to_icp_record(payload, matches))
+
+        try:
+            # One fire-and-forget bulk write instead of a task per asset
+            asyncio.create_task(icp.register_story_metadata_batch(icp_records))
+        except Exception as e:
+            print("❌ Warning: Failed to trigger ICP bulk store_story_metadata:", e)
+
+        return {"results": results}
+
+    except DetectionOverloaded as e:
+        print(f"⏳ Batch detection rejected: {e}")
+        raise overloaded_response(e)
+    except Exception as e:
+        print("❌ Batch detection failed:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/detect/stats")
+async def detect_stats():
+    """Detection pipeline counters, executor queue depth / wait times and embedding batching."""
+    return {
+        "pipeline": get_detection_stats(),
+        "executor": detection_executor.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "result_cache": result_cache.stats(),
+        "suspect_store": suspect_store.status(),
+        "rescan": rescan_scheduler.stats(),
+    }
+
+# ----------------------------
+# Suspect Ingestion Endpoint
+# ----------------------------
+@app.post("/detect/suspects", response_model=IngestionResponse)
+async def add_suspects(entries: List[SuspectEntry]):
+    """
+    Append suspects to the corpus as a new store segment (normalized,
+    de-duplicated and embedded in one batch). Running detectors pick the
+    new segment up on their next call.
+    """
+    try:
+        print(f"🚀 Ingesting {len(entries)} suspect entries")
+        report = await detection_executor.run(ingest_suspects, [e.dict(exclude_none=True) for e in entries])
+        if report["added"]:
+            rescan_scheduler.trigger()  # score the new suspects against registered assets
+        return report
+    except DetectionOverloaded as e:
+        print(f"⏳ Suspect ingestion rejected: {e}")
+        raise overloaded_response(e)
+    except Exception as e:
+        print("❌ Suspect ingestion failed:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ----------------------------
 # Optional manual store endpoint
 # ----------------------------
@@ -159,4 +505,6 @@ async def detect_and_store(payload: StoryDetectionPayload):
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host=AI_AGENT_HOST, port=AI_AGENT_PORT, reload=True)
@@ -0,0 +1,158 @@
+import numpy as np
+from pathlib import Path
+from .engine import normalize_rows, select_top
+from .filelock import file_lock, segment_name
+
+# ----------------------------
+# Approximate Nearest Neighbour Index (IVF, pure NumPy)
+# ----------------------------
+# Vectors are clustered with spherical k-means into `nlist` inverted lists.
+# A query only scores the vectors in its `nprobe` closest lists, so cost is
+# roughly nprobe / nlist of a brute-force scan. Raise nprobe for recall,
+# lower it for latency; nprobe == nlist is an exact search.
+
+ASSIGN_CHUNK = 65536  # rows assigned to centroids per matrix product
+
+
+class IVFIndex:
+    """
+    Inverted-file index over cosine similarity with the same search contract
+    as SimilarityEngine: search(query, k, threshold) -> [(id, score), ...].
+    Supports incremental inserts and save/load to a single .npz file.
+    """
+
+    def __init__(self, dim: int, nlist: int = 256, nprobe: int = 8, train_iters: int = 10, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.seed = seed
+        self.centroids = None
+        # Rows are kept sorted by inverted list so each probed list is a contiguous slice
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self._bounds = None
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    # ----------------------------
+    # Training / Inserts
+    # ----------------------------
+    def train(self, vectors, max_points_per_list: int = 64):
+        """Fit the coarse quantizer with spherical k-means on a sample of `vectors`."""
+        data = normalize_rows(vectors)
+        rng = np.random.default_rng(self.seed)
+        nlist = max(1, min(self.nlist, data.shape[0]))
+
+        sample_size = min(data.shape[0], nlist * max_points_per_list)
+        sample = data[rng.choice(data.shape[0], sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty lists from random sample points
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        self.nlist = nlist
+        self.centroids = centroids
+        print(f"[ANN] Trained IVF quantizer: nlist={nlist} on {sample_size} vectors")
+
+    def _assign(self, matrix):
+        out = np.empty(matrix.shape[0], dtype=np.int32)
+        for start in range(0, matrix.shape[0], ASSIGN_CHUNK):
+            block = matrix[start:start + ASSIGN_CHUNK]
+            out[start:start + ASSIGN_CHUNK] = np.argmax(block @ self.centroids.T, axis=1)
+        return out
+
+    def add(self, vectors):
+        """Insert vectors (training first if needed). Returns the ids assigned to them."""
+        new_rows = normalize_rows(vectors)
+        if not self.is_trained:
+            self.train(new_rows)
+        start = len(self)
+        new_ids = np.arange(start, start + new_rows.shape[0])
+
+        assignments = np.concatenate([self.assignments, self._assign(new_rows)])
+        order = np.argsort(assignments, kind="stable")
+        self.matrix = (np.concatenate([self.matrix, new_rows]) if start else new_rows)[order]
+        self.ids = np.concatenate([self.ids, new_ids])[order]
+        self.assignments = assignments[order]
+        self._bounds = None
+        return new_ids
+
+    def _list_bounds(self):
+        if self._bounds is None:
+            self._bounds = np.searchsorted(self.assignments, np.arange(self.nlist + 1))
+        return self._bounds
+
+    # ----------------------------
+    # Search
+    # ----------------------------
+    def search(self, query, k: int = None, threshold: float = None, nprobe: int = None):
+        return self.search_batch(np.asarray(query).reshape(1, -1), k=k, threshold=threshold, nprobe=nprobe)[0]
+
+    def search_batch(self, queries, k: int = None, threshold: float = None, nprobe: int = None):
+        queries = normalize_rows(queries)
+        if len(self) == 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        bounds = self._list_bounds()
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, probe in zip(queries, probes):
+            slices = [slice(bounds[p], bounds[p + 1]) for p in probe]
+            scores = np.concatenate([self.matrix[sl] @ query for sl in slices])
+            candidates = np.concatenate([self.ids[sl] for sl in slices])
+            results.append(select_top(scores, k=k, threshold=threshold, ids=candidates))
+        return results
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def save(self, path: Path, keys: list = None):
+        """Write the index (and optional content keys, one per id) to `path` (.npz)."""
+        if not self.is_trained:
+            raise ValueError("Cannot save an untrained IVF index")
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(segment_name(path.name, len(self), ".tmp"))
+        with file_lock(path.with_name(path.name + ".lock")):
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    params=np.array([self.dim, self.nlist, self.nprobe, self.train_iters, self.seed]),
+                    centroids=self.centroids,
+                    matrix=self.matrix,
+                    ids=self.ids,
+                    assignments=self.assignments,
+                    keys=np.array(keys if keys is not None else [], dtype=str),
+                )
+            tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path):
+        """Load an index saved with save(). Returns (index, keys)."""
+        with np.load(path) as data:
+            dim, nlist, nprobe, train_iters, seed = (int(v) for v in data["params"])
+            index = cls(dim, nlist=nlist, nprobe=nprobe, train_iters=train_iters, seed=seed)
+            index.centroids = data["centroids"]
+            index.matrix = data["matrix"]
+            index.ids = data["ids"]
+            index.assignments = data["assignments"]
+            keys = data["keys"].tolist()
+        return index, keys
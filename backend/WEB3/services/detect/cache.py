@@ -0,0 +1,143 @@
+import os
+import copy
+import json
+import time
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+# ----------------------------
+# Detection Result Cache (LRU memory tier + optional disk tier)
+# ----------------------------
+# Keys are content hashes of the query and settings; every entry belongs to a
+# corpus version. When the corpus version changes (suspects added/changed),
+# all entries are dropped, so stale results are never served. On disk each
+# version has its own directory; other workers may still be serving an older
+# version, so a directory is only deleted once it has not been used for
+# `version_ttl_seconds`, or when more than `max_versions` exist (least
+# recently used first).
+
+
+def make_key(*parts) -> str:
+    """Stable content hash of JSON-serializable key parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 1024, disk_dir: Path = None,
+                 version_ttl_seconds: float = 86400, max_versions: int = 8):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.version_ttl_seconds = version_ttl_seconds
+        self.max_versions = max_versions
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "expired_versions": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / self.version / key[:2] / f"{key}.json"
+
+    def set_version(self, version: str):
+        """Switch to a new corpus version, dropping the in-memory entries of the old one."""
+        with self._lock:
+            if version == self.version:
+                return
+            had_entries = bool(self._entries) or self.version is not None
+            self._entries.clear()
+            self.version = version
+            if had_entries:
+                self._stats["invalidations"] += 1
+        if self.disk_dir:
+            self._touch_version()
+            self._expire_versions()
+
+    def _touch_version(self):
+        """Mark the current version directory as in use (its mtime is the LRU clock)."""
+        version_dir = self.disk_dir / self.version
+        version_dir.mkdir(parents=True, exist_ok=True)
+        os.utime(version_dir)
+
+    def _expire_versions(self):
+        """Delete version directories unused for version_ttl_seconds, and the LRU ones beyond max_versions."""
+        versions = []
+        for path in self.disk_dir.iterdir():
+            try:
+                versions.append((path.stat().st_mtime, path))
+            except FileNotFoundError:  # removed by another worker
+                continue
+        versions.sort(reverse=True)
+        cutoff = time.time() - self.version_ttl_seconds
+        for rank, (mtime, path) in enumerate(versions):
+            if path.name != self.version and (mtime < cutoff or rank >= self.max_versions):
+                shutil.rmtree(path, ignore_errors=True)
+                with self._lock:
+                    self._stats["expired_versions"] += 1
+
+    def get(self, key: str):
+        """Return a copy of the cached value, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return copy.deepcopy(self._entries[key])
+
+        if self.disk_dir and self.version:
+            path = self._disk_path(key)
+            try:
+                with open(path) as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                self._remember(key, value)
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, value):
+        if not self.enabled:
+            return
+        value = copy.deepcopy(value)
+        self._remember(key, value)
+        if self.disk_dir and self.version:
+            path = self._disk_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+            os.utime(path.parent.parent)  # keep this version's directory recent for the expiry above
+
+    def _remember(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            stats["corpus_version"] = self.version
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from .filelock import file_lock, segment_name
+
+# ----------------------------
+# Versioned Append-Only Suspect Store
+# ----------------------------
+# Layout on disk:
+#
+#   <root>/manifest.json                     -> {"version", "generation", "compacted_from", "segments": [...]}
+#   <root>/segment-00001-<pid>-<tag>.jsonl   -> one suspect (or tombstone) per line
+#
+# Every ingestion writes a new segment and swaps the manifest atomically, so a
+# crashed or bad write never touches existing data and can be rolled back by
+# dropping the newest segments. Compaction folds all segments into one,
+# dropping duplicates and tombstones, and bumps `generation` (readers then
+# reload from scratch instead of applying just the new segments); versions
+# before `compacted_from` can no longer be rolled back to.
+# Writers (server workers, the ingest CLI) hold a file lock and re-read the
+# manifest before writing, and segment names are unique per writer.
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_suspect(entry: dict):
+    """Canonical suspect record (trimmed text/URL, de-duplicated tags), or None if it has no text."""
+    text = _SPACE_RE.sub(" ", str(entry.get("text") or "")).strip()
+    if not text:
+        return None
+    tags = []
+    for tag in entry.get("tags") or []:
+        tag = str(tag).strip()
+        if tag and tag not in tags:
+            tags.append(tag)
+    record = {"url": str(entry.get("url") or "").strip(), "text": text, "tags": tags}
+    for field in ("jurisdiction", "category"):
+        if entry.get(field):
+            record[field] = str(entry[field]).strip()
+    record["id"] = suspect_id(record)
+    return record
+
+
+def suspect_id(record: dict) -> str:
+    """Stable identity of a suspect: its source URL and text."""
+    return hashlib.sha256(f"{record['url']}\x00{record['text']}".encode("utf-8")).hexdigest()[:24]
+
+
+class SuspectStore:
+    """
+    On-disk suspect corpus. `suspects` holds the live records in ingestion
+    order; refresh() picks up segments written by other processes, reading
+    only the ones it has not seen yet.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.manifest_path = self.root / "manifest.json"
+        self.lock_path = self.root / ".lock"
+        self._lock = threading.Lock()
+        self._manifest = {"version": 0, "generation": 0, "compacted_from": 0, "segments": []}
+        self._manifest_stat = None
+        self._loaded_segments = 0
+        self._ids = {}          # id -> position in self.suspects
+        self.suspects = []
+
+    @property
+    def version(self) -> int:
+        return self._manifest["version"]
+
+    @property
+    def generation(self) -> int:
+        return self._manifest["generation"]
+
+    def __len__(self):
+        return len(self.suspects)
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    # ----------------------------
+    # Reading
+    # ----------------------------
+    @property
+    def compacted_from(self) -> int:
+        return self._manifest.get("compacted_from", 0)
+
+    def _read_manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return {"version": 0, "generation": 0, "compacted_from": 0, "segments": []}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _read_segment(self, segment: dict) -> list:
+        with open(self.root / segment["file"], encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _apply(self, records: list):
+        """Apply suspect records and tombstones in order (removals are applied in one pass)."""
+        removed = set()
+        for record in records:
+            if record.get("deleted"):
+                if record["id"] in self._ids:
+                    removed.add(record["id"])
+                continue
+            if record["id"] in removed:  # re-added after a tombstone in the same batch
+                self._drop(removed)
+                removed = set()
+            if record["id"] not in self._ids:
+                self._ids[record["id"]] = len(self.suspects)
+                self.suspects.append(record)
+        self._drop(removed)
+
+    def _drop(self, ids: set):
+        if ids:
+            self.suspects = [s for s in self.suspects if s["id"] not in ids]
+            self._ids = {s["id"]: i for i, s in enumerate(self.suspects)}
+
+    def refresh(self) -> bool:
+        """
+        Bring `suspects` up to date with the manifest. New segments are
+        appended without re-reading old ones; after a compaction, rollback or
+        deletion the generation changes and everything is reloaded.
+        Returns True if anything changed.
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self, force: bool = False) -> bool:
+        """refresh() with _lock held; `force` re-reads the manifest even if its stat looks unchanged."""
+        full = False
+        for _ in range(3):
+            try:
+                stat = self.manifest_path.stat()
+                manifest_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            except FileNotFoundError:
+                manifest_stat = None
+            if manifest_stat == self._manifest_stat and not (force or full):
+                return False
+
+            manifest = self._read_manifest()
+            if not full and manifest["version"] == self.version and manifest["generation"] == self.generation:
+                self._manifest_stat = manifest_stat
+                return False
+
+            segments = manifest["segments"]
+            seen = self._manifest["segments"][:self._loaded_segments]
+            if full or manifest["generation"] != self.generation or segments[:len(seen)] != seen:
+                self.suspects, self._ids, self._loaded_segments = [], {}, 0
+                seen = []
+            try:
+                for segment in segments[len(seen):]:
+                    self._apply(self._read_segment(segment))
+            except FileNotFoundError:
+                full = True  # compacted away by another process after we read the manifest: reload
+                continue
+            self._manifest = manifest
+            self._manifest_stat = manifest_stat
+            self._loaded_segments = len(segments)
+            return True
+
+        self.suspects, self._ids, self._loaded_segments, self._manifest_stat = [], {}, 0, None
+        self._manifest = {"version": 0, "generation": 0, "compacted_from": 0, "segments": []}
+        raise RuntimeError(f"Suspect store {self.root} kept changing while it was being read")
+
+    # ----------------------------
+    # Writing
+    # ----------------------------
+    @contextmanager
+    def _writing(self):
+        """Serialize writers across threads and processes; the manifest is re-read under the lock."""
+        with self._lock, file_lock(self.lock_path):
+            self._refresh(force=True)
+            yield
+            self._refresh(force=True)
+
+    def _write_segment(self, records: list) -> dict:
+        self.root.mkdir(parents=True, exist_ok=True)
+        version = self._manifest["version"] + 1
+        filename = segment_name("segment", version, ".jsonl")
+        tmp_path = self.root / (filename + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.root / filename)
+        return {"file": filename, "version": version, "records": len(records)}
+
+    def _commit(self, segments: list, generation: int, compacted_from: int = None):
+        manifest = {
+            "version": self._manifest["version"] + 1,
+            "generation": generation,
+            "compacted_from": self.compacted_from if compacted_from is None else compacted_from,
+            "segments": segments,
+        }
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _dedupe(self, entries: list):
+        added, seen, duplicates, rejected = [], set(self._ids), 0, 0
+        for entry in entries:
+            record = normalize_suspect(entry)
+            if record is None:
+                rejected += 1
+            elif record["id"] in seen:
+                duplicates += 1
+            else:
+                seen.add(record["id"])
+                added.append(record)
+        return added, duplicates, rejected
+
+    def new_records(self, entries: list) -> list:
+        """Normalized records from `entries` that are not in the store yet (nothing is written)."""
+        self.refresh()
+        with self._lock:
+            return self._dedupe(entries)[0]
+
+    def append(self, entries: list) -> dict:
+        """
+        Normalize and de-duplicate `entries` (against the store and each other)
+        and write the new ones as one segment.
+        Returns {"added": [records], "duplicates": n, "rejected": n, "version": v}.
+        """
+        with self._writing():
+            added, duplicates, rejected = self._dedupe(entries)
+            if added:
+                segment = self._write_segment(added)
+                self._commit(self._manifest["segments"] + [segment], self.generation)
+        return {"added": added, "duplicates": duplicates, "rejected": rejected, "version": self.version}
+
+    def remove(self, ids: list) -> int:
+        """Append tombstones for the given suspect ids; returns how many were live."""
+        with self._writing():
+            live = [i for i in dict.fromkeys(ids) if i in self._ids]
+            if live:
+                segment = self._write_segment([{"id": i, "deleted": True} for i in live])
+                self._commit(self._manifest["segments"] + [segment], self.generation + 1)
+        return len(live)
+
+    def rollback(self, version: int) -> int:
+        """
+        Drop every segment written after `version`. The compacted segment
+        holds the state as of `compacted_from`; older versions no longer
+        exist and raise ValueError. Returns the number of segments dropped.
+        """
+        with self._writing():
+            if version < self.compacted_from:
+                raise ValueError(
+                    f"Cannot roll back to version {version}: versions before {self.compacted_from} were compacted"
+                )
+            segments = self._manifest["segments"]
+            keep = [s for s in segments if s["version"] <= version or "compacted_from" in s]
+            dropped = len(segments) - len(keep)
+            if dropped:
+                self._commit(keep, self.generation + 1)
+        return dropped
+
+    def compact(self) -> dict:
+        """Rewrite the live suspects as a single segment and delete the old segment files."""
+        with self._writing():
+            old = self._manifest["segments"]
+            if len(old) <= 1:
+                return {"segments_before": len(old), "segments_after": len(old), "suspects": len(self.suspects)}
+            segment = self._write_segment(self.suspects)
+            segment["compacted_from"] = self.version
+            self._commit([segment], self.generation + 1, compacted_from=self.version)
+            for s in old:
+                (self.root / s["file"]).unlink(missing_ok=True)
+        return {"segments_before": len(old), "segments_after": 1, "suspects": len(self.suspects)}
+
+    def status(self) -> dict:
+        self.refresh()
+        return {
+            "version": self.version,
+            "generation": self.generation,
+            "compacted_from": self.compacted_from,
+            "segments": len(self._manifest["segments"]),
+            "suspects": len(self.suspects),
+        }
@@ -1,102 +1,885 @@
 import os
+import copy
 import json
+import time
+import heapq
+import itertools
+import hashlib
+import threading
 import numpy as np
 from pathlib import Path
-from sklearn.metrics.pairwise import cosine_similarity
-from vertexai import init as vertex_init
-from vertexai.language_models import TextEmbeddingModel
+from .store import EmbeddingStore, content_key
+from .corpus import SuspectStore
+from .engine import SimilarityEngine, normalize_rows, select_top
+from .ann import IVFIndex
+from .quantize import QuantizedEngine
+from .shards import ShardedEngine, SHARD_WORKERS
+from .passages import PassageIndex, split_passages
+from .lexical import LexicalIndex
+from .cache import ResultCache, make_key
+from .metadata import MetadataIndex, normalize_filters, positions_of
+from ..embeddings import EmbeddingMicroBatcher, get_embedding_backend
 
 # ----------------------------
-# Vertex AI Setup (unchanged)
+# Embedding Backend (EMBEDDING_BACKEND=vertex|local, initialized on first use)
 # ----------------------------
-SA_PATH = Path("/etc/secrets/gcp_sa.json")
-if SA_PATH.exists():
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(SA_PATH)
-else:
-    SA_PATH = Path(r"C:/Users/hp/Desktop/agents/central-accord-475812-g4-6d21ba7b0230.json")
-    if not SA_PATH.exists():
-        raise RuntimeError(f"Service account JSON not found at {SA_PATH}")
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(SA_PATH)
+embedding_backend = get_embedding_backend()
+EMBEDDING_MODEL_NAME = embedding_backend.model_name
+EMBED_BATCH_SIZE = embedding_backend.max_batch_size
+# Coalesce concurrent embedding requests into shared get_embeddings calls
+EMBED_MICROBATCH = os.getenv("EMBED_MICROBATCH", "true").lower() in ["1", "true", "yes"]
 
-GOOGLE_APPLICATION_CREDENTIALS = os.environ["GOOGLE_APPLICATION_CREDENTIALS"].replace("\\", "/")
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_APPLICATION_CREDENTIALS
+INFRINGEMENT_THRESHOLD = 0.85
+DEFAULT_TOP_K = int(os.getenv("DETECT_TOP_K", 20))
 
-GCP_PROJECT_ID = "central-accord-475812-g4"
-GCP_LOCATION = "us-central1"
+# Search index: "exact" (brute-force matrix product) or "ivf" (approximate, for 100k+ suspects)
+DETECT_INDEX = os.getenv("DETECT_INDEX", "exact").lower()
+IVF_NLIST = int(os.getenv("DETECT_IVF_NLIST", 1024))
+IVF_NPROBE = int(os.getenv("DETECT_IVF_NPROBE", 16))
 
-vertex_init(project=GCP_PROJECT_ID, location=GCP_LOCATION)
-model = TextEmbeddingModel.from_pretrained("text-embedding-004")
+# Compact corpus vectors for exact search: float32 | float16 | int8, optional leading-dim truncation.
+# The top DETECT_RERANK_FACTOR * k candidates (at most DETECT_RERANK_MAX_SHORTLIST) are re-scored
+# in float32 from the embedding store. DETECT_RERANK_SLACK lowers the shortlist threshold (unset:
+# measured from the quantization error of the corpus).
+VECTOR_MODE = os.getenv("DETECT_VECTOR_MODE", "float32").lower()
+VECTOR_DIMS = int(os.getenv("DETECT_VECTOR_DIMS", 0)) or None
+RERANK_FACTOR = int(os.getenv("DETECT_RERANK_FACTOR", 4))
+RERANK_SLACK = float(os.getenv("DETECT_RERANK_SLACK")) if os.getenv("DETECT_RERANK_SLACK") else None
+RERANK_MAX_SHORTLIST = int(os.getenv("DETECT_RERANK_MAX_SHORTLIST", 2000))
+
+# Exact search split into DETECT_SHARDS memory-mapped shards scored by a process pool (0/1 = in-process)
+DETECT_SHARDS = int(os.getenv("DETECT_SHARDS", 0))
+
+# Lexical pre-filter: MinHash near-duplicates are confirmed before (and merged with) the embedding search
+LEXICAL_PREFILTER = os.getenv("DETECT_LEXICAL_PREFILTER", "true").lower() in ["1", "true", "yes"]
+LEXICAL_MIN_JACCARD = float(os.getenv("DETECT_LEXICAL_MIN_JACCARD", 0.8))
+
+# Chunked detection: overlapping passage windows (characters)
+PASSAGE_CHARS = int(os.getenv("DETECT_PASSAGE_CHARS", 800))
+PASSAGE_OVERLAP = int(os.getenv("DETECT_PASSAGE_OVERLAP", 200))
+
+# Lexical/metadata/IVF indexes are updated in memory on refresh and written to disk in the
+# background at most every DETECT_INDEX_SAVE_SECONDS (never while detections wait on the corpus lock)
+INDEX_SAVE_SECONDS = float(os.getenv("DETECT_INDEX_SAVE_SECONDS", 30))
+
+# Streaming detection: rows scored per block (sharded engines stream per shard)
+STREAM_BLOCK = int(os.getenv("DETECT_STREAM_BLOCK", 65536))
+
+# Metadata boost: ranking bonus for suspects matching the `boost` fields (reported similarity unchanged)
+METADATA_BOOST = float(os.getenv("DETECT_METADATA_BOOST", 0.05))
+
+# Result cache: LRU entries in memory (0 disables), optionally mirrored to disk
+RESULT_CACHE_SIZE = int(os.getenv("DETECT_RESULT_CACHE_SIZE", 1024))
+RESULT_CACHE_DISK = os.getenv("DETECT_RESULT_CACHE_DISK", "false").lower() in ["1", "true", "yes"]
+# Disk entries of other corpus versions (possibly still served by other workers) expire by age / LRU
+RESULT_CACHE_VERSION_TTL_SECONDS = float(os.getenv("DETECT_RESULT_CACHE_VERSION_TTL_SECONDS", 86400))
+RESULT_CACHE_MAX_VERSIONS = int(os.getenv("DETECT_RESULT_CACHE_MAX_VERSIONS", 8))
+
+# Everything besides the query and corpus that changes detection output
+DETECTION_SETTINGS = (
+    EMBEDDING_MODEL_NAME, INFRINGEMENT_THRESHOLD, DETECT_INDEX, IVF_NLIST, IVF_NPROBE,
+    VECTOR_MODE, VECTOR_DIMS, RERANK_FACTOR, RERANK_SLACK, RERANK_MAX_SHORTLIST,
+    LEXICAL_PREFILTER, LEXICAL_MIN_JACCARD, PASSAGE_CHARS, PASSAGE_OVERLAP, METADATA_BOOST,
+)
 
 # ----------------------------
-# Path to suspects.json
+# Suspect store (legacy suspects.json is imported once) + embedding store
 # ----------------------------
 BASE_DIR = Path(__file__).resolve().parent  # services/detect/
 SUSPECTS_PATH = BASE_DIR / "suspects.json"
+DATA_DIR = Path(os.getenv("DETECT_DATA_DIR", BASE_DIR / "data"))
+
+suspect_store = SuspectStore(DATA_DIR / "suspects")
+
+embedding_store = EmbeddingStore(DATA_DIR / "embeddings", EMBEDDING_MODEL_NAME)
+passage_store = EmbeddingStore(DATA_DIR / "passages", EMBEDDING_MODEL_NAME)
+ANN_INDEX_PATH = DATA_DIR / "ann" / f"{EMBEDDING_MODEL_NAME}-ivf.npz"
+LEXICAL_INDEX_PATH = DATA_DIR / "lexical" / "minhash.npz"
+METADATA_INDEX_PATH = DATA_DIR / "metadata" / "index.json"
+
+result_cache = ResultCache(
+    RESULT_CACHE_SIZE, DATA_DIR / "results" if RESULT_CACHE_DISK else None,
+    version_ttl_seconds=RESULT_CACHE_VERSION_TTL_SECONDS, max_versions=RESULT_CACHE_MAX_VERSIONS,
+)
+
+# ----------------------------
+# Embedding Helpers
+# ----------------------------
+embedding_batcher = EmbeddingMicroBatcher(embedding_backend.embed, max_batch_size=EMBED_BATCH_SIZE)
+
+
+def embed_texts(texts: list) -> np.ndarray:
+    """
+    Embed texts in model-sized batches and return a float32 (n, dim) matrix
+    (through the shared micro-batcher unless EMBED_MICROBATCH is off).
+    """
+    if EMBED_MICROBATCH:
+        return embedding_batcher.embed(texts)
+    return embedding_backend.embed(texts)
+
+
+def suspect_embedding_text(suspect: dict, include_url: bool = True) -> str:
+    """Text sent to the embedding model for a suspect: its text + tags + optionally URL."""
+    suspect_text = suspect.get("text", "")
+    suspect_tags = " ".join(suspect.get("tags", []))
+    suspect_url = suspect.get("url", "") if include_url else ""
+    return f"{suspect_text} {suspect_tags} {suspect_url}".strip()
+
+
+# ----------------------------
+# Search Index
+# ----------------------------
+def ivf_outgrown(index: IVFIndex, size: int) -> bool:
+    """True when an IVF index over `size` suspects needs a retrained quantizer."""
+    # ~40 vectors per list keeps k-means meaningful; retrain once the corpus has outgrown the quantizer
+    target_nlist = max(1, min(IVF_NLIST, size // 40))
+    return not target_nlist // 2 <= index.nlist <= IVF_NLIST
+
+
+def build_ivf_index(suspects: list, keys: list, vectors: np.ndarray, current: tuple = None):
+    """
+    Insert the suspects the IVF index has not seen yet into `current`
+    ((index, index keys) of the previous snapshot; default: the persisted
+    index). The index is rebuilt from scratch if any indexed suspect was
+    removed or changed. Returns (suspects and keys reordered to match index ids, index).
+    """
+    index, index_keys = current or (None, [])
+    if index is None and ANN_INDEX_PATH.exists():
+        try:
+            index, index_keys = IVFIndex.load(ANN_INDEX_PATH)
+            index.nprobe = IVF_NPROBE
+        except Exception as e:
+            print(f"[ANN] Could not load {ANN_INDEX_PATH}, rebuilding: {e}")
+
+    position = {key: i for i, key in enumerate(keys)}
+    if index is None or ivf_outgrown(index, len(position)) or any(k not in position for k in index_keys):
+        nlist = max(1, min(IVF_NLIST, len(position) // 40))
+        print(f"[ANN] Building IVF index over {len(position)} suspects (nlist={nlist})...")
+        index, index_keys = IVFIndex(vectors.shape[1], nlist=nlist, nprobe=IVF_NPROBE), []
+
+    indexed = set(index_keys)
+    new_keys = [k for k in dict.fromkeys(keys) if k not in indexed]
+    if new_keys:
+        index = copy.copy(index)  # add() swaps in new arrays; older snapshots keep searching theirs
+        index.add(vectors[[position[k] for k in new_keys]])
+        index_keys = index_keys + new_keys
+        print(f"[ANN] Inserted {len(new_keys)} suspects (index size {len(index)})")
+
+    return [suspects[position[k]] for k in index_keys], index_keys, index
+
+
+def build_lexical_index(suspects: list, keys: list, index: LexicalIndex = None):
+    """
+    Insert unseen suspects into `index` (the previous snapshot's; default:
+    the persisted index). Rebuilt from scratch if any indexed suspect was
+    removed. The index is append-only, so older snapshots can keep querying it.
+    """
+    if index is None and LEXICAL_INDEX_PATH.exists():
+        try:
+            index = LexicalIndex.load(LEXICAL_INDEX_PATH)
+        except Exception as e:
+            print(f"[Lexical] Could not load {LEXICAL_INDEX_PATH}, rebuilding: {e}")
+
+    position = {key: i for i, key in enumerate(keys)}
+    if index is None or any(k not in position for k in index.keys):
+        index = LexicalIndex()
+
+    indexed = set(index.keys)
+    new_keys = [k for k in dict.fromkeys(keys) if k not in indexed]
+    if new_keys:
+        index.add(new_keys, [suspects[position[k]].get("text", "") for k in new_keys])
+        print(f"[Lexical] Fingerprinted {len(new_keys)} suspects (index size {len(index)})")
+    return index
+
+
+def build_metadata_index(suspects: list, index: MetadataIndex = None, full: bool = False):
+    """
+    Add newly appended suspects to `index` (the previous snapshot's), or
+    (full=True) sync a fresh index with the whole corpus; the persisted index
+    is only read when there is no previous one. Older snapshots can keep
+    matching against an index that was added to: they drop unknown ids.
+    """
+    if full:
+        loaded = None
+        if index is None and METADATA_INDEX_PATH.exists():
+            try:
+                loaded = MetadataIndex.load(METADATA_INDEX_PATH)
+            except Exception as e:
+                print(f"[Metadata] Could not load {METADATA_INDEX_PATH}, rebuilding: {e}")
+        # Never sync (remove from) an index older snapshots still use
+        index = loaded if loaded is not None else MetadataIndex()
+        changes = index.sync(suspects)
+    else:
+        changes = index.add(suspects)
+    if any(changes.values()):
+        print(f"[Metadata] Indexed {changes['added']} new, {changes['updated']} changed, "
+              f"{changes['removed']} removed suspects (index size {len(index)})")
+    return index
+
+
+class IndexPersister:
+    """
+    Writes the lexical, metadata and IVF indexes of the newest snapshot to
+    disk from a background thread, at most every `interval` seconds, so a
+    refresh never waits on (or holds the corpus lock during) a full rewrite.
+    """
+
+    def __init__(self, interval: float = INDEX_SAVE_SECONDS):
+        self.interval = interval
+        self._pending = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, snapshot):
+        with self._lock:
+            self._pending = snapshot
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="detect-index-save", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.flush():
+                return
+
+    def flush(self) -> bool:
+        """Save the pending snapshot now. Returns False if there was nothing to save."""
+        with self._lock:
+            snapshot, self._pending = self._pending, None
+            if snapshot is None:
+                self._thread = None
+                return False
+        started = time.perf_counter()
+        if snapshot.lexical is not None:
+            snapshot.lexical.save(LEXICAL_INDEX_PATH, limit=snapshot.lexical_size)
+        snapshot.metadata.save(METADATA_INDEX_PATH, ids=snapshot.id_positions)
+        if isinstance(snapshot.engine, IVFIndex):
+            snapshot.engine.save(ANN_INDEX_PATH, snapshot.keys)
+        print(f"[Detect] Saved corpus indexes for version {snapshot.version} "
+              f"in {(time.perf_counter() - started):.2f}s")
+        return True
+
+
+index_persister = IndexPersister()
+
+
+def _rerank_from_store(keys: list):
+    """rerank_fn for QuantizedEngine: full float32 vectors of corpus rows from the embedding store."""
+    return lambda ids: embedding_store.get_many([keys[i] for i in ids])
+
+
+# ----------------------------
+# Pipeline Counters
+# ----------------------------
+_stats_lock = threading.Lock()
+detection_stats = {
+    "detections": 0,
+    "lexical_exact_hits": 0,
+    "lexical_near_duplicate_hits": 0,
+    "metadata_filtered_detections": 0,
+    "metadata_candidates_scored": 0,
+}
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            detection_stats[name] += value
+
+
+def get_detection_stats() -> dict:
+    """Snapshot of detection pipeline counters."""
+    with _stats_lock:
+        return dict(detection_stats)
+
+
+# ----------------------------
+# Suspect Corpus (loaded once, refreshed when the suspect store changes)
+# ----------------------------
+class CorpusSnapshot:
+    """
+    One consistent view of the corpus: suspects, search engine, content keys,
+    key/id -> position maps, lexical and metadata indexes and the version.
+    load_corpus() swaps in a new snapshot when the store changes; a detection
+    keeps the one it started with, so positions, vectors and the result-cache
+    version always agree even if an ingestion lands mid-request. Read-only.
+    """
+
+    def __init__(self, suspects: list, engine, keys: list, lexical, metadata, version: str,
+                 include_suspect_urls: bool = True):
+        self.suspects = suspects
+        self.engine = engine
+        self.keys = keys
+        self.lexical = lexical
+        self.lexical_size = len(lexical) if lexical is not None else 0  # the index may grow after this snapshot
+        self.metadata = metadata
+        self.version = version
+        self.include_suspect_urls = include_suspect_urls
+        self.positions = {key: i for i, key in enumerate(keys)}
+        self.id_positions = {s["id"]: i for i, s in enumerate(suspects)}
+        self._passages = None  # PassageIndex, built on the first chunked detection
+        self._passages_lock = threading.Lock()
+
+
+_corpus_lock = threading.Lock()
+_corpus = {"signature": None, "snapshot": None, "source_count": 0}
+
+
+def suspect_content_key(suspect: dict, include_suspect_urls: bool = True) -> str:
+    return content_key(
+        EMBEDDING_MODEL_NAME,
+        suspect.get("text", ""),
+        suspect.get("tags", []),
+        suspect.get("url", "") if include_suspect_urls else "",
+    )
+
+
+def import_legacy_suspects():
+    """Seed an empty suspect store from suspects.json (first run after upgrading)."""
+    if suspect_store.exists() or not SUSPECTS_PATH.exists():
+        return
+    with open(SUSPECTS_PATH) as f:
+        report = suspect_store.append(json.load(f))
+    print(f"📦 Imported {len(report['added'])} suspects from {SUSPECTS_PATH.name} into the suspect store.")
+
+
+def ingest_suspects(entries: list) -> dict:
+    """
+    Add suspects to the corpus: entries are normalized and de-duplicated,
+    new ones are embedded in one batch, then written as a new store segment.
+    Running detectors pick the segment up on their next call.
+    """
+    import_legacy_suspects()
+    records = suspect_store.new_records(entries)
+    if records:
+        print(f"🧠 Embedding {len(records)} new suspects...")
+        embedding_store.ensure(
+            [suspect_content_key(s) for s in records],
+            [suspect_embedding_text(s) for s in records],
+            embed_texts,
+        )
+    report = suspect_store.append(entries)
+    print(f"📥 Ingested {len(report['added'])} suspects "
+          f"({report['duplicates']} duplicates, {report['rejected']} rejected); store version {report['version']}.")
+    return {
+        "added": len(report["added"]),
+        "duplicates": report["duplicates"],
+        "rejected": report["rejected"],
+        "version": report["version"],
+        "ids": [s["id"] for s in report["added"]],
+    }
+
+
+def load_corpus(include_suspect_urls: bool = True) -> CorpusSnapshot:
+    """
+    Return the CorpusSnapshot for the current suspect store version (with
+    the lexical/metadata indexes refreshed alongside it).
+    Segments appended since the last call are applied incrementally (only
+    they are read, embedded and added to the search engine and the
+    lexical/metadata indexes); compaction, deletion or rollback triggers a
+    full rebuild from the store (embeddings still come from the embedding
+    store). The indexes are saved to disk in the background (IndexPersister).
+    """
+    with _corpus_lock:
+        import_legacy_suspects()
+        suspect_store.refresh()
+        signature = (suspect_store.generation, suspect_store.version, include_suspect_urls)
+        current = _corpus["snapshot"]
+        if _corpus["signature"] == signature:
+            return current
+
+        source = list(suspect_store.suspects)
+        previous = _corpus["signature"]
+        new = source[_corpus["source_count"]:]
+        appended = (
+            previous is not None
+            and previous[0] == signature[0]
+            and previous[2] == include_suspect_urls
+            and type(current.engine) in (SimilarityEngine, ShardedEngine, QuantizedEngine, IVFIndex)
+            and not (isinstance(current.engine, IVFIndex)
+                     and ivf_outgrown(current.engine, len(current.keys) + len(new)))
+        )
+
+        if appended:
+            print(f"📄 Picked up {len(new)} new suspect entries.")
+            new_keys = [suspect_content_key(s, include_suspect_urls) for s in new]
+            if isinstance(current.engine, IVFIndex):
+                # IVF ids are one per content key (like a full build): skip texts already indexed
+                first = {}
+                for s, key in zip(new, new_keys):
+                    if key not in current.positions:
+                        first.setdefault(key, s)
+                new, new_keys = list(first.values()), list(first)
+            texts = [suspect_embedding_text(s, include_suspect_urls) for s in new]
+            # Copy so in-flight searches keep a matrix consistent with their suspects list
+            engine = copy.copy(current.engine)
+            if new:
+                engine.add(embedding_store.ensure(new_keys, texts, embed_texts))
+            suspects = current.suspects + new
+            keys = current.keys + new_keys
+            if isinstance(engine, QuantizedEngine):
+                engine.rerank_fn = _rerank_from_store(keys)
+            metadata = build_metadata_index(new, current.metadata)
+        else:
+            suspects = source
+            print(f"📄 Loaded {len(suspects)} suspect entries.")
+            keys = [suspect_content_key(s, include_suspect_urls) for s in suspects]
+            texts = [suspect_embedding_text(s, include_suspect_urls) for s in suspects]
+            vectors = embedding_store.ensure(keys, texts, embed_texts)
+            if DETECT_INDEX == "ivf" and len(suspects):
+                reuse = current and isinstance(current.engine, IVFIndex)
+                suspects, keys, engine = build_ivf_index(
+                    suspects, keys, vectors, (current.engine, current.keys) if reuse else None
+                )
+            elif (VECTOR_MODE != "float32" or VECTOR_DIMS) and len(suspects):
+                engine = QuantizedEngine(
+                    vectors,
+                    mode=VECTOR_MODE,
+                    dims=VECTOR_DIMS,
+                    rerank_fn=_rerank_from_store(keys),
+                    rerank_factor=RERANK_FACTOR,
+                    rerank_slack=RERANK_SLACK,
+                    max_rerank=RERANK_MAX_SHORTLIST,
+                )
+                print(f"[Quantize] {VECTOR_MODE} x {engine.dims} dims, rerank slack {engine.rerank_slack:.4f}")
+            elif DETECT_SHARDS > 1 and len(suspects):
+                engine = ShardedEngine(vectors, DATA_DIR / "shards", shards=DETECT_SHARDS, workers=SHARD_WORKERS)
+                print(f"[Shards] {len(engine.shards)} shards over {len(engine)} suspects")
+            else:
+                engine = SimilarityEngine(vectors, dim=embedding_store.dim)
+            metadata = build_metadata_index(suspects, current.metadata if current else None, full=True)
+
+        lexical = None
+        if LEXICAL_PREFILTER:
+            lexical = build_lexical_index(suspects, keys, current.lexical if current else None)
+
+        # Corpus version: changes whenever a suspect (or its metadata) is added, removed or edited
+        fingerprint = json.dumps([keys, [metadata.fields[s["id"]] for s in suspects]])
+        version = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+        result_cache.set_version(version)
+
+        snapshot = CorpusSnapshot(suspects, engine, keys, lexical, metadata, version, include_suspect_urls)
+        _corpus.update(signature=signature, snapshot=snapshot, source_count=len(source))
+        index_persister.schedule(snapshot)
+        return snapshot
+
+
+def lexical_prefilter(corpus: CorpusSnapshot, text: str, candidates: np.ndarray = None) -> dict:
+    """
+    Near-duplicate suspects of `text` from the MinHash/LSH index (optionally
+    only among the `candidates` positions), as {position: (estimated Jaccard,
+    "exact" | "near_duplicate")}. Empty when the pre-filter is disabled.
+    """
+    lexical, positions = corpus.lexical, corpus.positions
+    if lexical is None:
+        return {}
+
+    allowed = set(candidates.tolist()) if candidates is not None else None
+    matches = {}
+    for key, jaccard, match_type in lexical.query(text, min_jaccard=LEXICAL_MIN_JACCARD, limit=corpus.lexical_size):
+        if allowed is None or positions[key] in allowed:
+            matches[positions[key]] = (jaccard, match_type)
+
+    if matches:
+        _count(
+            lexical_exact_hits=sum(m == "exact" for _, m in matches.values()),
+            lexical_near_duplicate_hits=sum(m == "near_duplicate" for _, m in matches.values()),
+        )
+    return matches
+
+
+def metadata_positions(corpus: CorpusSnapshot, filters: dict, require_all: bool = True):
+    """
+    Corpus positions of suspects matching `filters` ({"tags": [...], "jurisdiction": [...],
+    "category": [...], "domain": [...]}), or None when no filter is given.
+    """
+    if not normalize_filters(filters):
+        return None
+    # The index may already hold suspects appended after this snapshot; positions_of drops them
+    return positions_of(corpus.metadata.match(filters, require_all=require_all), corpus.id_positions)
+
+
+def score_positions(corpus: CorpusSnapshot, query_vector, candidates: np.ndarray, k: int = None,
+                    threshold: float = None):
+    """Exact [(position, similarity)] of a query against a subset of the corpus (vectors from the store)."""
+    if candidates.size == 0:
+        return []
+    keys = corpus.keys
+    vectors = normalize_rows(embedding_store.get_many([keys[i] for i in candidates]))
+    query = normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+    return select_top(vectors @ query, k=k, threshold=threshold, ids=candidates)
+
+
+def embed_passages(text: str, spans: list) -> np.ndarray:
+    """
+    Embed passages of a query `text`. Not stored: the passage store holds
+    suspect passages only and would otherwise grow with every chunked query.
+    """
+    return embed_texts([text[start:end] for start, end in spans])
+
+
+def load_passage_index(corpus: CorpusSnapshot):
+    """Return the PassageIndex over all suspect passages of `corpus`, built once per snapshot."""
+    with corpus._passages_lock:
+        suspects = corpus.suspects
+        if corpus._passages is not None:
+            return corpus._passages
+
+        owners, spans, texts = [], [], []
+        for idx, s in enumerate(suspects):
+            text = s.get("text", "")
+            for start, end in split_passages(text, PASSAGE_CHARS, PASSAGE_OVERLAP):
+                owners.append(idx)
+                spans.append((start, end))
+                texts.append(text[start:end])
+
+        keys = [content_key(EMBEDDING_MODEL_NAME, t) for t in texts]
+        vectors = passage_store.ensure(keys, texts, embed_texts)
+        passages = PassageIndex(vectors, owners, spans)
+        print(f"[Passages] Indexed {len(passages)} passages across {len(suspects)} suspects")
+
+        corpus._passages = passages
+        return passages
+
+
+def run_chunked_detection(corpus: CorpusSnapshot, registered_text: str, top_k: int, min_similarity: float,
+                          candidates: np.ndarray = None):
+    """
+    Passage-level matching: every registered passage vs every suspect passage,
+    in batch (optionally only against the `candidates` suspect positions).
+    """
+    suspects, passages = corpus.suspects, load_passage_index(corpus)
+
+    query_spans = split_passages(registered_text, PASSAGE_CHARS, PASSAGE_OVERLAP)
+    print(f"🧠 Embedding {len(query_spans)} registered passages...")
+    query_vectors = embed_passages(registered_text, query_spans)
+
+    results = []
+    for m in passages.best_pairs(query_vectors, k=top_k, threshold=min_similarity, suspects=candidates):
+        s = suspects[m["suspect"]]
+        q_start, q_end = query_spans[m["query_passage"]]
+        s_start, s_end = (int(v) for v in passages.spans[m["suspect_passage"]])
+        result = _detection_result(s, m["suspect"], m["similarity"])
+        result.update(excerpt=s["text"][s_start:s_end], registered_span=[q_start, q_end], suspect_span=[s_start, s_end])
+        results.append(result)
+    return results
 
 # ----------------------------
 # Detection Logic as Function
 # ----------------------------
+def combine_query_text(registered_text: str = None, metadata_description: str = "", metadata_tags: list = None) -> str:
+    """Registered text plus metadata description and tags, as sent to the embedding model."""
+    combined_text = registered_text or ""
+    if metadata_description:
+        combined_text += f" {metadata_description}"
+    if metadata_tags:
+        combined_text += " " + " ".join(metadata_tags)
+    return combined_text
+
+
+def _detection_result(suspect: dict, idx: int, similarity: float) -> dict:
+    """One detection result; `similarity` is always the embedding (cosine) score."""
+    return {
+        "url": suspect["url"],
+        "text": suspect["text"],
+        "similarity": round(similarity, 3),
+        "infringement": similarity > INFRINGEMENT_THRESHOLD,
+        "match_type": "semantic",
+        "suspect_index": idx,
+    }
+
+
+def _mark_lexical(result: dict, lexical: dict) -> dict:
+    """Tag a result the lexical pre-filter confirmed with its match type and Jaccard estimate."""
+    if result["suspect_index"] in lexical:
+        jaccard, match_type = lexical[result["suspect_index"]]
+        result.update(match_type=match_type, lexical_similarity=round(jaccard, 3))
+    return result
+
+
+def _merge_lexical(semantic: list, lexical: dict, score_missing) -> list:
+    """
+    Merge lexical confirmations into the embedding results (strongest first).
+    Confirmed suspects that fell outside the semantic top-k / threshold are
+    scored with `score_missing(positions) -> [results]` and always reported.
+    """
+    found = {r["suspect_index"] for r in semantic}
+    missing = [idx for idx in lexical if idx not in found]
+    results = semantic + (score_missing(np.array(missing, dtype=np.int64)) if missing else [])
+    return sorted((_mark_lexical(r, lexical) for r in results), key=lambda r: -r["similarity"])
+
+
+def detection_cache_key(corpus: CorpusSnapshot, combined_text: str, query_text: str,
+                        top_k: int, min_similarity: float, chunked: bool,
+                        filters: dict = None, boost: dict = None) -> str:
+    """Result-cache key: query content + corpus version + threshold/mode/filter settings."""
+    return make_key(
+        combined_text, query_text, corpus.version, corpus.include_suspect_urls,
+        top_k, min_similarity, chunked, normalize_filters(filters), normalize_filters(boost),
+        DETECTION_SETTINGS,
+    )
+
+
+def _boost_ranking(results: list, boosted: np.ndarray) -> list:
+    """Re-rank results so suspects in `boosted` get METADATA_BOOST on top of their similarity."""
+    boosted = set(boosted.tolist())
+    return sorted(results, key=lambda r: -(r["similarity"] + (METADATA_BOOST if r["suspect_index"] in boosted else 0)))
+
+
 def run_detection(
     registered_text: str = None,
     metadata_description: str = "",
     metadata_tags: list = None,
-    include_suspect_urls: bool = True
+    include_suspect_urls: bool = True,
+    top_k: int = DEFAULT_TOP_K,
+    min_similarity: float = None,
+    chunked: bool = False,
+    filters: dict = None,
+    boost: dict = None
 ):
     """
     Run detection on suspects.json against registered_text plus optional
     metadata description and tags for more accurate matching.
     
     Optionally includes suspect URLs in embeddings for higher accuracy.
-    """
-    metadata_tags = metadata_tags or []
+    Only the `top_k` strongest suspects (and/or those scoring at least
+    `min_similarity`) are returned, strongest first.
 
-    # Combine text with metadata description and tags for embedding
-    combined_text = registered_text or ""
-    if metadata_description:
-        combined_text += f" {metadata_description}"
-    if metadata_tags:
-        combined_text += " " + " ".join(metadata_tags)
+    With `chunked=True`, texts are split into overlapping passages and each
+    result carries the best-matching passage pair (`excerpt`,
+    `registered_span`, `suspect_span` character offsets).
 
-    with open(SUSPECTS_PATH) as f:
-        suspects = json.load(f)
+    `filters` ({"tags", "jurisdiction", "category", "domain"} -> values)
+    restricts scoring to suspects matching every given field (any listed
+    value); `boost` ranks suspects matching any of its fields higher.
 
-    print(f"📄 Loaded {len(suspects)} suspect entries.")
+    Results are cached per query, corpus version and settings (see
+    DETECT_RESULT_CACHE_*), so re-checking an unchanged asset is free until
+    the corpus changes.
+    """
+    combined_text = combine_query_text(registered_text, metadata_description, metadata_tags)
 
-    # Prepare texts to embed: include suspect text + their tags + optionally URL
-    texts_to_embed = [combined_text]
-    for s in suspects:
-        suspect_text = s.get("text", "")
-        suspect_tags = " ".join(s.get("tags", []))
-        suspect_url = s.get("url", "") if include_suspect_urls else ""
-        combined_suspect = f"{suspect_text} {suspect_tags} {suspect_url}".strip()
-        texts_to_embed.append(combined_suspect)
+    # Offsets in chunked mode refer to the registered text itself (falls back to metadata if there is no text)
+    query_text = registered_text or combined_text
+    corpus = load_corpus(include_suspect_urls)
+    suspects, engine = corpus.suspects, corpus.engine
 
-    print("🧠 Generating embeddings in one batch call...")
-    embeddings = model.get_embeddings(texts_to_embed)
+    cache_key = detection_cache_key(
+        corpus, combined_text, query_text, top_k, min_similarity, chunked, filters, boost
+    )
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print("♻️ Detection result served from cache.")
+        return cached
+    _count(detections=1)
 
-    registered_emb = embeddings[0].values
-    suspect_embs = embeddings[1:]
+    # Metadata filter: only suspects matching the requested fields are scored
+    candidates = metadata_positions(corpus, filters)
+    boosted = metadata_positions(corpus, boost, require_all=False)
+    if candidates is not None:
+        _count(metadata_filtered_detections=1, metadata_candidates_scored=len(candidates))
+        if boosted is not None:
+            boosted = np.intersect1d(boosted, candidates)
 
-    results = []
-    for s, emb in zip(suspects, suspect_embs):
-        similarity = cosine_similarity(
-            np.array(registered_emb).reshape(1, -1),
-            np.array(emb.values).reshape(1, -1)
-        )[0][0]
-
-        result = {
-            "url": s["url"],
-            "text": s["text"],
-            "similarity": round(float(similarity), 3),
-            "infringement": similarity > 0.85
-        }
+    # Lexical pre-filter: near-verbatim copies are confirmed up front; every suspect is still scored by cosine
+    lexical = lexical_prefilter(corpus, query_text, candidates)
 
-        results.append(result)
+    if chunked:
+        semantic = run_chunked_detection(corpus, query_text, top_k, min_similarity, candidates)
+        results = _merge_lexical(semantic, lexical, lambda missing: run_chunked_detection(
+            corpus, query_text, None, None, missing))
+    else:
+        print("🧠 Generating embedding for registered text...")
+        registered_emb = embed_texts([combined_text])[0]
 
-        if similarity > 0.85:
-            print(f"⚠️ Potential infringement detected for {s['url']}")
+        if candidates is None:
+            hits = dict(engine.search(registered_emb, k=top_k, threshold=min_similarity))
         else:
-            print(f"✅ No infringement for {s['url']}")
+            hits = dict(score_positions(corpus, registered_emb, candidates, k=top_k, threshold=min_similarity))
+        if boosted is not None:
+            # Boosted suspects compete even if they fell just outside the plain top-k
+            hits.update(score_positions(corpus, registered_emb, boosted, k=top_k, threshold=min_similarity))
+        semantic = [_detection_result(suspects[idx], idx, similarity) for idx, similarity in hits.items()]
+        results = _merge_lexical(semantic, lexical, lambda missing: [
+            _detection_result(suspects[idx], idx, similarity)
+            for idx, similarity in score_positions(corpus, registered_emb, missing)
+        ])
+
+    if boosted is not None:
+        results = _boost_ranking(results, boosted)
+    results = results[:top_k] if top_k else results
+
+    flagged = sum(r["infringement"] for r in results)
+    print(f"🏁 Detection completed: scored {len(suspects)} suspects, {flagged} potential infringement(s).")
+    result = {"registered_text": combined_text, "results": _public(results)}
+    result_cache.put(cache_key, result)
+    return result
+
+
+def _iter_engine(engine, vector, k: int, threshold: float):
+    """Hits per block of rows (exact engine) or per shard; other engines answer in one block."""
+    if isinstance(engine, SimilarityEngine):
+        yield from engine.iter_search(vector, k=k, threshold=threshold, block=STREAM_BLOCK)
+    elif isinstance(engine, ShardedEngine):
+        yield from engine.iter_search(vector, k=k, threshold=threshold)
+    else:
+        yield engine.search(vector, k=k, threshold=threshold)
+
+
+def iter_detection(
+    registered_text: str = None,
+    metadata_description: str = "",
+    metadata_tags: list = None,
+    include_suspect_urls: bool = True,
+    top_k: int = DEFAULT_TOP_K,
+    min_similarity: float = None,
+    chunked: bool = False,
+    filters: dict = None,
+    boost: dict = None
+):
+    """
+    Streaming run_detection: yields ("match", result) as each block or shard
+    of the corpus is scored, then one ("summary", {...}) event.
+    Lexical confirmations come first (scored by cosine like every other
+    suspect); a hit is emitted when it enters the running top-k, so with a
+    top_k those matches carry `provisional: True`: they are not ranked
+    across blocks and may be pushed out later. The summary's `results` are
+    the final top-k, strongest first. Only the top-k is retained.
+    Chunked and filtered/boosted queries are scored in one pass (their
+    matches are final).
+    """
+    if chunked or normalize_filters(filters) or normalize_filters(boost):
+        result = run_detection(registered_text, metadata_description, metadata_tags, include_suspect_urls,
+                               top_k, min_similarity, chunked, filters, boost)
+        for r in result["results"]:
+            yield "match", r
+        yield "summary", {"blocks": 1, "emitted": len(result["results"]), "results": result["results"]}
+        return
+
+    combined_text = combine_query_text(registered_text, metadata_description, metadata_tags)
+    query_text = registered_text or combined_text
+    corpus = load_corpus(include_suspect_urls)
+    suspects, engine = corpus.suspects, corpus.engine
+
+    cache_key = detection_cache_key(corpus, combined_text, query_text, top_k, min_similarity, False)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        for r in cached["results"]:
+            yield "match", r
+        yield "summary", {"blocks": 0, "emitted": len(cached["results"]), "cached": True, "results": cached["results"]}
+        return
+    _count(detections=1)
+
+    lexical = lexical_prefilter(corpus, query_text)
+    registered_emb = embed_texts([combined_text])[0]
+    # Lexical confirmations are scored exactly and streamed before the corpus scan
+    confirmed = score_positions(corpus, registered_emb, np.array(list(lexical), dtype=np.int64))
+    blocks, emitted = 0, 0
+
+    top = []  # min-heap of (similarity, idx) holding the running top-k
+    for hits in itertools.chain([confirmed], _iter_engine(engine, registered_emb, top_k, min_similarity)):
+        blocks += hits is not confirmed
+        for idx, similarity in hits:
+            if idx in lexical and hits is not confirmed:
+                continue
+            if top_k:
+                if len(top) == top_k and similarity <= top[0][0]:
+                    continue
+                if len(top) == top_k:
+                    heapq.heapreplace(top, (similarity, idx))
+                else:
+                    heapq.heappush(top, (similarity, idx))
+            emitted += 1
+            match = _public([_mark_lexical(_detection_result(suspects[idx], idx, similarity), lexical)])[0]
+            yield "match", {**match, "provisional": bool(top_k)}
+
+    results = _public([
+        _mark_lexical(_detection_result(suspects[idx], idx, similarity), lexical)
+        for similarity, idx in sorted(top, reverse=True)
+    ])
+    if top_k:
+        result_cache.put(cache_key, {"registered_text": combined_text, "results": results})
+    print(f"🏁 Streamed detection completed: {blocks} block(s) over {len(suspects)} suspects, {emitted} match event(s).")
+    yield "summary", {"blocks": blocks, "emitted": emitted, "results": results if top_k else None}
+
+
+def run_detection_batch(
+    items: list,
+    include_suspect_urls: bool = True,
+    top_k: int = DEFAULT_TOP_K,
+    min_similarity: float = None
+):
+    """
+    Detect many assets at once. `items` is a list of dicts with the
+    run_detection arguments (registered_text, metadata_description,
+    metadata_tags, filters, boost). All registered texts not answered from
+    the cache are embedded together (EMBED_BATCH_SIZE per request)
+    and scored against the corpus with one matrix product. Items already in
+    the result cache are answered from it; items with metadata filters/boosts
+    score their own candidate set and go through run_detection.
+    Returns one {"registered_text", "results"} dict per item, in order.
+    """
+    corpus = load_corpus(include_suspect_urls)
+    suspects, engine = corpus.suspects, corpus.engine
+
+    routed = {
+        pos: run_detection(**item, include_suspect_urls=include_suspect_urls, top_k=top_k, min_similarity=min_similarity)
+        for pos, item in enumerate(items)
+        if normalize_filters(item.get("filters")) or normalize_filters(item.get("boost"))
+    }
+
+    combined = [
+        combine_query_text(i.get("registered_text"), i.get("metadata_description", ""), i.get("metadata_tags"))
+        for i in items
+    ]
+    query_texts = [item.get("registered_text") or combined[pos] for pos, item in enumerate(items)]
+    cache_keys = [
+        detection_cache_key(corpus, combined[pos], query_texts[pos], top_k, min_similarity, False)
+        for pos in range(len(items))
+    ]
+    cached = {}
+    for pos, key in enumerate(cache_keys):
+        hit = result_cache.get(key) if pos not in routed else None
+        if hit is not None:
+            cached[pos] = hit
+    _count(detections=len(items) - len(cached) - len(routed))
+    from_cache = len(cached)
+    cached.update(routed)
+
+    pending = [pos for pos in range(len(items)) if pos not in cached]  # items that need the embedding path
+    lexical = {pos: lexical_prefilter(corpus, query_texts[pos]) for pos in pending}
+
+    semantic = {}
+    if pending:
+        print(f"🧠 Embedding {len(pending)} registered texts in batch...")
+        vectors = embed_texts([combined[pos] for pos in pending])
+        for pos, vector, hits in zip(pending, vectors, engine.search_batch(vectors, k=top_k, threshold=min_similarity)):
+            semantic[pos] = _merge_lexical(
+                [_detection_result(suspects[idx], idx, sim) for idx, sim in hits],
+                lexical[pos],
+                lambda missing, vector=vector: [
+                    _detection_result(suspects[idx], idx, sim) for idx, sim in score_positions(corpus, vector, missing)
+                ],
+            )
+
+    batch_results = []
+    for pos in range(len(items)):
+        if pos in cached:
+            batch_results.append(cached[pos])
+            continue
+        results = semantic[pos][:top_k] if top_k else semantic[pos]
+        result = {"registered_text": combined[pos], "results": _public(results)}
+        result_cache.put(cache_keys[pos], result)
+        batch_results.append(result)
+
+    print(f"🏁 Batch detection completed: {len(items)} assets ({from_cache} from cache) "
+          f"against {len(suspects)} suspects.")
+    return batch_results
+
 
-    print("🏁 Detection completed.")
-    return {"registered_text": combined_text, "results": results}
+def _public(results: list) -> list:
+    """Drop internal bookkeeping fields from detection results."""
+    for r in results:
+        r.pop("suspect_index", None)
+    return results
@@ -0,0 +1,88 @@
+import numpy as np
+
+# ----------------------------
+# Vectorized Similarity Engine
+# ----------------------------
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return a C-contiguous float32 copy of `vectors` with unit-length rows."""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2, order="C")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def select_top(scores: np.ndarray, k: int = None, threshold: float = None, ids: np.ndarray = None):
+    """
+    Pick the best hits from a 1-D score vector without sorting all of it.
+    Returns a list of (id, score) sorted by descending score, limited to the
+    top `k` (argpartition) and/or scores >= `threshold`.
+    """
+    if ids is None:
+        ids = np.arange(scores.shape[0])
+
+    if threshold is not None:
+        keep = np.flatnonzero(scores >= threshold)
+        scores, ids = scores[keep], ids[keep]
+
+    if k is not None and 0 < k < scores.shape[0]:
+        part = np.argpartition(-scores, k - 1)[:k]
+        scores, ids = scores[part], ids[part]
+
+    order = np.argsort(-scores, kind="stable")
+    return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+class SimilarityEngine:
+    """
+    Keeps suspect vectors pre-normalized in one contiguous float32 matrix and
+    scores a query (or batch of queries) with a single matrix product.
+    """
+
+    def __init__(self, vectors=None, dim: int = None):
+        if vectors is not None and len(vectors):
+            self.matrix = normalize_rows(vectors)
+        else:
+            self.matrix = np.zeros((0, dim or 0), dtype=np.float32)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def add(self, vectors):
+        """Append vectors (normalized on the way in). Returns the ids assigned to them."""
+        new_rows = normalize_rows(vectors)
+        start = len(self)
+        if start == 0:
+            self.matrix = new_rows
+        else:
+            self.matrix = np.concatenate([self.matrix, new_rows])
+        return np.arange(start, len(self))
+
+    def scores(self, queries) -> np.ndarray:
+        """Cosine similarity of each query against every stored vector: (q, n)."""
+        return normalize_rows(queries) @ self.matrix.T
+
+    def iter_search(self, query, k: int = None, threshold: float = None, block: int = 65536):
+        """Like search(), one block of rows at a time: yields each block's hits (corpus-wide ids)."""
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        for start in range(0, len(self), block):
+            scores = self.matrix[start:start + block] @ query
+            yield select_top(scores, k=k, threshold=threshold, ids=np.arange(start, start + scores.shape[0]))
+
+    def search(self, query, k: int = None, threshold: float = None):
+        """Top-k / above-threshold hits for one query as [(id, score), ...]."""
+        return self.search_batch(np.asarray(query).reshape(1, -1), k=k, threshold=threshold)[0]
+
+    def search_batch(self, queries, k: int = None, threshold: float = None):
+        """Top-k / above-threshold hits for each row of `queries`."""
+        queries = np.array(queries, dtype=np.float32, ndmin=2)
+        if len(self) == 0:
+            return [[] for _ in range(queries.shape[0])]
+        all_scores = self.scores(queries)
+        return [select_top(row, k=k, threshold=threshold) for row in all_scores]
@@ -0,0 +1,111 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------------------
+# Detection Executor (bounded worker pool + admission control)
+# ----------------------------
+# Detection does blocking work (embedding HTTP calls, file loads, NumPy), so it
+# runs on a dedicated pool instead of the event loop. Requests beyond
+# `workers + max_queue` are rejected up front instead of piling up.
+
+DETECT_WORKERS = int(os.getenv("DETECT_WORKERS", 2))
+DETECT_MAX_QUEUE = int(os.getenv("DETECT_MAX_QUEUE", 16))
+TIMING_WINDOW = 1000  # recent samples kept for wait/run percentiles
+
+
+class DetectionOverloaded(Exception):
+    """Raised when the detection queue is full. `retry_after` is a hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Detection queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class DetectionExecutor:
+    def __init__(self, workers: int = DETECT_WORKERS, max_queue: int = DETECT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detect")
+        self._lock = threading.Lock()
+        self._pending = 0   # queued + running
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_ms = deque(maxlen=TIMING_WINDOW)
+        self._run_ms = deque(maxlen=TIMING_WINDOW)
+
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely free, from recent run times."""
+        avg_run_s = (sum(self._run_ms) / len(self._run_ms) / 1000) if self._run_ms else 1.0
+        queued = max(0, self._pending - self.workers)
+        return max(1, math.ceil(avg_run_s * (queued + 1) / self.workers))
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Admit `fn(*args, **kwargs)` to the pool and return an awaitable for its
+        result; raises DetectionOverloaded right away if the queue is full.
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise DetectionOverloaded(self._retry_after())
+            self._pending += 1
+        enqueued = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._wait_ms.append((started - enqueued) * 1000)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._run_ms.append((time.perf_counter() - started) * 1000)
+
+        future = self._pool.submit(task)
+        future.add_done_callback(self._finished)
+        return asyncio.wrap_future(future)
+
+    def _finished(self, _future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on the pool; raise DetectionOverloaded if the queue is full."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        """Queue depth and wait/run time percentiles for sizing DETECT_WORKERS."""
+        with self._lock:
+            wait, run = list(self._wait_ms), list(self._run_ms)
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "wait_ms_p50": round(_percentile(wait, 50), 2),
+                "wait_ms_p95": round(_percentile(wait, 95), 2),
+                "wait_ms_max": round(max(wait, default=0.0), 2),
+                "run_ms_p50": round(_percentile(run, 50), 2),
+                "run_ms_p95": round(_percentile(run, 95), 2),
+            }
+
+
+detection_executor = DetectionExecutor()
@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ----------------------------
+# Cross-Process File Lock
+# ----------------------------
+# The on-disk stores are shared by every uvicorn worker and the ingest CLI.
+# Writers hold this lock while they re-read the manifest, write a segment
+# and swap the manifest, so no two processes append from the same state.
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Exclusive advisory lock on `path` (created if missing), held for the `with` block."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def segment_name(prefix: str, sequence: int, suffix: str) -> str:
+    """Segment file name unique across processes: sequence number plus pid and a random tag."""
+    return f"{prefix}-{sequence:05d}-{os.getpid()}-{os.urandom(3).hex()}{suffix}"
@@ -0,0 +1,55 @@
+"""
+Suspect corpus maintenance.
+
+Run from backend/WEB3:
+    python -m services.detect.ingest add new_suspects.json   # JSON list of {"url", "text", "tags", ...}
+    python -m services.detect.ingest remove <id> [<id> ...]
+    python -m services.detect.ingest compact
+    python -m services.detect.ingest rollback <version>
+    python -m services.detect.ingest status
+"""
+import sys
+import json
+import argparse
+
+from .detect import suspect_store, ingest_suspects, import_legacy_suspects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="normalize, de-duplicate, embed and append suspects")
+    add.add_argument("path", help="JSON file with a list of suspect entries ('-' for stdin)")
+    remove = commands.add_parser("remove", help="append tombstones for suspect ids")
+    remove.add_argument("ids", nargs="+")
+    commands.add_parser("compact", help="fold all segments into one")
+    rollback = commands.add_parser("rollback", help="drop segments written after a store version")
+    rollback.add_argument("version", type=int)
+    commands.add_parser("status", help="store version, segment and suspect counts")
+    args = parser.parse_args()
+
+    import_legacy_suspects()
+    if args.command == "add":
+        if args.path == "-":
+            entries = json.load(sys.stdin)
+        else:
+            with open(args.path) as f:
+                entries = json.load(f)
+        result = ingest_suspects(entries)
+    elif args.command == "remove":
+        result = {"removed": suspect_store.remove(args.ids)}
+    elif args.command == "compact":
+        result = suspect_store.compact()
+    elif args.command == "rollback":
+        try:
+            result = {"dropped_segments": suspect_store.rollback(args.version)}
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        result = {}
+    result.update(suspect_store.status())
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
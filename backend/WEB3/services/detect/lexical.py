@@ -0,0 +1,166 @@
+import re
+import hashlib
+import numpy as np
+from pathlib import Path
+from .filelock import file_lock, segment_name
+
+# ----------------------------
+# Lexical Near-Duplicate Pre-Filter (shingling + MinHash + LSH)
+# ----------------------------
+# Near-verbatim copies share most of their word 5-grams. A MinHash signature
+# estimates Jaccard similarity between shingle sets, and LSH banding finds
+# candidates sharing at least one band without scanning the corpus.
+# With 32 bands x 4 rows, pairs at Jaccard 0.8 collide with ~100% probability
+# and pairs at 0.3 with ~23%; the estimate on the full signature decides.
+
+NUM_PERM = 128
+NUM_BANDS = 32
+SHINGLE_WORDS = 5
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def text_fingerprint(text: str) -> str:
+    """Exact-duplicate fingerprint of the normalized text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_WORDS) -> np.ndarray:
+    """32-bit hashes of the word n-grams in `text` (fewer words -> one shingle)."""
+    words = normalize_text(text).split()
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    size = min(size, len(words))
+    grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+
+
+class MinHasher:
+    """Vectorized MinHash with `num_perm` universal hash functions (fixed seed, so signatures persist)."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text)
+        if hashes.size == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _MERSENNE_PRIME
+        return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+class LexicalIndex:
+    """
+    Persistent MinHash/LSH index over suspect texts, keyed by suspect content key.
+    Signatures are saved to disk; LSH buckets are rebuilt from them on load.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS):
+        self.hasher = MinHasher(num_perm)
+        self.num_bands = num_bands
+        self.rows_per_band = num_perm // num_bands
+        self.keys = []
+        self.signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self.fingerprints = {}   # exact fingerprint -> [ids]
+        self._fingerprint_list = []
+        self.buckets = {}        # (band, band hash) -> [ids]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _band_hashes(self, signatures: np.ndarray) -> np.ndarray:
+        bands = signatures[:, :self.num_bands * self.rows_per_band].reshape(
+            signatures.shape[0], self.num_bands, self.rows_per_band
+        )
+        return np.ascontiguousarray(bands).view(f"V{4 * self.rows_per_band}").reshape(signatures.shape[0], self.num_bands)
+
+    def _index_rows(self, start: int):
+        band_hashes = self._band_hashes(self.signatures[start:])
+        for offset, row in enumerate(band_hashes):
+            for band, value in enumerate(row):
+                self.buckets.setdefault((band, value.tobytes()), []).append(start + offset)
+        for i in range(start, len(self.keys)):
+            self.fingerprints.setdefault(self._fingerprint_list[i], []).append(i)
+
+    def add(self, keys: list, texts: list):
+        """Insert suspects (content key + text)."""
+        if not keys:
+            return
+        start = len(self.keys)
+        self.keys.extend(keys)
+        self._fingerprint_list.extend(text_fingerprint(t) for t in texts)
+        new_sigs = np.stack([self.hasher.signature(t) for t in texts])
+        self.signatures = np.concatenate([self.signatures, new_sigs]) if start else new_sigs
+        self._index_rows(start)
+
+    def query(self, text: str, min_jaccard: float = 0.8, limit: int = None):
+        """
+        Near-duplicates of `text` as [(key, estimated jaccard, "exact"|"near_duplicate"), ...],
+        strongest first. Exact (normalized-text) duplicates score 1.0.
+        `limit` only considers the first `limit` suspects (the index is append-only,
+        so a reader holding an older corpus snapshot ignores suspects added since).
+        """
+        limit = len(self) if limit is None else min(limit, len(self))
+        if not limit or not normalize_text(text):
+            return []
+
+        exact_ids = {i for i in self.fingerprints.get(text_fingerprint(text), []) if i < limit}
+
+        signature = self.hasher.signature(text)
+        candidates = set()
+        for band, value in enumerate(self._band_hashes(signature[None, :])[0]):
+            candidates.update(self.buckets.get((band, value.tobytes()), []))
+        candidates = {i for i in candidates if i < limit} - exact_ids
+
+        hits = [(self.keys[i], 1.0, "exact") for i in exact_ids]
+        if candidates:
+            ids = np.fromiter(candidates, dtype=np.int64)
+            estimates = (self.signatures[ids] == signature).mean(axis=1)
+            for i, est in zip(ids, estimates):
+                if est >= min_jaccard:
+                    hits.append((self.keys[i], float(est), "near_duplicate"))
+        return sorted(hits, key=lambda h: -h[1])
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def save(self, path: Path, limit: int = None):
+        """Write the index (its first `limit` suspects, default all) to `path` (.npz)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        limit = len(self) if limit is None else limit
+        # Every worker saves its own snapshot: unique tmp name, one writer at a time
+        tmp_path = path.with_name(segment_name(path.name, limit, ".tmp"))
+        with file_lock(path.with_name(path.name + ".lock")):
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    signatures=self.signatures[:limit],
+                    keys=np.array(self.keys[:limit], dtype=str),
+                    fingerprints=np.array(self._fingerprint_list[:limit], dtype=str),
+                    params=np.array([self.hasher.num_perm, self.num_bands]),
+                )
+            tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path):
+        with np.load(path) as data:
+            num_perm, num_bands = (int(v) for v in data["params"])
+            index = cls(num_perm=num_perm, num_bands=num_bands)
+            index.keys = data["keys"].tolist()
+            index._fingerprint_list = data["fingerprints"].tolist()
+            index.signatures = data["signatures"]
+        index._index_rows(0)
+        return index
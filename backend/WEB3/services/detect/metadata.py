@@ -0,0 +1,154 @@
+import json
+import numpy as np
+from pathlib import Path
+from urllib.parse import urlparse
+from .filelock import file_lock, segment_name
+
+# ----------------------------
+# Suspect Metadata Inverted Index (tags, jurisdiction, category, URL domain)
+# ----------------------------
+# Structured fields map value -> set of suspect ids, so a query restricted to
+# e.g. jurisdiction=KE or domain=example.com only scores the matching suspects.
+# Entries are keyed by suspect id (not content key: two suspects with the same
+# text can differ in jurisdiction or category). Newly ingested segments are
+# added as a delta; after a compaction, deletion or rollback the index is
+# synced: vanished ids removed and ids whose fields changed re-indexed.
+
+METADATA_FIELDS = ("tags", "jurisdiction", "category", "domain")
+
+
+def _normalize(value) -> str:
+    return str(value).strip().lower()
+
+
+def url_domain(url: str) -> str:
+    """Host part of `url`, lower-cased and without a leading "www."."""
+    host = urlparse(url or "").netloc.lower().split("@")[-1].split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def _normalize_domain(value) -> str:
+    """Accepts a full URL or a bare host name."""
+    value = _normalize(value)
+    host = url_domain(value) if "//" in value else value.split("/")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def suspect_fields(suspect: dict) -> dict:
+    """Indexed field values of a suspect entry: {field: [normalized values]}."""
+    domain = url_domain(suspect.get("url", ""))
+    return {
+        "tags": sorted({_normalize(t) for t in suspect.get("tags", []) if str(t).strip()}),
+        "jurisdiction": [_normalize(suspect["jurisdiction"])] if suspect.get("jurisdiction") else [],
+        "category": [_normalize(suspect["category"])] if suspect.get("category") else [],
+        "domain": [domain] if domain else [],
+    }
+
+
+def normalize_filters(filters: dict) -> dict:
+    """Keep known fields with at least one value; values normalized like the index."""
+    if not filters:
+        return {}
+    normalized = {}
+    for field in METADATA_FIELDS:
+        values = filters.get(field) or []
+        if isinstance(values, str):
+            values = [values]
+        normalize = _normalize_domain if field == "domain" else _normalize
+        values = sorted({normalize(v) for v in values if str(v).strip()})
+        if values:
+            normalized[field] = values
+    return normalized
+
+
+class MetadataIndex:
+    def __init__(self):
+        self.fields = {}  # suspect id -> {field: [values]}
+        self.postings = {field: {} for field in METADATA_FIELDS}  # field -> value -> set(ids)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def _post(self, key: str, fields: dict, add: bool):
+        for field, values in fields.items():
+            postings = self.postings[field]
+            for value in values:
+                if add:
+                    postings.setdefault(value, set()).add(key)
+                else:
+                    postings[value].discard(key)
+                    if not postings[value]:
+                        del postings[value]
+
+    def add(self, suspects: list) -> dict:
+        """Index newly appended suspects only; returns {"added", "updated", "removed"} counts."""
+        changes = {"added": 0, "updated": 0, "removed": 0}
+        self._update({s["id"]: suspect_fields(s) for s in suspects}, changes)
+        return changes
+
+    def sync(self, suspects: list) -> dict:
+        """Bring the index in line with the whole corpus; returns {"added", "updated", "removed"} counts."""
+        current = {s["id"]: suspect_fields(s) for s in suspects}
+        changes = {"added": 0, "updated": 0, "removed": 0}
+
+        for key in [k for k in self.fields if k not in current]:
+            self._post(key, self.fields.pop(key), add=False)
+            changes["removed"] += 1
+        self._update(current, changes)
+        return changes
+
+    def _update(self, current: dict, changes: dict):
+        for key, fields in current.items():
+            old = self.fields.get(key)
+            if old == fields:
+                continue
+            if old is not None:
+                self._post(key, old, add=False)
+            self._post(key, fields, add=True)
+            self.fields[key] = fields
+            changes["updated" if old is not None else "added"] += 1
+
+    def match(self, filters: dict, require_all: bool = True) -> set:
+        """
+        Suspect ids matching `filters` ({field: [values]}): any value within a field,
+        and every field (require_all) or any field (require_all=False).
+        """
+        matched = None
+        for field, values in normalize_filters(filters).items():
+            keys = set().union(*(self.postings[field].get(v, set()) for v in values))
+            if matched is None:
+                matched = keys
+            elif require_all:
+                matched &= keys
+            else:
+                matched |= keys
+        return matched if matched is not None else set()
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    def save(self, path: Path, ids=None):
+        """Write the indexed fields (only of `ids`, default all) to `path` (.json)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fields = self.fields if ids is None else {i: self.fields[i] for i in ids if i in self.fields}
+        tmp_path = path.with_name(segment_name(path.name, len(fields), ".tmp"))
+        with file_lock(path.with_name(path.name + ".lock")):
+            with open(tmp_path, "w") as f:
+                json.dump(fields, f)
+            tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path):
+        index = cls()
+        with open(path) as f:
+            for key, fields in json.load(f).items():
+                fields = {field: fields.get(field, []) for field in METADATA_FIELDS}
+                index.fields[key] = fields
+                index._post(key, fields, add=True)
+        return index
+
+
+def positions_of(ids: set, positions: dict) -> np.ndarray:
+    """Sorted corpus row positions of suspect `ids`."""
+    return np.array(sorted(positions[i] for i in ids if i in positions), dtype=np.int64)
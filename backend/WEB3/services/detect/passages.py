@@ -0,0 +1,98 @@
+import numpy as np
+from .engine import normalize_rows, select_top
+
+# ----------------------------
+# Passage-Level (Chunked) Detection
+# ----------------------------
+# Long texts are split into overlapping character windows so a copied
+# paragraph is compared against paragraphs, not averaged into a whole filing.
+
+PASSAGE_SCORE_BLOCK = 65536  # suspect passages scored per matrix product
+
+
+def split_passages(text: str, size: int = 800, overlap: int = 200) -> list:
+    """
+    Split `text` into overlapping passages of ~`size` characters.
+    Window edges are moved back to the nearest whitespace when possible.
+    Returns a list of (start, end) character offsets.
+    """
+    text = text or ""
+    if not text.strip():
+        return []
+    if len(text) <= size:
+        return [(0, len(text))]
+
+    step = max(1, size - overlap)
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            cut = text.rfind(" ", start + step, end)
+            if cut > start:
+                end = cut
+        spans.append((start, end))
+        if end >= len(text):
+            break
+        next_start = text.find(" ", start + step, end)
+        start = next_start + 1 if next_start != -1 else start + step
+    return spans
+
+
+class PassageIndex:
+    """
+    All suspect passages in one normalized float32 matrix, grouped by suspect.
+    `owners[i]` is the suspect index of passage i (non-decreasing) and
+    `spans[i]` its (start, end) offsets in the suspect text.
+    """
+
+    def __init__(self, vectors, owners, spans):
+        self.matrix = normalize_rows(vectors) if len(owners) else np.zeros((0, 0), dtype=np.float32)
+        self.owners = np.asarray(owners, dtype=np.int64)
+        self.spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        # First passage of each suspect that has passages (owners is sorted)
+        self.group_starts = np.flatnonzero(np.r_[True, self.owners[1:] != self.owners[:-1]]) if len(owners) else []
+        self.group_owners = self.owners[self.group_starts] if len(owners) else self.owners
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def best_pairs(self, query_vectors, k: int = None, threshold: float = None, suspects=None):
+        """
+        Score every query passage against every suspect passage in batch and
+        return, per suspect, its best-matching passage pair:
+        [{"suspect", "similarity", "query_passage", "suspect_passage"}, ...]
+        `suspects` optionally restricts the result to those suspect indices.
+        """
+        if len(self) == 0 or len(query_vectors) == 0:
+            return []
+        queries = normalize_rows(query_vectors)
+
+        # Best query passage for every suspect passage, one block of columns at a time
+        col_best = np.empty(len(self), dtype=np.float32)
+        col_arg = np.empty(len(self), dtype=np.int64)
+        for start in range(0, len(self), PASSAGE_SCORE_BLOCK):
+            block = queries @ self.matrix[start:start + PASSAGE_SCORE_BLOCK].T
+            col_arg[start:start + block.shape[1]] = block.argmax(axis=0)
+            col_best[start:start + block.shape[1]] = block.max(axis=0)
+
+        # Best passage pair per suspect
+        suspect_best = np.maximum.reduceat(col_best, self.group_starts)
+        group_ends = np.r_[self.group_starts[1:], len(self)]
+
+        groups = None
+        if suspects is not None:
+            groups = np.flatnonzero(np.isin(self.group_owners, suspects))
+            suspect_best = suspect_best[groups]
+
+        matches = []
+        for group, score in select_top(suspect_best, k=k, threshold=threshold, ids=groups):
+            lo, hi = self.group_starts[group], group_ends[group]
+            passage = lo + int(np.argmax(col_best[lo:hi]))
+            matches.append({
+                "suspect": int(self.group_owners[group]),
+                "similarity": score,
+                "query_passage": int(col_arg[passage]),
+                "suspect_passage": passage,
+            })
+        return matches
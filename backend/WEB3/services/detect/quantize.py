@@ -0,0 +1,128 @@
+import numpy as np
+from .engine import normalize_rows, select_top
+
+# ----------------------------
+# Compact Vector Representation (float16 / int8 + dimension truncation)
+# ----------------------------
+# The resident corpus matrix is stored compactly and scored block by block;
+# the top `k * rerank_factor` candidates are then re-scored exactly in float32
+# using vectors fetched on demand (e.g. from the memory-mapped embedding store),
+# so the full-precision matrix never has to stay in RAM.
+# The shortlist threshold is lowered by a slack that, unless configured, is
+# measured from the actual quantization/truncation error of the corpus. At
+# most `max_rerank` candidates per query are re-scored exactly; weaker ones
+# (only possible with k=None) keep their approximate score.
+
+VECTOR_MODES = ("float32", "float16", "int8")
+SCORE_BLOCK = 4096  # rows upcast to float32 per matrix product (stays cache-sized)
+SLACK_SAMPLE = 256  # corpus rows used as probe queries when measuring the score error
+SLACK_MARGIN = 1.25  # queries from outside the corpus can err a little more than the sample
+
+
+def quantize(matrix: np.ndarray, mode: str):
+    """
+    Compact a normalized float32 matrix. Returns (codes, scales):
+    float16 -> (float16 matrix, None); int8 -> (int8 codes, float32 per-row scale).
+    """
+    if mode == "float32":
+        return np.ascontiguousarray(matrix, dtype=np.float32), None
+    if mode == "float16":
+        return matrix.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(matrix / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector mode: {mode} (expected one of {VECTOR_MODES})")
+
+
+class QuantizedEngine:
+    """
+    SimilarityEngine-compatible search over a compact corpus matrix.
+    `dims` keeps only the leading sub-dimension (re-normalized); `rerank_fn(ids)`
+    returns full float32 vectors for exact re-scoring of the best candidates.
+    `rerank_slack` (None = measured, see measure_slack) widens the shortlist
+    threshold; `max_rerank` caps the exact re-scoring per query.
+    """
+
+    def __init__(self, vectors, mode: str = "int8", dims: int = None, rerank_fn=None, rerank_factor: int = 4,
+                 rerank_slack: float = None, max_rerank: int = 2000):
+        full = normalize_rows(vectors)
+        self.full_dim = full.shape[1]
+        self.dims = dims if dims and dims < self.full_dim else self.full_dim
+        self.mode = mode
+        self.codes, self.scales = quantize(normalize_rows(full[:, :self.dims]), mode)
+        self.rerank_fn = rerank_fn
+        self.rerank_factor = rerank_factor
+        self.max_rerank = max_rerank
+        self.rerank_slack = rerank_slack if rerank_slack is not None else self.measure_slack(full)
+
+    def measure_slack(self, full: np.ndarray, sample: int = SLACK_SAMPLE) -> float:
+        """Largest |approximate - exact| score between sampled corpus rows, times SLACK_MARGIN."""
+        if len(full) == 0:
+            return 0.0
+        rows = np.random.default_rng(0).choice(len(full), size=min(sample, len(full)), replace=False)
+        exact = full[rows] @ full[rows].T
+        approx = normalize_rows(full[rows, :self.dims]) @ self.codes[rows].astype(np.float32).T
+        if self.scales is not None:
+            approx *= self.scales[rows]
+        return float(np.abs(approx - exact).max()) * SLACK_MARGIN
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def add(self, vectors):
+        """Append vectors, quantized like the rest (the measured slack is kept). Returns the ids assigned to them."""
+        full = normalize_rows(vectors)
+        codes, scales = quantize(normalize_rows(full[:, :self.dims]), self.mode)
+        start = len(self)
+        self.codes = np.concatenate([self.codes, codes])
+        if scales is not None:
+            self.scales = np.concatenate([self.scales, scales])
+        return np.arange(start, len(self))
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def approx_scores(self, queries) -> np.ndarray:
+        """Approximate cosine scores of (full-dimension) queries against every row: (q, n)."""
+        q = normalize_rows(np.array(queries, dtype=np.float32, ndmin=2)[:, :self.dims])
+        out = np.empty((q.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK):
+            block = self.codes[start:start + SCORE_BLOCK].astype(np.float32, copy=False)
+            out[:, start:start + block.shape[0]] = q @ block.T
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def search(self, query, k: int = None, threshold: float = None):
+        return self.search_batch(np.asarray(query).reshape(1, -1), k=k, threshold=threshold)[0]
+
+    def search_batch(self, queries, k: int = None, threshold: float = None):
+        queries = np.array(queries, dtype=np.float32, ndmin=2)
+        if len(self) == 0:
+            return [[] for _ in range(queries.shape[0])]
+        all_scores = self.approx_scores(queries)
+        if self.rerank_fn is None:
+            return [select_top(row, k=k, threshold=threshold) for row in all_scores]
+
+        # Shortlist on approximate scores (with slack on the threshold), then rerank the best exactly
+        shortlist_k = min(k * self.rerank_factor, self.max_rerank) if k else None
+        shortlist_threshold = threshold - self.rerank_slack if threshold is not None else None
+        results = []
+        for query, scores in zip(normalize_rows(queries), all_scores):
+            shortlist = select_top(scores, k=shortlist_k, threshold=shortlist_threshold)
+            candidates = np.array([i for i, _ in shortlist[:self.max_rerank]], dtype=np.int64)
+            if candidates.size == 0:
+                results.append([])
+                continue
+            exact = normalize_rows(self.rerank_fn(candidates)) @ query
+            hits = select_top(exact, k=k, threshold=threshold, ids=candidates)
+            # k=None: candidates past the rerank cap are reported with their approximate score,
+            # merged into the reranked hits by score
+            tail = [(i, score) for i, score in shortlist[self.max_rerank:] if threshold is None or score >= threshold]
+            if tail:
+                hits = sorted(hits + tail, key=lambda h: -h[1])
+            results.append(hits)
+        return results
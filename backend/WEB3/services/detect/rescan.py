@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import numpy as np
+from pathlib import Path
+
+from .store import EmbeddingStore, content_key
+from .engine import normalize_rows
+from .filelock import file_lock
+from .detect import (
+    DATA_DIR, EMBEDDING_MODEL_NAME, INFRINGEMENT_THRESHOLD,
+    suspect_store, embedding_store, embed_texts, import_legacy_suspects,
+    suspect_content_key, suspect_embedding_text, combine_query_text,
+)
+
+# ----------------------------
+# Background Re-Scan of Registered Assets
+# ----------------------------
+# Every asset that went through /detect is remembered. When new suspects are
+# ingested, only the new suspect vectors are scored against all stored asset
+# vectors (one new-suspects x assets matrix product); matches that were not
+# known yet are recorded and pushed to ICP in batches.
+#
+# Every uvicorn worker runs a scheduler over the same files. A pass holds
+# scan.lock, so one worker scans at a time; it re-reads the scanned set and
+# the registry (including assets registered by other workers) under the lock,
+# so a suspect is scored, recorded and pushed by exactly one of them.
+
+RESCAN_ENABLED = os.getenv("DETECT_RESCAN", "true").lower() in ["1", "true", "yes"]
+RESCAN_INTERVAL_SECONDS = float(os.getenv("DETECT_RESCAN_INTERVAL_SECONDS", 300))
+RESCAN_PUSH_BATCH = int(os.getenv("DETECT_RESCAN_PUSH_BATCH", 50))
+ASSET_BLOCK = 65536  # asset rows scored per matrix product
+
+RESCAN_DIR = DATA_DIR / "rescan"
+
+
+def _append_jsonl(path: Path, records: list):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _append_lines(path: Path, lines: list):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.writelines(f"{line}\n" for line in lines)
+
+
+def _read_from(path: Path, offset: int = 0):
+    """Lines appended to `path` since byte `offset`; returns (lines, new offset)."""
+    if not path.exists():
+        return [], offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    return [line for line in data.decode("utf-8").splitlines() if line.strip()], offset + len(data)
+
+
+class AssetRegistry:
+    """
+    Registered assets (append-only log, last registration of an asset wins),
+    their embeddings and the suspect URLs already matched to each of them.
+    Both logs are shared by all workers: appends happen under registry.lock
+    and refresh() reads whatever other workers appended since the last read.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.assets_path = self.root / "assets.jsonl"
+        self.matches_path = self.root / "matches.jsonl"
+        self.lock_path = self.root / "registry.lock"
+        self.vectors = EmbeddingStore(self.root / "assets", EMBEDDING_MODEL_NAME)
+        self._lock = threading.Lock()
+        self._offsets = {"assets": 0, "matches": 0}  # bytes of each log already read
+        self.assets = {}   # asset_id -> record
+        self.matched = {}  # asset_id -> set(urls)
+
+    def refresh(self):
+        """Pick up assets and matches appended by any process since the last read."""
+        with self._lock, file_lock(self.lock_path):
+            self._read_new()
+
+    def _read_new(self):
+        # Caller holds both locks
+        lines, self._offsets["assets"] = _read_from(self.assets_path, self._offsets["assets"])
+        for line in lines:
+            self._remember(json.loads(line))
+        lines, self._offsets["matches"] = _read_from(self.matches_path, self._offsets["matches"])
+        for line in lines:
+            match = json.loads(line)
+            self.matched.setdefault(match["asset_id"], set()).add(match["url"])
+
+    def __len__(self):
+        return len(self.assets)
+
+    def _remember(self, record: dict):
+        self.assets[record["asset_id"]] = record
+        self.matched.setdefault(record["asset_id"], set()).update(record.get("matched_urls", []))
+
+    def register(self, asset_id: int, registered_text: str = "", metadata_description: str = "",
+                 metadata_tags: list = None, matched_urls: list = None):
+        """Remember an asset (and the suspects it already matched) for future re-scans."""
+        text = combine_query_text(registered_text, metadata_description, metadata_tags)
+        record = {
+            "asset_id": asset_id,
+            "text": registered_text or "",
+            "description": metadata_description or "",
+            "tags": metadata_tags or [],
+            "key": content_key(EMBEDDING_MODEL_NAME, text),
+            "matched_urls": sorted(set(matched_urls or [])),
+        }
+        with self._lock, file_lock(self.lock_path):
+            self._read_new()
+            known = self.assets.get(asset_id)
+            if known and known["key"] == record["key"] and set(record["matched_urls"]) <= self.matched[asset_id]:
+                return
+            _append_jsonl(self.assets_path, [record])
+            self._remember(record)
+            self._offsets["assets"] = self.assets_path.stat().st_size
+
+    def record_matches(self, matches: list):
+        """Persist new {"asset_id", "url", ...} matches."""
+        with self._lock, file_lock(self.lock_path):
+            self._read_new()
+            _append_jsonl(self.matches_path, matches)
+            for match in matches:
+                self.matched.setdefault(match["asset_id"], set()).add(match["url"])
+            self._offsets["matches"] = self.matches_path.stat().st_size
+
+    def asset_matrix(self):
+        """(asset ids, normalized float32 matrix), embedding assets that have no stored vector yet."""
+        self.refresh()
+        with self._lock:
+            records = list(self.assets.values())
+        if not records:
+            return [], None
+        keys = [r["key"] for r in records]
+        texts = [combine_query_text(r["text"], r["description"], r["tags"]) for r in records]
+        vectors = self.vectors.ensure(keys, texts, embed_texts)
+        return [r["asset_id"] for r in records], normalize_rows(vectors)
+
+
+asset_registry = AssetRegistry(RESCAN_DIR)
+
+
+class RescanScheduler:
+    """
+    Scores suspects not scanned yet against every registered asset and
+    pushes new matches through `push_fn(records)` (an async bulk ICP write).
+    Runs after trigger() (e.g. right after ingestion) and every
+    RESCAN_INTERVAL_SECONDS to catch segments written by other processes.
+    The first pass only records the suspects already in the corpus as
+    scanned: registered assets were checked against them by /detect.
+    """
+
+    def __init__(self, registry: AssetRegistry, threshold: float = INFRINGEMENT_THRESHOLD):
+        self.registry = registry
+        self.threshold = threshold
+        self.scanned_path = registry.root / "scanned_suspects.txt"
+        self.lock_path = registry.root / "scan.lock"
+        self._scanned = set()
+        self._scanned_offset = 0
+        self._event = None
+        self._loop = None
+        self._task = None
+        self._stats = {
+            "scans": 0, "suspects_scanned": 0, "assets": 0, "new_matches": 0,
+            "records_pushed": 0, "last_scan_ms": 0.0,
+        }
+
+    def _load_scanned(self) -> set:
+        # Caller holds scan.lock; other workers only append while holding it
+        lines, self._scanned_offset = _read_from(self.scanned_path, self._scanned_offset)
+        self._scanned.update(line.strip() for line in lines)
+        return self._scanned
+
+    def scan(self) -> list:
+        """
+        One re-scan pass (blocking). Returns ICP story records
+        ({"document_id", "metadata", "matches"}) for assets with new matches.
+        """
+        with file_lock(self.lock_path):
+            return self._scan()
+
+    def _scan(self) -> list:
+        started = time.perf_counter()
+        import_legacy_suspects()
+        suspect_store.refresh()
+        suspects = list(suspect_store.suspects)
+        if not self.scanned_path.exists():
+            _append_lines(self.scanned_path, [s["id"] for s in suspects])
+            print(f"🔁 Re-scan: {len(suspects)} existing suspects marked as scanned.")
+            return []
+        scanned = self._load_scanned()
+        new = [s for s in suspects if s["id"] not in scanned]
+        if not new:
+            return []
+
+        asset_ids, assets = self.registry.asset_matrix()
+        found = {}  # asset_id -> [match]
+        if asset_ids:
+            suspect_vectors = normalize_rows(embedding_store.ensure(
+                [suspect_content_key(s) for s in new], [suspect_embedding_text(s) for s in new], embed_texts
+            ))
+            for start in range(0, len(asset_ids), ASSET_BLOCK):
+                scores = suspect_vectors @ assets[start:start + ASSET_BLOCK].T
+                for row, col in zip(*np.nonzero(scores > self.threshold)):
+                    asset_id, suspect = asset_ids[start + col], new[row]
+                    if suspect["url"] in self.registry.matched.get(asset_id, ()):
+                        continue
+                    found.setdefault(asset_id, []).append({
+                        "asset_id": asset_id,
+                        "suspect_id": suspect["id"],
+                        "url": suspect["url"],
+                        "similarity": round(float(scores[row, col]), 3),
+                        "excerpt": suspect["text"][:200],
+                        "found_at": int(time.time()),
+                    })
+
+        matches = [m for asset_matches in found.values() for m in asset_matches]
+        if matches:
+            self.registry.record_matches(matches)
+        _append_lines(self.scanned_path, [s["id"] for s in new])
+        self._load_scanned()
+
+        self._stats["scans"] += 1
+        self._stats["suspects_scanned"] += len(new)
+        self._stats["assets"] = len(asset_ids)
+        self._stats["new_matches"] += len(matches)
+        self._stats["last_scan_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        print(f"🔁 Re-scan: {len(new)} new suspects x {len(asset_ids)} assets, {len(matches)} new match(es).")
+
+        records = []
+        for asset_id, asset_matches in found.items():
+            asset = self.registry.assets[asset_id]
+            records.append({
+                "document_id": asset_id,
+                "metadata": {"description": asset["description"], "tags": asset["tags"], "text": asset["text"]},
+                "matches": [
+                    {"url": m["url"], "similarity": m["similarity"], "excerpt": m["excerpt"]}
+                    for m in asset_matches
+                ],
+            })
+        return records
+
+    async def run_once(self, push_fn=None):
+        records = await asyncio.to_thread(self.scan)
+        for start in range(0, len(records), RESCAN_PUSH_BATCH):
+            batch = records[start:start + RESCAN_PUSH_BATCH]
+            if push_fn is not None:
+                await push_fn(batch)
+            self._stats["records_pushed"] += len(batch)
+
+    # ----------------------------
+    # Scheduling
+    # ----------------------------
+    def start(self, push_fn=None):
+        """Start the background loop on the running event loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self._task = self._loop.create_task(self._run(push_fn))
+
+    async def stop(self):
+        """Cancel the background loop (a pass running in its thread finishes on its own)."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = self._loop = self._event = None
+
+    def trigger(self):
+        """Request a re-scan as soon as possible (safe to call from any thread)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    async def _run(self, push_fn):
+        while True:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout=RESCAN_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._event.clear()
+            try:
+                await self.run_once(push_fn)
+            except Exception as e:
+                print("❌ Re-scan failed:", e)
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["enabled"] = self._task is not None
+        stats["pending"] = bool(self._event and self._event.is_set())
+        return stats
+
+
+rescan_scheduler = RescanScheduler(asset_registry)
@@ -0,0 +1,215 @@
+import os
+import time
+import shutil
+import threading
+import multiprocessing
+import numpy as np
+from pathlib import Path
+
+from .engine import normalize_rows, select_top
+
+# ----------------------------
+# Sharded Multi-Process Similarity Search
+# ----------------------------
+# The normalized suspect matrix is written as read-only .npy shards. A pool of
+# worker processes memory-maps them (the OS page cache holds one copy shared by
+# all workers), each scores its shards with its own single-threaded BLAS, and
+# the per-shard top-k lists are merged in the parent.
+# Appended vectors fill up the last shard (rewritten under a new file name,
+# since older engines may still be searching the previous one) before a new
+# shard is started, so ingestion does not leave a trail of tiny shards.
+
+SHARD_WORKERS = int(os.getenv("DETECT_SHARD_WORKERS", 0)) or os.cpu_count() or 1
+SHARD_BLAS_THREADS = int(os.getenv("DETECT_SHARD_BLAS_THREADS", 1))
+# Appends grow a shard to the initial shard size, but at least to this many rows
+SHARD_MIN_ROWS = int(os.getenv("DETECT_SHARD_MIN_ROWS", 4096))
+_BLAS_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# ----------------------------
+# Worker side
+# ----------------------------
+_worker_shards = {}  # path -> memory-mapped shard (per worker process)
+
+
+def _load_shard(path: str) -> np.ndarray:
+    shard = _worker_shards.get(path)
+    if shard is None:
+        # Drop maps from older builds and of rewritten shards so their files can be removed
+        build = os.path.dirname(path)
+        for old in [p for p in _worker_shards if os.path.dirname(p) != build or not os.path.exists(p)]:
+            del _worker_shards[old]
+        shard = _worker_shards[path] = np.load(path, mmap_mode="r")
+    return shard
+
+
+def _search_shard(path: str, offset: int, queries: np.ndarray, k: int, threshold: float):
+    """Top-k of every query within one shard, with corpus-wide ids."""
+    shard = _load_shard(path)
+    scores = queries @ shard.T
+    ids = np.arange(offset, offset + shard.shape[0])
+    return [select_top(row, k=k, threshold=threshold, ids=ids) for row in scores]
+
+
+def _search_shard_task(task: tuple):
+    return _search_shard(*task)
+
+
+# ----------------------------
+# Parent side
+# ----------------------------
+def get_shard_pool(workers: int = SHARD_WORKERS):
+    """
+    Process pool shared by every ShardedEngine. Workers are spawned (not
+    forked) with BLAS limited to SHARD_BLAS_THREADS threads each, so N
+    workers use N cores without oversubscribing.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers == workers:
+            return _pool
+        if _pool is not None:
+            _pool.terminate()
+        saved = {name: os.environ.get(name) for name in _BLAS_ENV}
+        os.environ.update({name: str(SHARD_BLAS_THREADS) for name in _BLAS_ENV})
+        try:
+            _pool = multiprocessing.get_context("spawn").Pool(processes=workers)
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+        _pool_workers = workers
+        print(f"[Shards] Started {workers} search worker processes")
+        return _pool
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != "posix":
+        return True  # no cheap liveness check; leave other processes' builds alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove_old_builds(root: Path):
+    """
+    Delete this process's builds except the newest two (the previous one may
+    still serve searches on the old engine), and builds left by processes that
+    have exited. Builds of other live processes are never touched.
+    """
+    pid = os.getpid()
+    own = []
+    for path in root.glob("build-*-*"):
+        try:
+            owner = int(path.name.split("-")[1])
+        except ValueError:
+            continue
+        if owner == pid:
+            own.append(path)
+        elif not _pid_alive(owner):
+            shutil.rmtree(path, ignore_errors=True)
+    for old in sorted(own)[:-2]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+class ShardedEngine:
+    """
+    SimilarityEngine-compatible search over `shards` memory-mapped shard
+    files under `root`, scored in parallel by the shared process pool.
+    add() appends to the last shard until it holds `shard_rows` rows (the
+    initial shard size, at least `min_shard_rows`), then starts a new one.
+    """
+
+    def __init__(self, vectors, root: Path, shards: int = None, workers: int = SHARD_WORKERS,
+                 min_shard_rows: int = SHARD_MIN_ROWS):
+        matrix = normalize_rows(vectors)
+        self.workers = workers
+        # Each worker process writes its own builds; other workers may still be searching theirs
+        self.build_dir = Path(root) / f"build-{os.getpid()}-{time.time_ns()}"
+        self.build_dir.mkdir(parents=True, exist_ok=True)
+        self._dim = matrix.shape[1]
+        self.shards = []  # [(path, offset, rows)]
+        self._retired = []  # shard files replaced by each of the last two add() calls
+        parts = np.array_split(matrix, max(1, shards or workers))
+        self.shard_rows = max(parts[0].shape[0], min_shard_rows, 1)
+        for part in parts:
+            self._write_shard(part)
+        _remove_old_builds(Path(root))
+
+    def _write_shard(self, rows: np.ndarray, replace: bool = False):
+        """Write `rows` as a new shard, or (replace=True) as the new version of the last shard."""
+        index = len(self.shards) - 1 if replace else len(self.shards)
+        offset = self.shards[-1][1] if replace else len(self)
+        path = self.build_dir / f"shard-{index:05d}-{os.urandom(3).hex()}.npy"
+        np.save(path, np.ascontiguousarray(rows, dtype=np.float32))
+        kept = self.shards[:-1] if replace else self.shards
+        self.shards = kept + [(str(path), offset, rows.shape[0])]
+
+    def __len__(self):
+        return sum(rows for _, _, rows in self.shards)
+
+    @property
+    def dim(self):
+        return self._dim
+
+    def add(self, vectors):
+        """Append vectors, topping up the last shard first. Returns the ids assigned to them."""
+        start = len(self)
+        rows = normalize_rows(vectors)
+        retired = []
+        if self.shards and rows.shape[0]:
+            last_path, _, last_rows = self.shards[-1]
+            room = self.shard_rows - last_rows
+            if room > 0:
+                # Never overwrite: engines copied before this add may still be searching last_path
+                self._write_shard(np.concatenate([np.load(last_path), rows[:room]]), replace=True)
+                retired.append(last_path)
+                rows = rows[room:]
+        for begin in range(0, rows.shape[0], self.shard_rows):
+            self._write_shard(rows[begin:begin + self.shard_rows])
+
+        # Files retired two adds ago are no longer searched by the previous engine
+        retired_groups = self._retired + [retired]
+        for group in retired_groups[:-2]:
+            for path in group:
+                Path(path).unlink(missing_ok=True)
+        self._retired = retired_groups[-2:]
+        return np.arange(start, len(self))
+
+    def search(self, query, k: int = None, threshold: float = None):
+        return self.search_batch(np.asarray(query).reshape(1, -1), k=k, threshold=threshold)[0]
+
+    def iter_search(self, query, k: int = None, threshold: float = None):
+        """Yields each shard's top-k hits for one query as soon as that shard finishes."""
+        if len(self) == 0:
+            return
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))
+        tasks = [(path, offset, query, k, threshold) for path, offset, rows in self.shards if rows]
+        for part in get_shard_pool(self.workers).imap_unordered(_search_shard_task, tasks):
+            yield part[0]
+
+    def search_batch(self, queries, k: int = None, threshold: float = None):
+        queries = normalize_rows(np.array(queries, dtype=np.float32, ndmin=2))
+        if len(self) == 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        pool = get_shard_pool(self.workers)
+        parts = pool.starmap(
+            _search_shard, [(path, offset, queries, k, threshold) for path, offset, rows in self.shards if rows]
+        )
+
+        # Merge per-shard top-k lists
+        results = []
+        for q in range(queries.shape[0]):
+            merged = sorted((hit for part in parts for hit in part[q]), key=lambda h: -h[1])
+            results.append(merged[:k] if k else merged)
+        return results
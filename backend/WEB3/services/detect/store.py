@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from .filelock import file_lock, segment_name
+
+# ----------------------------
+# Persistent Embedding Store
+# ----------------------------
+# Layout on disk (one directory per embedding model):
+#
+#   <root>/<model>/manifest.json                 -> {"model", "dim", "generation", "segments": [{"file", "keys"}]}
+#   <root>/<model>/vectors-00001-<pid>-<tag>.npy -> float32 matrix, one row per key
+#
+# Segments are append-only: new vectors go into a new .npy file and the
+# manifest is swapped atomically. Existing segments are never rewritten, so
+# memory-mapped readers stay valid (and Windows never has to replace a file
+# that is currently mapped). Writers (server workers, the ingest CLI) hold a
+# file lock and re-read the manifest before appending; readers pick up
+# segments written by other processes when the manifest changes.
+
+
+def content_key(model_name: str, text: str, tags: list = None, url: str = "") -> str:
+    """Content hash for a suspect entry (text, tags, URL and embedding model)."""
+    h = hashlib.sha256()
+    for part in (model_name, text or "", "\x1f".join(tags or []), url or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class EmbeddingStore:
+    """
+    On-disk embedding store keyed by content hash.
+    Segments are memory-mapped once and new ones are mapped as they appear
+    in the manifest; only keys that are not yet stored get sent to the
+    embedding function.
+    """
+
+    def __init__(self, root: Path, model_name: str):
+        self.model_name = model_name
+        self.root = Path(root) / model_name.replace("/", "_")
+        self.manifest_path = self.root / "manifest.json"
+        self.lock_path = self.root / ".lock"
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._manifest_stat = None
+        self._files = []      # segment file names, parallel to self._segments
+        self._segments = []   # list of np.memmap / np.ndarray
+        self._rows = {}       # key -> (segment index, row)
+        self._manifest = {"model": model_name, "dim": None, "generation": 0, "segments": []}
+
+    # ----------------------------
+    # Loading
+    # ----------------------------
+    def _refresh(self):
+        """Map segments added to the manifest since the last read (by any process). Caller holds _lock."""
+        try:
+            stat = self.manifest_path.stat()
+            manifest_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            return
+        if manifest_stat == self._manifest_stat:
+            return
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+
+        files = [seg["file"] for seg in manifest["segments"]]
+        if files[:len(self._files)] != self._files:
+            self._files, self._segments, self._rows = [], [], {}
+        for seg in manifest["segments"][len(self._files):]:
+            seg_idx = len(self._segments)
+            self._segments.append(np.load(self.root / seg["file"], mmap_mode="r"))
+            self._files.append(seg["file"])
+            for row, key in enumerate(seg["keys"]):
+                self._rows.setdefault(key, (seg_idx, row))
+        self._manifest = manifest
+        self._manifest_stat = manifest_stat
+
+    def load(self):
+        """Memory-map every segment; later calls only map segments added since (a stat when nothing changed)."""
+        with self._lock:
+            self._refresh()
+            if not self._loaded and self._rows:
+                print(f"[Embedding Store] Loaded {len(self._rows)} vectors for {self.model_name}")
+            self._loaded = True
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    @property
+    def dim(self):
+        return self._manifest.get("dim")
+
+    def all_vectors(self) -> np.ndarray:
+        """Every stored vector (all segments) as one in-memory float32 matrix."""
+        self.load()
+        if not self._segments:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.concatenate(self._segments).astype(np.float32, copy=False)
+
+    # ----------------------------
+    # Read / Write
+    # ----------------------------
+    def get_many(self, keys: list) -> np.ndarray:
+        """Return a float32 (len(keys), dim) matrix for keys that are already stored."""
+        if not keys:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        out = np.empty((len(keys), self.dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            seg_idx, row = self._rows[key]
+            out[i] = self._segments[seg_idx][row]
+        return out
+
+    def add(self, keys: list, vectors: np.ndarray):
+        """
+        Append a new segment holding `vectors` for `keys` and persist the manifest.
+        Keys another process stored in the meantime are skipped (their stored vector wins).
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not keys:
+            return
+        with self._lock, file_lock(self.lock_path):
+            self._manifest_stat = None  # always re-read under the lock (mtime can be coarse)
+            self._refresh()
+            fresh = {}
+            for i, key in enumerate(keys):
+                if key not in self._rows:
+                    fresh.setdefault(key, i)
+            if not fresh:
+                return
+            keys, vectors = list(fresh), vectors[list(fresh.values())]
+
+            dim = self._manifest.get("dim")
+            if dim is not None and vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} does not match store dim {dim}")
+
+            generation = self._manifest.get("generation", len(self._manifest["segments"])) + 1
+            filename = segment_name("vectors", generation, ".npy")
+            np.save(self.root / filename, vectors)
+
+            manifest = {
+                **self._manifest,
+                "dim": int(vectors.shape[1]),
+                "generation": generation,
+                "segments": self._manifest["segments"] + [{"file": filename, "keys": keys}],
+            }
+            tmp_path = self.manifest_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+            self._refresh()
+
+    def ensure(self, keys: list, texts: list, embed_fn) -> np.ndarray:
+        """
+        Return vectors for every key, embedding only the ones missing from the store.
+        `embed_fn(texts) -> np.ndarray` is called once with all missing texts.
+        """
+        self.load()
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._rows and key not in missing:
+                missing[key] = text
+
+        if missing:
+            print(f"[Embedding Store] Embedding {len(missing)} new/changed entries...")
+            new_vectors = embed_fn(list(missing.values()))
+            self.add(list(missing.keys()), new_vectors)
+
+        return self.get_many(keys)
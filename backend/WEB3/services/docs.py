@@ -2,6 +2,7 @@
 import asyncio
 import hashlib
 from .utils import run_vertex_async
+from .prompts import PromptField, build_prompt, format_report
 from .integrations import dag  
 
 
@@ -21,16 +22,17 @@ async def process(payload: dict):
         "a concise summary for the document suitable for repository indexing."
     )
 
-    user_msg = (
-        f"Document title: {payload.get('title', '')}\n"
-        f"Description: {payload.get('description', '')}\n"
-        f"File URL: {payload.get('file_url', '')}\n"
-        f"Requirements: {payload.get('requirements', {})}\n"
-        f"Metadata: {payload.get('metadata', {})}"
-    )
+    user_msg, report = build_prompt([
+        PromptField("Document title", payload.get("title", ""), priority=0, max_tokens=64),
+        PromptField("Description", payload.get("description", ""), priority=1),
+        PromptField("File URL", payload.get("file_url", ""), priority=4, max_tokens=64),
+        PromptField("Requirements", payload.get("requirements", {}), priority=2),
+        PromptField("Metadata", payload.get("metadata", {}), priority=3),
+    ])
+    print(f"[DEBUG] Prompt: {format_report(report)}")
 
     print("[DEBUG] Calling run_vertex_async() for metadata generation...")
-    generated_text = await run_vertex_async(user_msg, system_prompt=system_msg)
+    generated_text = await run_vertex_async(user_msg, system_prompt=system_msg, module="docs")
     print("[DEBUG] run_vertex_async() completed.")
     print(f"[Agent Docs Output Preview] {generated_text[:300]}{'...' if len(generated_text) > 300 else ''}")
 
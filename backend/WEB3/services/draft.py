@@ -1,7 +1,8 @@
 import asyncio
 from .utils import run_vertex_async
+from .prompts import PromptField, build_prompt, format_report
 
-async def process(payload: dict):
+async def process(payload: dict, on_partial=None):
     """
     Generate a professional legal draft asynchronously using Vertex AI.
     Incorporates category, document_type, client_name, requirements, and metadata.
@@ -27,23 +28,24 @@ async def process(payload: dict):
         "Ensure it is suitable for professional legal review and complies with jurisdiction rules."
     )
 
-    # Compose user instructions with all relevant fields
-    user_msg = (
-        f"Client Name: {client_name}\n"
-        f"User ID: {user_id}\n"
-        f"Title: {title}\n"
-        f"Category: {category}\n"
-        f"Document Type: {document_type}\n"
-        f"Description: {description}\n"
-        f"Jurisdiction: {jurisdiction}\n"
-        f"Requirements: {requirements}\n"
-        f"Case ID: {case_id}\n"
-        f"Additional Metadata: {metadata}\n"
-        f"Wallet: {wallet or 'N/A'}"
-    )
+    # Compose user instructions with all relevant fields, budgeted by priority
+    user_msg, report = build_prompt([
+        PromptField("Client Name", client_name, priority=0, max_tokens=32),
+        PromptField("User ID", user_id, priority=4, max_tokens=16),
+        PromptField("Title", title, priority=0, max_tokens=64),
+        PromptField("Category", category, priority=0, max_tokens=32),
+        PromptField("Document Type", document_type, priority=0, max_tokens=32),
+        PromptField("Description", description, priority=1),
+        PromptField("Jurisdiction", jurisdiction, priority=0, max_tokens=32),
+        PromptField("Requirements", requirements, priority=2),
+        PromptField("Case ID", case_id, priority=4, max_tokens=16),
+        PromptField("Additional Metadata", metadata, priority=3),
+        PromptField("Wallet", wallet or "N/A", priority=4, max_tokens=32),
+    ])
+    print(f"[Agent Draft] Prompt: {format_report(report)}")
 
     # Run Vertex AI to generate text
-    generated_text = await run_vertex_async(user_msg, system_prompt=system_msg)
+    generated_text = await run_vertex_async(user_msg, system_prompt=system_msg, module="draft", on_partial=on_partial)
     print(f"[Agent Draft Output]\n{generated_text}\n")
 
     result = {
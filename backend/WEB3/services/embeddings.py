@@ -0,0 +1,274 @@
+import os
+import re
+import time
+import queue
+import hashlib
+import asyncio
+import threading
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# ----------------------------
+# Embedding Micro-Batcher
+# ----------------------------
+# Concurrent callers (detection workers, ingestion, ...) each want a few
+# vectors. Instead of one get_embeddings request per caller, requests are
+# collected for up to `max_wait_ms` (or until `max_batch_size` texts are
+# waiting) and sent as one batched call; each caller gets its own rows back.
+# If a batched call fails, the batch is split in half and each half retried,
+# so an error reaches only the caller(s) whose texts cause it.
+
+EMBED_MICROBATCH_MAX_SIZE = int(os.getenv("EMBED_MICROBATCH_MAX_SIZE", 250))
+EMBED_MICROBATCH_MAX_WAIT_MS = float(os.getenv("EMBED_MICROBATCH_MAX_WAIT_MS", 5))
+EMBED_MICROBATCH_MAX_IN_FLIGHT = int(os.getenv("EMBED_MICROBATCH_MAX_IN_FLIGHT", 4))
+
+
+class EmbeddingMicroBatcher:
+    """
+    Thread-safe micro-batching front for an `embed_fn(texts) -> np.ndarray`.
+    embed() blocks the calling thread; embed_async() awaits from the event loop.
+    """
+
+    def __init__(self, embed_fn, max_batch_size: int = EMBED_MICROBATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBED_MICROBATCH_MAX_WAIT_MS,
+                 max_in_flight: int = EMBED_MICROBATCH_MAX_IN_FLIGHT):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        # While all batch slots are busy, requests keep queuing and form bigger batches
+        self._slots = threading.Semaphore(max_in_flight)
+        self._dispatch = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed-batch")
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            "requests": 0, "texts": 0, "batches": 0, "largest_batch": 0, "split_retries": 0, "failed_requests": 0,
+        }
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, texts: list) -> Future:
+        """Queue `texts` for the next batch; the Future resolves to a (len(texts), dim) matrix."""
+        future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return future
+        self._ensure_worker()
+        self._queue.put((list(texts), future))
+        return future
+
+    def embed(self, texts: list) -> np.ndarray:
+        return self.submit(texts).result()
+
+    async def embed_async(self, texts: list) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch_texts"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    # ----------------------------
+    # Worker
+    # ----------------------------
+    def _collect(self):
+        """Block for the first request, then gather more until the size or time limit."""
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait_s
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    def _worker(self):
+        while True:
+            self._slots.acquire()
+            batch, size = self._collect()
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["texts"] += size
+                self._stats["batches"] += 1
+                self._stats["largest_batch"] = max(self._stats["largest_batch"], size)
+            self._dispatch.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        try:
+            self._embed_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _embed_batch(self, batch):
+        texts = [t for item_texts, _ in batch for t in item_texts]
+        try:
+            vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+            if vectors.shape[0] != len(texts):
+                raise ValueError(f"embedding backend returned {vectors.shape[0]} vectors for {len(texts)} texts")
+        except Exception as e:
+            if len(batch) == 1:
+                with self._lock:
+                    self._stats["failed_requests"] += 1
+                batch[0][1].set_exception(e)
+                return
+            # Isolate the failing request(s): retry each half separately
+            with self._lock:
+                self._stats["split_retries"] += 1
+            middle = len(batch) // 2
+            self._embed_batch(batch[:middle])
+            self._embed_batch(batch[middle:])
+            return
+
+        start = 0
+        for item_texts, future in batch:
+            future.set_result(vectors[start:start + len(item_texts)])
+            start += len(item_texts)
+
+
+# ----------------------------
+# Embedding Backends
+# ----------------------------
+# Selected with EMBEDDING_BACKEND:
+#   vertex -> Vertex AI text-embedding-004 (credentials loaded on first use)
+#   local  -> deterministic hashing-trick vectorizer, no network needed
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "vertex").lower()
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class EmbeddingBackend:
+    """Interface: `model_name`, `max_batch_size` and embed(texts) -> float32 (n, dim)."""
+
+    model_name = ""
+    max_batch_size = 250
+
+    def warmup(self):
+        """Load the model ahead of the first request (no-op for local backends)."""
+
+    def embed(self, texts: list) -> np.ndarray:
+        vectors = [self._embed_batch(texts[start:start + self.max_batch_size])
+                   for start in range(0, len(texts), self.max_batch_size)]
+        return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def _embed_batch(self, texts: list) -> np.ndarray:
+        raise NotImplementedError
+
+
+class VertexEmbeddingBackend(EmbeddingBackend):
+    """Vertex AI TextEmbeddingModel; vertexai is imported and initialized lazily."""
+
+    max_batch_size = 250  # max inputs per get_embeddings request
+
+    def __init__(self, model_name: str = "text-embedding-004"):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                from .gcp import init_vertex
+                from vertexai.language_models import TextEmbeddingModel
+
+                init_vertex()
+                self._model = TextEmbeddingModel.from_pretrained(self.model_name)
+            return self._model
+
+    def warmup(self):
+        self._get_model()
+
+    def _embed_batch(self, texts: list) -> np.ndarray:
+        embeddings = self._get_model().get_embeddings(texts)
+        return np.asarray([e.values for e in embeddings], dtype=np.float32)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic offline stand-in: word unigrams and bigrams are hashed into a
+    fixed number of signed buckets (the hashing trick), log-TF weighted and
+    L2-normalized. Similar texts get similar vectors, so near-copies and
+    paraphrases behave realistically. Each request sleeps `latency_ms` +
+    `per_text_ms` per input, and `max_concurrency` caps simultaneous requests,
+    to mimic a remote model's cost.
+    """
+
+    max_batch_size = 250
+
+    def __init__(self, dim: int = 768, latency_ms: float = 0.0, per_text_ms: float = 0.0,
+                 max_concurrency: int = None):
+        self.dim = dim
+        self.model_name = f"local-hashing-{dim}"
+        self.latency_ms = latency_ms
+        self.per_text_ms = per_text_ms
+        self.calls = 0
+        self._limit = threading.Semaphore(max_concurrency) if max_concurrency else None
+
+    def vectorize(self, text: str) -> np.ndarray:
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") for f in features),
+            dtype=np.uint64,
+            count=len(features),
+        )
+        buckets = (hashes % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where((hashes >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, buckets, signs)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _embed_batch(self, texts: list) -> np.ndarray:
+        self.calls += 1
+        delay = (self.latency_ms + self.per_text_ms * len(texts)) / 1000
+        if delay:
+            if self._limit:
+                with self._limit:
+                    time.sleep(delay)
+            else:
+                time.sleep(delay)
+        return np.stack([self.vectorize(t) for t in texts])
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_embedding_backend(name: str = None) -> EmbeddingBackend:
+    """Build the backend named by `name` (default: EMBEDDING_BACKEND)."""
+    name = (name or EMBEDDING_BACKEND).lower()
+    if name == "vertex":
+        return VertexEmbeddingBackend(os.getenv("EMBEDDING_MODEL", "text-embedding-004"))
+    if name == "local":
+        return HashingEmbeddingBackend(
+            dim=int(os.getenv("LOCAL_EMBEDDING_DIM", 768)),
+            latency_ms=float(os.getenv("LOCAL_EMBEDDING_LATENCY_MS", 0)),
+            per_text_ms=float(os.getenv("LOCAL_EMBEDDING_PER_TEXT_MS", 0)),
+            max_concurrency=int(os.getenv("LOCAL_EMBEDDING_MAX_CONCURRENCY", 0)) or None,
+        )
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {name}")
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    """Process-wide embedding backend selected by configuration."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_embedding_backend()
+            print(f"[Embeddings] Using {type(_backend).__name__} ({_backend.model_name})")
+        return _backend
@@ -0,0 +1,43 @@
+import os
+import threading
+from pathlib import Path
+
+# ----------------------------
+#  GCP Credentials + Vertex AI Init (lazy, once per process)
+# ----------------------------
+GCP_PROJECT_ID = "central-accord-475812-g4"
+GCP_LOCATION = "us-central1"
+
+_init_lock = threading.Lock()
+_vertex_initialized = False
+
+
+def configure_credentials() -> str:
+    """
+    Point GOOGLE_APPLICATION_CREDENTIALS at the service account JSON.
+    Prefers the secret mounted on Render, falls back to the local dev path.
+    """
+    sa_path = Path("/etc/secrets/gcp_sa.json")
+    if not sa_path.exists():
+        sa_path = Path(r"C:/Users/hp/Desktop/agents/central-accord-475812-g4-6d21ba7b0230.json")
+        if not sa_path.exists():
+            raise RuntimeError(f"Service account JSON not found at {sa_path}")
+
+    # Normalize Windows paths
+    credentials = str(sa_path).replace("\\", "/")
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials
+    return credentials
+
+
+def init_vertex():
+    """Configure credentials and call vertexai.init the first time it is needed."""
+    global _vertex_initialized
+    with _init_lock:
+        if _vertex_initialized:
+            return
+        from vertexai import init as vertex_init
+
+        configure_credentials()
+        vertex_init(project=GCP_PROJECT_ID, location=GCP_LOCATION)
+        _vertex_initialized = True
+        print(f"[GCP] Vertex AI initialized for project {GCP_PROJECT_ID} at {GCP_LOCATION}")
@@ -4,20 +4,14 @@ import hashlib
 import asyncio
 import httpx
 import tempfile
-from web3 import Web3
 from pathlib import Path
-import tempfile
-from pinatapy import PinataPy
-import json
-import httpx
+from .registry import integrations
 
 NODE_DAG_API = "https://constellation-server.onrender.com" 
 
 # -------------------------
 # Environment Config
 # -------------------------
-print("\n[INIT] Loading Constellation + Pinata integration config...")
-
 PINATA_API_KEY = os.getenv("PINATA_API_KEY")
 PINATA_SECRET_API_KEY = os.getenv("PINATA_SECRET_API_KEY")
 PINATA_JWT = os.getenv("PINATA_JWT")
@@ -30,15 +24,20 @@ CONSTELLATION_NETWORK = os.getenv("CONSTELLATION_NETWORK", "testnet")
 CONSTELLATION_APP_NAME = os.getenv("CONSTELLATION_APP_NAME", "HakiChain")
 WALLET_PRIVATE_KEY = os.getenv("WALLET_PRIVATE_KEY")
 
-print(f"[CONFIG] CONSTELLATION_API={CONSTELLATION_API}")
-print(f"[CONFIG] CONSTELLATION_NETWORK={CONSTELLATION_NETWORK}")
-print(f"[CONFIG] CONSTELLATION_APP_NAME={CONSTELLATION_APP_NAME}")
-print(f"[CONFIG] Pinata API Key present={bool(PINATA_API_KEY)}\n")
 
-web3 = Web3()
+# Pinata client (created on first use via the integration registry)
+def _create_pinata():
+    from pinatapy import PinataPy
+
+    print("\n[INIT] Loading Constellation + Pinata integration config...")
+    print(f"[CONFIG] CONSTELLATION_API={CONSTELLATION_API}")
+    print(f"[CONFIG] CONSTELLATION_NETWORK={CONSTELLATION_NETWORK}")
+    print(f"[CONFIG] CONSTELLATION_APP_NAME={CONSTELLATION_APP_NAME}")
+    print(f"[CONFIG] Pinata API Key present={bool(PINATA_API_KEY)}\n")
+    return PinataPy(PINATA_API_KEY, PINATA_SECRET_API_KEY)
+
 
-# Initialize Pinata client
-pinata = PinataPy(PINATA_API_KEY, PINATA_SECRET_API_KEY)
+integrations.register("dag", _create_pinata)
 
 # -------------------------
 # Utility
@@ -65,7 +64,8 @@ async def push_to_ipfs(content: str) -> str:
             tmp_file_path = Path(tmp_file.name).as_posix()
 
         print(f"[IPFS] Uploading {tmp_file_path} to Pinata...")
-        result = pinata.pin_file_to_ipfs(tmp_file_path)
+        pinata = await integrations.get_async("dag")
+        result = await asyncio.to_thread(pinata.pin_file_to_ipfs, tmp_file_path)
         print(f"[IPFS] Upload complete. Response: {result}")
         cid = result.get("IpfsHash")
         print(f"[IPFS] CID = {cid}\n")
@@ -1,11 +1,8 @@
 import json
 import asyncio
-from ic.client import Client
-from ic.identity import Identity
-from ic.agent import Agent
-from ic.candid import encode, Types
-from ic.principal import Principal
+from types import SimpleNamespace
 import os
+from .registry import integrations
 
 # ---------------------------------------------------------
 # CONFIGURATION
@@ -13,13 +10,23 @@ import os
 ICP_HOST = os.getenv("ICP_HOST", "http://127.0.0.1:4943")
 CANISTER_ID = os.getenv("ICP_CANISTER_ID", "uxrrr-q7777-77774-qaaaq-cai")
 TIMEOUT_SECONDS = 60  # Timeout for all update/query calls
+BULK_WRITE_CONCURRENCY = int(os.getenv("ICP_BULK_WRITE_CONCURRENCY", 8))
 
 # ---------------------------------------------------------
-# AGENT INITIALIZATION
+# AGENT INITIALIZATION (on first use via the integration registry)
 # ---------------------------------------------------------
-identity = Identity()  # anonymous (can be replaced with PemIdentity)
-client = Client(ICP_HOST)
-agent = Agent(identity, client)
+def _create_agent():
+    from ic.client import Client
+    from ic.identity import Identity
+    from ic.agent import Agent
+    from ic.candid import encode, Types
+
+    identity = Identity()  # anonymous (can be replaced with PemIdentity)
+    client = Client(ICP_HOST)
+    return SimpleNamespace(agent=Agent(identity, client), encode=encode, Types=Types)
+
+
+integrations.register("icp", _create_agent)
 
 # ---------------------------------------------------------
 # HELPERS
@@ -43,21 +50,22 @@ async def register_metadata_hash(document_id: int, metadata: dict):
     """
     print(f"[ICP Debug] >>> Registering document {document_id}")
     try:
+        ic = await integrations.get_async("icp")
         metadata_json = await _safe_encode(metadata)
         print(f"[ICP Debug] metadata_json: {metadata_json}")
         print(f"[ICP Debug] Preparing to encode arguments:")
         print(f"    document_id type: {type(document_id)}, value: {document_id}")
         print(f"    metadata_json type: {type(metadata_json)}, value: {metadata_json}")
 
-        args = encode([
-            {"type": Types.Nat64, "value": document_id},
-            {"type": Types.Text, "value": metadata_json},
+        args = ic.encode([
+            {"type": ic.Types.Nat64, "value": document_id},
+            {"type": ic.Types.Text, "value": metadata_json},
         ])
         print(f"[ICP Debug] Encoded args length: {len(args)} bytes")
 
         # Synchronous update call with timeout
         response = await asyncio.wait_for(
-            asyncio.to_thread(agent.update_raw, CANISTER_ID, "store_metadata", args),
+            asyncio.to_thread(ic.agent.update_raw, CANISTER_ID, "store_metadata", args),
             timeout=TIMEOUT_SECONDS
         )
 
@@ -88,9 +96,10 @@ async def register_metadata_hash(document_id: int, metadata: dict):
 # ---------------------------------------------------------
 async def get_record(record_id: int):
     try:
-        args = encode([{"type": Types.Nat64, "value": record_id}])
+        ic = await integrations.get_async("icp")
+        args = ic.encode([{"type": ic.Types.Nat64, "value": record_id}])
         response = await asyncio.wait_for(
-            asyncio.to_thread(agent.query_raw, CANISTER_ID, "get_record", args),
+            asyncio.to_thread(ic.agent.query_raw, CANISTER_ID, "get_record", args),
             timeout=TIMEOUT_SECONDS
         )
         print(f"[ICP Debug] get_record response: {response}")
@@ -108,9 +117,10 @@ async def list_records():
     usable by the frontend.
     """
     try:
-        args = encode([])
+        ic = await integrations.get_async("icp")
+        args = ic.encode([])
         response = await asyncio.wait_for(
-            asyncio.to_thread(agent.query_raw, CANISTER_ID, "list_records", args),
+            asyncio.to_thread(ic.agent.query_raw, CANISTER_ID, "list_records", args),
             timeout=TIMEOUT_SECONDS
         )
 
@@ -170,25 +180,26 @@ async def register_story_metadata_hash(document_id: int, metadata: dict, matches
     Stores story metadata along with detection matches on ICP.
     """
     try:
+        ic = await integrations.get_async("icp")
         metadata_json = await _safe_encode(metadata)
 
         # Prepare matches as proper list of dicts
         candid_matches = [{"url": m["url"], "similarity": m["similarity"]} for m in matches]
 
         # Define the Candid Record Type for a single match entry
-        MatchRecordType = Types.Record({
-            "url": Types.Text,
-            "similarity": Types.Float64
+        MatchRecordType = ic.Types.Record({
+            "url": ic.Types.Text,
+            "similarity": ic.Types.Float64
         })
 
-        args = encode([
-            {"type": Types.Nat64, "value": document_id},
-            {"type": Types.Text, "value": metadata_json},
-            {"type": Types.Vec(MatchRecordType), "value": candid_matches} 
+        args = ic.encode([
+            {"type": ic.Types.Nat64, "value": document_id},
+            {"type": ic.Types.Text, "value": metadata_json},
+            {"type": ic.Types.Vec(MatchRecordType), "value": candid_matches} 
         ])
 
         response = await asyncio.wait_for(
-            asyncio.to_thread(agent.update_raw, CANISTER_ID, "store_story_metadata", args),
+            asyncio.to_thread(ic.agent.update_raw, CANISTER_ID, "store_story_metadata", args),
             timeout=TIMEOUT_SECONDS
         )
 
@@ -212,6 +223,35 @@ async def register_story_metadata_hash(document_id: int, metadata: dict, matches
         traceback.print_exc()
         return None
 
+# ---------------------------------------------------------
+# BULK: REGISTER MANY STORY METADATA RECORDS
+# ---------------------------------------------------------
+async def register_story_metadata_batch(records: list, concurrency: int = BULK_WRITE_CONCURRENCY):
+    """
+    Stores many story metadata records as one grouped write.
+    `records` is a list of dicts with document_id, metadata and matches.
+    The canister has no bulk update method, so records are sent as
+    store_story_metadata calls with at most `concurrency` in flight.
+    Returns record ids (or None) in input order.
+    """
+    if not records:
+        return []
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _store(record):
+        async with semaphore:
+            return await register_story_metadata_hash(
+                document_id=record["document_id"],
+                metadata=record["metadata"],
+                matches=record["matches"],
+            )
+
+    record_ids = await asyncio.gather(*(_store(r) for r in records))
+    stored = sum(r is not None for r in record_ids)
+    print(f"[ICP Bulk] Stored {stored}/{len(records)} story metadata records")
+    return record_ids
+
 # ---------------------------------------------------------
 # FETCH CASE FROM ICP
 # ---------------------------------------------------------
@@ -221,10 +261,11 @@ async def fetch_case(document_id: int):
     Returns a dict containing document + matches, or None if not found.
     """
     try:
-        args = encode([{"type": Types.Nat64, "value": document_id}])
+        ic = await integrations.get_async("icp")
+        args = ic.encode([{"type": ic.Types.Nat64, "value": document_id}])
 
         response = await asyncio.wait_for(
-            asyncio.to_thread(agent.query_raw, CANISTER_ID, "get_story_by_document", args),
+            asyncio.to_thread(ic.agent.query_raw, CANISTER_ID, "get_story_by_document", args),
             timeout=TIMEOUT_SECONDS
         )
 
@@ -0,0 +1,77 @@
+import os
+import time
+import asyncio
+import threading
+
+# ----------------------------
+# Integration Registry (lazy clients + background warm-up)
+# ----------------------------
+# External clients (Story RPC, ICP agent, Pinata, Gemini, embedding model,
+# detection corpus) are registered as factories and created on first use
+# instead of at import, so the app starts without any of them. After
+# startup, warmup() creates them all concurrently in the background. A
+# failed init is retried on the next use after INTEGRATION_RETRY_SECONDS.
+
+INTEGRATION_RETRY_SECONDS = float(os.getenv("INTEGRATION_RETRY_SECONDS", 30))
+
+
+class IntegrationRegistry:
+    def __init__(self, retry_seconds: float = INTEGRATION_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self._factories = {}
+        self._clients = {}
+        self._locks = {}
+        self._status = {}
+
+    def register(self, name: str, factory):
+        """Register `factory()` (blocking, returns the client) under `name`."""
+        self._factories[name] = factory
+        self._locks.setdefault(name, threading.Lock())
+        self._status.setdefault(name, {"ready": False, "init_ms": None, "error": None, "failed_at": None})
+
+    def get(self, name: str):
+        """Return the client, creating it on first use (blocking; call from a thread in async code)."""
+        if name in self._clients:
+            return self._clients[name]
+        with self._locks[name]:
+            if name in self._clients:
+                return self._clients[name]
+            status = self._status[name]
+            if status["failed_at"] and time.monotonic() - status["failed_at"] < self.retry_seconds:
+                raise RuntimeError(f"{name} integration unavailable: {status['error']}")
+            started = time.perf_counter()
+            try:
+                client = self._factories[name]()
+            except Exception as e:
+                status.update(error=f"{type(e).__name__}: {e}", failed_at=time.monotonic(),
+                              init_ms=round((time.perf_counter() - started) * 1000, 1))
+                print(f"[Integrations] {name} init failed: {e}")
+                raise
+            status.update(ready=True, error=None, failed_at=None,
+                          init_ms=round((time.perf_counter() - started) * 1000, 1))
+            self._clients[name] = client
+            print(f"[Integrations] {name} ready in {status['init_ms']} ms")
+            return client
+
+    async def get_async(self, name: str):
+        if name in self._clients:
+            return self._clients[name]
+        return await asyncio.to_thread(self.get, name)
+
+    async def warmup(self, names: list = None):
+        """Initialize components concurrently; failures are recorded, not raised."""
+        names = names or list(self._factories)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.get_async(n) for n in names), return_exceptions=True)
+        ready = sum(not isinstance(r, Exception) for r in results)
+        print(f"[Integrations] Warm-up: {ready}/{len(names)} ready in "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def stats(self) -> dict:
+        stats = {}
+        for name, status in self._status.items():
+            stats[name] = {"ready": status["ready"], "init_ms": status["init_ms"], "error": status["error"]}
+        return stats
+
+
+integrations = IntegrationRegistry()
@@ -1,8 +1,9 @@
 # services/integrations/story.py
 import os
 import json
+from types import SimpleNamespace
 from pathlib import Path
-from web3 import Web3
+from .registry import integrations
 
 # -------------------------
 # Config / Environment
@@ -19,34 +20,37 @@ CONTRACT_ADDRESS = os.getenv("STORY_CONTRACT_ADDRESS", "0x2afce5b30DFD0d53a98e65
 
 # Expect a private key in .env
 WALLET_PRIVATE_KEY = os.getenv("WALLET_PRIVATE_KEY")
-if not WALLET_PRIVATE_KEY:
-    raise EnvironmentError("Missing WALLET_PRIVATE_KEY in environment.")
 
-# -------------------------
-# ABI Loading
-# -------------------------
 # Resolve the path to services/StoryIPRegister.json
 BASE_DIR = Path(__file__).resolve().parent.parent  # points to /services
 CONTRACT_ABI_PATH = BASE_DIR / "StoryIPRegister.json"
 
-if not CONTRACT_ABI_PATH.exists():
-    raise FileNotFoundError(f"Contract ABI not found at {CONTRACT_ABI_PATH}")
-
-with open(CONTRACT_ABI_PATH, "r") as f:
-    CONTRACT_ABI = json.load(f)["abi"]  # read only the ABI field
-
 # -------------------------
-# Web3 Connection
+# Web3 Connection (created on first use via the integration registry)
 # -------------------------
-web3 = Web3(Web3.HTTPProvider(RPC_PROVIDER_URL))
-if not web3.is_connected():
-    raise ConnectionError(f"Web3 cannot connect to provider at {RPC_PROVIDER_URL}")
-
-account = web3.eth.account.from_key(WALLET_PRIVATE_KEY)
-contract = web3.eth.contract(
-    address=Web3.to_checksum_address(CONTRACT_ADDRESS),
-    abi=CONTRACT_ABI
-)
+def _create_client():
+    from web3 import Web3
+
+    if not WALLET_PRIVATE_KEY:
+        raise EnvironmentError("Missing WALLET_PRIVATE_KEY in environment.")
+    if not CONTRACT_ABI_PATH.exists():
+        raise FileNotFoundError(f"Contract ABI not found at {CONTRACT_ABI_PATH}")
+    with open(CONTRACT_ABI_PATH, "r") as f:
+        contract_abi = json.load(f)["abi"]  # read only the ABI field
+
+    web3 = Web3(Web3.HTTPProvider(RPC_PROVIDER_URL))
+    if not web3.is_connected():
+        raise ConnectionError(f"Web3 cannot connect to provider at {RPC_PROVIDER_URL}")
+
+    account = web3.eth.account.from_key(WALLET_PRIVATE_KEY)
+    contract = web3.eth.contract(
+        address=Web3.to_checksum_address(CONTRACT_ADDRESS),
+        abi=contract_abi
+    )
+    return SimpleNamespace(Web3=Web3, web3=web3, account=account, contract=contract)
+
+
+integrations.register("story", _create_client)
 
 # -------------------------
 # Register Document
@@ -56,6 +60,8 @@ def register_document(title: str, content: str, metadata: dict) -> str:
     Registers a document on-chain (Aeneid network).
     Returns the on-chain asset ID.
     """
+    client = integrations.get("story")
+    Web3, web3, account, contract = client.Web3, client.web3, client.account, client.contract
     content_hash = Web3.to_hex(Web3.keccak(text=content))
     metadata_json = json.dumps(metadata)
 
@@ -1,7 +1,8 @@
 import asyncio
 import httpx
-import pdfplumber
 from .utils import run_vertex_async
+from .longdoc import needs_map_reduce, run_long_document
+from .prompts import PromptField, build_prompt, format_report
 
 async def fetch_pdf_text(url: str) -> str:
     """Download PDF from URL and extract text."""
@@ -13,13 +14,15 @@ async def fetch_pdf_text(url: str) -> str:
         with open(temp_path, "wb") as f:
             f.write(resp.content)
     # Extract text
+    import pdfplumber  # imported on first use; it is slow to import
+
     text = ""
     with pdfplumber.open(temp_path) as pdf:
         for page in pdf.pages:
             text += page.extract_text() + "\n"
     return text.strip()
 
-async def process(payload: dict):
+async def process(payload: dict, on_partial=None):
     """
     Perform deep legal research via Vertex AI on actual document content.
     """
@@ -41,15 +44,23 @@ async def process(payload: dict):
         "Summarize key points, relevant cases, statutes, and any references relevant to the document."
     )
 
-    user_msg = (
-        f"Document title: {payload.get('title', '')}\n"
-        f"Description: {payload.get('description', '')}\n"
-        f"Document content:\n{document_text}\n"
-        f"Requirements: {payload.get('requirements', {})}\n"
-        f"Metadata: {payload.get('metadata', {})}"
-    )
+    # Prompt fields by budget priority: document content gets whatever the others leave
+    context_fields = [
+        PromptField("Document title", payload.get("title", ""), priority=0, max_tokens=64),
+        PromptField("Description", payload.get("description", ""), priority=1, max_tokens=256),
+        PromptField("Requirements", payload.get("requirements", {}), priority=2, max_tokens=256),
+        PromptField("Metadata", payload.get("metadata", {}), priority=3, max_tokens=192),
+    ]
+    user_msg, report = build_prompt(context_fields + [PromptField("Document content", document_text, priority=4)])
 
-    generated_text = await run_vertex_async(user_msg, system_prompt=system_msg)
+    # Documents that do not fit the prompt budget are analysed chunk by chunk instead of being truncated
+    if needs_map_reduce(user_msg, report, "Document content"):
+        context, report = build_prompt(context_fields)
+        print(f"[Agent Lens] Context prompt: {format_report(report)}")
+        generated_text = await run_long_document(document_text, system_msg, context, module="lens", on_partial=on_partial)
+    else:
+        print(f"[Agent Lens] Prompt: {format_report(report)}")
+        generated_text = await run_vertex_async(user_msg, system_prompt=system_msg, module="lens", on_partial=on_partial)
     print(f"[Agent Lens Output] {generated_text[:500]}{'...' if len(generated_text) > 500 else ''}")
 
     result = {
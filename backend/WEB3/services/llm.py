@@ -0,0 +1,188 @@
+import os
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+
+# ----------------------------
+# LLM Backends
+# ----------------------------
+# Selected with LLM_BACKEND:
+#   vertex -> Gemini on Vertex AI (credentials loaded on first use)
+#   local  -> offline stand-in with configurable latency, streaming cadence,
+#             error / empty-response rates and output sizes, for load tests
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "vertex").lower()
+_WORDS = (
+    "agreement party clause liability term notice breach remedy obligation consent statute court "
+    "jurisdiction damages warranty indemnity license evidence claim review section provision"
+).split()
+
+
+class LLMBackend:
+    """
+    Interface: `model_name`, generate(prompt, config) -> response with
+    `.text` / `.usage_metadata`, and stream(prompt, config) -> iterator of
+    chunks with `.text` (the last one may carry `.usage_metadata`).
+    """
+
+    model_name = ""
+
+    def generate(self, prompt: str, config: dict):
+        raise NotImplementedError
+
+    def stream(self, prompt: str, config: dict):
+        raise NotImplementedError
+
+
+class VertexLLMBackend(LLMBackend):
+    """Gemini GenerativeModel; vertexai is imported and initialized lazily."""
+
+    def __init__(self, model_name: str = "gemini-2.5-flash"):
+        self.model_name = model_name
+        self._model = None
+        self._safety_settings = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from .gcp import init_vertex
+                from vertexai.generative_models import GenerativeModel, HarmCategory, HarmBlockThreshold
+
+                init_vertex()
+                self._model = GenerativeModel(self.model_name)
+                self._safety_settings = {
+                    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+                    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+                    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+                    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+                }
+                print(f"✅ Gemini model {self.model_name} loaded")
+            return self._model
+
+    def generate(self, prompt: str, config: dict):
+        model = self.model
+        return model.generate_content([prompt], generation_config=config, safety_settings=self._safety_settings)
+
+    def stream(self, prompt: str, config: dict):
+        model = self.model
+        return model.generate_content(
+            [prompt], generation_config=config, safety_settings=self._safety_settings, stream=True
+        )
+
+
+class MockQuotaError(Exception):
+    """Stand-in for Vertex's 429 RESOURCE_EXHAUSTED."""
+
+    def __str__(self):
+        return "429 Resource exhausted (mock quota)"
+
+
+class MockLLMBackend(LLMBackend):
+    """
+    Offline stand-in. Time to first token is log-normal around `latency_ms`
+    (spread `latency_sigma`); the answer then arrives in `chunk_tokens`-token
+    chunks every `chunk_ms` (a non-streamed call sleeps for the whole stream).
+    Output length is `output_tokens` +/- 50%, capped by max_output_tokens.
+    A fraction of calls fails with a generic error (`error_rate`), a quota
+    error (`quota_error_rate`) or returns no text (`empty_rate`). The answer
+    text depends only on the prompt, so the prompt cache behaves as in
+    production.
+    """
+
+    def __init__(self, latency_ms: float = 800.0, latency_sigma: float = 0.5, chunk_ms: float = 40.0,
+                 chunk_tokens: int = 20, output_tokens: int = 400, error_rate: float = 0.0,
+                 quota_error_rate: float = 0.0, empty_rate: float = 0.0, seed: int = None):
+        self.model_name = "local-mock"
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.chunk_ms = chunk_ms
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self.empty_rate = empty_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _plan(self, prompt: str, config: dict):
+        """Draw this call's latency / outcome and build its (prompt-determined) answer chunks."""
+        with self._lock:
+            self.calls += 1
+            latency = self._rng.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000 if self.latency_ms else 0.0
+            outcome = self._rng.random()
+
+        if outcome < self.error_rate:
+            time.sleep(latency)
+            raise RuntimeError("mock LLM backend error")
+        if outcome < self.error_rate + self.quota_error_rate:
+            raise MockQuotaError()
+        if outcome < self.error_rate + self.quota_error_rate + self.empty_rate:
+            return latency, []
+
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        text_rng = random.Random(digest)
+        limit = (config or {}).get("max_output_tokens") or self.output_tokens * 2
+        tokens = min(limit, max(1, int(self.output_tokens * text_rng.uniform(0.5, 1.5))))
+        words = [f"Mock answer {digest[:4].hex()}:"] + [text_rng.choice(_WORDS) for _ in range(tokens - 1)]
+        chunks = [" ".join(words[i:i + self.chunk_tokens]) + " " for i in range(0, len(words), self.chunk_tokens)]
+        return latency, chunks
+
+    def _usage(self, prompt: str, chunks: list):
+        return SimpleNamespace(
+            prompt_token_count=len(prompt) // 4 + 1,
+            candidates_token_count=sum(len(c.split()) for c in chunks),
+        )
+
+    def generate(self, prompt: str, config: dict):
+        latency, chunks = self._plan(prompt, config)
+        time.sleep(latency + len(chunks) * self.chunk_ms / 1000)
+        return SimpleNamespace(text="".join(chunks).strip(), usage_metadata=self._usage(prompt, chunks))
+
+    def stream(self, prompt: str, config: dict):
+        latency, chunks = self._plan(prompt, config)
+        time.sleep(latency)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(self.chunk_ms / 1000)
+            last = i == len(chunks) - 1
+            yield SimpleNamespace(text=chunk, usage_metadata=self._usage(prompt, chunks) if last else None)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_llm_backend(name: str = None) -> LLMBackend:
+    """Build the backend named by `name` (default: LLM_BACKEND)."""
+    name = (name or LLM_BACKEND).lower()
+    if name == "vertex":
+        return VertexLLMBackend(os.getenv("LLM_MODEL", "gemini-2.5-flash"))
+    if name == "local":
+        seed = os.getenv("LOCAL_LLM_SEED")
+        return MockLLMBackend(
+            latency_ms=float(os.getenv("LOCAL_LLM_LATENCY_MS", 800)),
+            latency_sigma=float(os.getenv("LOCAL_LLM_LATENCY_SIGMA", 0.5)),
+            chunk_ms=float(os.getenv("LOCAL_LLM_CHUNK_MS", 40)),
+            chunk_tokens=int(os.getenv("LOCAL_LLM_CHUNK_TOKENS", 20)),
+            output_tokens=int(os.getenv("LOCAL_LLM_OUTPUT_TOKENS", 400)),
+            error_rate=float(os.getenv("LOCAL_LLM_ERROR_RATE", 0)),
+            quota_error_rate=float(os.getenv("LOCAL_LLM_QUOTA_ERROR_RATE", 0)),
+            empty_rate=float(os.getenv("LOCAL_LLM_EMPTY_RATE", 0)),
+            seed=int(seed) if seed else None,
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+
+def get_llm_backend() -> LLMBackend:
+    """Process-wide LLM backend selected by configuration."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_llm_backend()
+            print(f"[LLM] Using {type(_backend).__name__} ({_backend.model_name})")
+        return _backend
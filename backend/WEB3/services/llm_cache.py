@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+# ----------------------------
+# LLM Prompt/Response Cache (LRU memory tier + disk tier with TTL)
+# ----------------------------
+# Keys are content hashes of everything that determines a response (model,
+# generation config, system prompt, sanitized prompt), so re-running an agent
+# on an unchanged document is answered without a Vertex AI call. Entries
+# expire after `ttl_seconds` in both tiers. The disk tier is swept in the
+# background at most every `sweep_seconds`: expired files are deleted, then
+# the least recently written ones until it is under `max_disk_bytes`.
+
+
+def prompt_key(model: str, config: dict, system_prompt: str, prompt: str) -> str:
+    """Stable content hash of one generation request."""
+    payload = json.dumps([model, config, system_prompt or "", prompt], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    def __init__(self, max_entries: int = 512, disk_dir: Path = None, ttl_seconds: float = 86400,
+                 max_disk_bytes: int = 0, sweep_seconds: float = 600):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes  # 0 = unbounded
+        self.sweep_seconds = sweep_seconds  # 0 = only when sweep() is called
+        self._entries = OrderedDict()  # key -> (created_at, text)
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._stats = {
+            "hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "stores": 0, "bypassed": 0,
+            "disk_swept": 0,
+        }
+        self._modules = {}  # module -> {"hits", "misses", "bypassed"}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _fresh(self, created_at: float) -> bool:
+        return not self.ttl_seconds or time.time() - created_at < self.ttl_seconds
+
+    def _count(self, stat: str, module: str = None):
+        with self._lock:
+            self._stats[stat] += 1
+            if module and stat in ("hits", "disk_hits", "misses", "bypassed"):
+                counters = self._modules.setdefault(module, {"hits": 0, "misses": 0, "bypassed": 0})
+                counters["hits" if stat == "disk_hits" else stat] += 1
+
+    def bypass(self, module: str = None):
+        """Record a lookup skipped because the caller opted out of caching."""
+        self._count("bypassed", module)
+
+    def get(self, key: str, module: str = None):
+        """Return the cached response text, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._fresh(entry[0]):
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+                    self._stats["expired"] += 1
+                    entry = None
+        if entry is not None:
+            self._count("hits", module)
+            return entry[1]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                record = None
+            if record is not None:
+                if self._fresh(record["created_at"]):
+                    self._remember(key, record["created_at"], record["text"])
+                    self._count("disk_hits", module)
+                    return record["text"]
+                path.unlink(missing_ok=True)
+                self._count("expired")
+
+        self._count("misses", module)
+        return None
+
+    def put(self, key: str, text: str):
+        if not self.enabled:
+            return
+        created_at = time.time()
+        self._remember(key, created_at, text)
+        self._count("stores")
+        if self.disk_dir:
+            path = self._disk_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created_at": created_at, "text": text}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._maybe_sweep()
+
+    # ----------------------------
+    # Disk Sweep
+    # ----------------------------
+    def _maybe_sweep(self):
+        with self._lock:
+            if not self.sweep_seconds or time.time() - self._last_sweep < self.sweep_seconds:
+                return
+            self._last_sweep = time.time()
+        threading.Thread(target=self.sweep, name="llm-cache-sweep", daemon=True).start()
+
+    def sweep(self) -> int:
+        """Delete expired disk entries, then the oldest ones beyond max_disk_bytes. Returns files removed."""
+        files = []
+        # Only this cache's <key[:2]>/<key>.json files (other caches may live in subdirectories)
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # removed by another worker
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort(reverse=True)
+
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds else None
+        total, removed = 0, 0
+        for mtime, size, path in files:
+            total += size
+            if (cutoff is not None and mtime < cutoff) or (self.max_disk_bytes and total > self.max_disk_bytes):
+                path.unlink(missing_ok=True)
+                removed += 1
+        with self._lock:
+            self._stats["disk_swept"] += removed
+        return removed
+
+    def _remember(self, key: str, created_at: float, text: str):
+        with self._lock:
+            self._entries[key] = (created_at, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            stats["ttl_seconds"] = self.ttl_seconds
+            stats["max_disk_bytes"] = self.max_disk_bytes
+            stats["modules"] = {name: dict(counters) for name, counters in self._modules.items()}
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        for counters in stats["modules"].values():
+            module_lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = round(counters["hits"] / module_lookups, 4) if module_lookups else 0.0
+        return stats
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import queue
+import bisect
+import logging
+import threading
+from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# ----------------------------
+# Per-Call LLM Instrumentation
+# ----------------------------
+# Every run_vertex_async call produces one record (module, cache hit, queue
+# wait, model latency, token counts, retries and their reasons, cost, error).
+# Records update in-process counters and fixed-bucket histograms, readable
+# as JSON or Prometheus text, and are appended as JSON lines to a
+# size-rotated file by a background thread (recording never blocks on disk).
+# The file, its directory and that thread are only created by the first
+# recorded call, so importing this module has no side effects.
+
+LLM_METRICS_FILE = os.getenv("LLM_METRICS_FILE", "true").lower() in ["1", "true", "yes"]
+LLM_METRICS_DIR = Path(os.getenv("LLM_METRICS_DIR", Path(__file__).resolve().parent / "data" / "llm_metrics"))
+LLM_METRICS_FILE_MAX_BYTES = int(os.getenv("LLM_METRICS_FILE_MAX_BYTES", 10 * 1024 * 1024))
+LLM_METRICS_FILE_BACKUPS = int(os.getenv("LLM_METRICS_FILE_BACKUPS", 5))
+# USD per 1K tokens (Gemini 2.5 Flash list prices by default)
+LLM_COST_INPUT_PER_1K = float(os.getenv("LLM_COST_INPUT_PER_1K", 0.0003))
+LLM_COST_OUTPUT_PER_1K = float(os.getenv("LLM_COST_OUTPUT_PER_1K", 0.0025))
+
+MS_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+TOKEN_BUCKETS = (64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+HISTOGRAMS = {
+    "total_ms": MS_BUCKETS,
+    "queue_ms": MS_BUCKETS,
+    "model_ms": MS_BUCKETS,
+    "first_chunk_ms": MS_BUCKETS,
+    "prompt_tokens": TOKEN_BUCKETS,
+    "response_tokens": TOKEN_BUCKETS,
+}
+
+
+def call_cost(prompt_tokens: int, response_tokens: int) -> float:
+    return prompt_tokens / 1000 * LLM_COST_INPUT_PER_1K + response_tokens / 1000 * LLM_COST_OUTPUT_PER_1K
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """Upper bucket bound holding the q-quantile (None for +Inf / no samples)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+
+class ModuleMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.attempts = 0
+        self.retries = {}  # reason -> count
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.cost_usd = 0.0
+        self.histograms = {name: Histogram(buckets) for name, buckets in HISTOGRAMS.items()}
+
+
+class LLMMetrics:
+    def __init__(self, log_dir: Path = None):
+        self.log_dir = Path(log_dir) if log_dir else None
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._modules = {}
+        self._logger = None
+        self._queue_handler = None
+        self._listener = None
+
+    def _file_logger(self):
+        """The call log, opened on first use (None without a log_dir)."""
+        if self.log_dir is None or self._logger is not None:
+            return self._logger
+        with self._log_lock:
+            if self._logger is None:
+                self.log_dir.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    self.log_dir / "llm_calls.jsonl", maxBytes=LLM_METRICS_FILE_MAX_BYTES,
+                    backupCount=LLM_METRICS_FILE_BACKUPS, encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                records = queue.SimpleQueue()
+                logger = logging.getLogger("services.llm_metrics.calls")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                self._queue_handler = QueueHandler(records)
+                logger.addHandler(self._queue_handler)
+                self._listener = QueueListener(records, handler)
+                self._listener.start()
+                self._logger = logger
+        return self._logger
+
+    def record(self, call: dict):
+        """Add one finished generation (see run_vertex_async for the fields)."""
+        call.setdefault("ts", round(time.time(), 3))
+        call["cost_usd"] = round(call_cost(call.get("prompt_tokens", 0), call.get("response_tokens", 0)), 6)
+        with self._lock:
+            metrics = self._modules.setdefault(call.get("module") or "default", ModuleMetrics())
+            metrics.calls += 1
+            metrics.cache_hits += bool(call.get("cache_hit"))
+            metrics.errors += bool(call.get("error"))
+            metrics.attempts += call.get("attempts", 0)
+            for reason in call.get("retries", ()):
+                metrics.retries[reason] = metrics.retries.get(reason, 0) + 1
+            metrics.prompt_tokens += call.get("prompt_tokens", 0)
+            metrics.response_tokens += call.get("response_tokens", 0)
+            metrics.cost_usd += call["cost_usd"]
+            for name, histogram in metrics.histograms.items():
+                value = call.get(name)
+                if value is not None and not (call.get("cache_hit") and name != "total_ms"):
+                    histogram.observe(value)
+        logger = self._file_logger()
+        if logger:
+            logger.info(json.dumps(call, ensure_ascii=False, default=str))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for module, m in self._modules.items():
+                stats[module] = {
+                    "calls": m.calls,
+                    "cache_hits": m.cache_hits,
+                    "errors": m.errors,
+                    "model_attempts": m.attempts,
+                    "retries": dict(m.retries),
+                    "prompt_tokens": m.prompt_tokens,
+                    "response_tokens": m.response_tokens,
+                    "cost_usd": round(m.cost_usd, 6),
+                }
+                for name in ("total_ms", "queue_ms", "model_ms", "first_chunk_ms"):
+                    histogram = m.histograms[name]
+                    stats[module][name] = {
+                        "count": histogram.count,
+                        "avg": round(histogram.total / histogram.count, 1) if histogram.count else None,
+                        "p50_le": histogram.quantile(0.5),
+                        "p95_le": histogram.quantile(0.95),
+                    }
+            return stats
+
+    def prometheus(self, gauges: dict = None) -> str:
+        """Prometheus text exposition of the counters and histograms, plus `gauges` ({name: value})."""
+        lines = []
+        for metric, value in (gauges or {}).items():
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        with self._lock:
+            modules = sorted(self._modules.items())
+            counters = (
+                ("llm_calls_total", "calls", "Generations requested"),
+                ("llm_cache_hits_total", "cache_hits", "Generations answered from the prompt cache"),
+                ("llm_errors_total", "errors", "Generations that raised"),
+                ("llm_model_attempts_total", "attempts", "Model calls made (including retries)"),
+                ("llm_prompt_tokens_total", "prompt_tokens", "Prompt tokens sent"),
+                ("llm_response_tokens_total", "response_tokens", "Response tokens received"),
+                ("llm_cost_usd_total", "cost_usd", "Estimated cost in USD"),
+            )
+            for metric, attr, help_text in counters:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                lines += [f'{metric}{{module="{module}"}} {getattr(m, attr)}' for module, m in modules]
+
+            lines += ["# HELP llm_retries_total Retries by reason", "# TYPE llm_retries_total counter"]
+            for module, m in modules:
+                lines += [f'llm_retries_total{{module="{module}",reason="{reason}"}} {n}'
+                          for reason, n in sorted(m.retries.items())]
+
+            for name, buckets in HISTOGRAMS.items():
+                metric = f"llm_{name}"
+                lines += [f"# HELP {metric} Per-call {name.replace('_', ' ')}", f"# TYPE {metric} histogram"]
+                for module, m in modules:
+                    h, cumulative = m.histograms[name], 0
+                    for bound, n in zip(buckets + ("+Inf",), h.counts):
+                        cumulative += n
+                        lines.append(f'{metric}_bucket{{module="{module}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{module="{module}"}} {round(h.total, 3)}')
+                    lines.append(f'{metric}_count{{module="{module}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Write out queued records and stop the log thread (the next record reopens the log)."""
+        with self._log_lock:
+            if self._logger is None:
+                return
+            self._logger.removeHandler(self._queue_handler)
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._logger = self._queue_handler = self._listener = None
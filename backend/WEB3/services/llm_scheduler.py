@@ -0,0 +1,150 @@
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+
+# ----------------------------
+# LLM Call Scheduler (max in-flight + RPM/TPM token buckets + priorities)
+# ----------------------------
+# Every Gemini call waits for a slot. A slot is granted when fewer than
+# `max_in_flight` calls are running and both the requests-per-minute and the
+# tokens-per-minute buckets can pay for the call. Waiters are served strictly
+# by priority (interactive agents before bulk jobs), then in arrival order.
+
+INTERACTIVE, BULK = 0, 1
+WAIT_SAMPLES = 512  # recent wait times kept per module for percentiles
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to a capacity of `per_minute`. 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        if not self.per_minute:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.per_minute)  # a call larger than the budget still runs, alone
+        return max(0.0, (amount - self.level) * 60.0 / self.per_minute)
+
+    def take(self, amount: float):
+        """Spend units; may go negative when actual usage exceeded the estimate."""
+        if self.per_minute:
+            self._refill()
+            self.level -= amount
+
+
+class LLMScheduler:
+    def __init__(self, max_in_flight: int = 4, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 priorities: dict = None):
+        self.max_in_flight = max_in_flight
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.priorities = priorities or {}
+        self._in_flight = 0
+        self._waiters = []  # heap of (priority, seq, tokens, future)
+        self._seq = itertools.count()
+        self._timer = None
+        self._stats = {"granted": 0, "completed": 0, "rate_limited": 0, "cancelled": 0}
+        self._waits = {}  # module -> deque of wait ms
+
+    def priority(self, module: str) -> int:
+        return self.priorities.get(module, BULK)
+
+    async def acquire(self, module: str = None, tokens: int = 0, priority: int = None) -> float:
+        """
+        Wait for a slot; returns the time spent queued in milliseconds. Pair with release().
+        `priority` overrides the module's tier (e.g. BULK for background steps of an interactive module).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        started = time.perf_counter()
+        priority = self.priority(module) if priority is None else priority
+        heapq.heappush(self._waiters, (priority, next(self._seq), tokens, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # granted just before the cancellation arrived
+            else:
+                self._waiters = [w for w in self._waiters if w[3] is not future]
+                heapq.heapify(self._waiters)
+                self._stats["cancelled"] += 1
+            raise
+        waited_ms = (time.perf_counter() - started) * 1000
+        self._waits.setdefault(module or "default", deque(maxlen=WAIT_SAMPLES)).append(waited_ms)
+        return waited_ms
+
+    def release(self, used_tokens: int = 0):
+        """Free the slot; `used_tokens` charges tokens beyond the estimate paid at acquire()."""
+        self._in_flight -= 1
+        self._stats["completed"] += 1
+        if used_tokens:
+            self.tokens.take(used_tokens)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters and self._in_flight < self.max_in_flight:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = max(self.requests.delay(1), self.tokens.delay(tokens))
+            if delay > 0:
+                # The head of the queue waits for the budget; nobody overtakes it
+                if self._timer is None:
+                    self._stats["rate_limited"] += 1
+                    self._timer = future.get_loop().call_later(delay, self._on_timer)
+                return
+            heapq.heappop(self._waiters)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self._in_flight += 1
+            self._stats["granted"] += 1
+            future.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def stats(self) -> dict:
+        self.tokens.delay(0)  # refill before reporting the level
+        depth = {"interactive": 0, "bulk": 0}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                depth["interactive" if priority == INTERACTIVE else "bulk"] += 1
+        waits = {}
+        for module, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[module] = {
+                "samples": len(ordered),
+                "avg_ms": round(sum(ordered) / len(ordered), 2),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                "max_ms": round(ordered[-1], 2),
+            }
+        return {
+            **self._stats,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": depth,
+            "requests_per_minute": self.requests.per_minute,
+            "tokens_per_minute": self.tokens.per_minute,
+            "tokens_available": None if not self.tokens.per_minute else round(self.tokens.level),
+            "wait_ms": waits,
+        }
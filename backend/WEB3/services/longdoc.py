@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+
+from .utils import run_vertex_async, prompt_chars, chunk_cache, PROMPT_CHAR_LIMIT
+from .llm_scheduler import estimate_tokens, BULK
+
+# ----------------------------
+# Long-Document Map-Reduce
+# ----------------------------
+# Documents that do not fit in one prompt are split into token-budgeted
+# chunks. Every chunk is analysed on its own (concurrently, through the shared
+# LLM scheduler), then the chunk notes are merged by a reduce step, in several
+# rounds if the notes themselves do not fit in one prompt.
+#
+# Chunk boundaries are content-defined: a chunk may end after a sentence whose
+# hash says so (once the chunk is past half the budget), so an edit only moves
+# the boundaries around it. Chunk prompts carry no position, so unchanged
+# chunks hit the chunk-notes cache (its own TTL, LONGDOC_CHUNK_CACHE_TTL_SECONDS)
+# when a document is re-run.
+#
+# Sizes are measured after sanitize_prompt's brace escaping (prompt_chars), so
+# a chunk full of JSON still fits in PROMPT_CHAR_LIMIT once it is sent.
+#
+# Map and combine calls are background work, scheduled in the BULK tier so
+# they do not hold up other users' interactive generations; only the final
+# reduce (the streamed answer) keeps the module's own priority.
+
+LONGDOC_ENABLED = os.getenv("LONGDOC_ENABLED", "true").lower() in ["1", "true", "yes"]
+LONGDOC_CHUNK_TOKENS = int(os.getenv("LONGDOC_CHUNK_TOKENS", 1400))
+BOUNDARY_EVERY = 4  # on average every 4th sentence may end a chunk
+MIN_CHUNK_CHARS = 1000
+
+MAP_INSTRUCTION = (
+    "You are given one excerpt of a longer document. Extract only what this excerpt contributes "
+    "to the task above, as concise notes. Do not write an introduction or a conclusion."
+)
+COMBINE_INSTRUCTION = (
+    "You are given notes taken from consecutive excerpts of a longer document. "
+    "Condense them into one set of notes, keeping every distinct point and dropping duplicates."
+)
+REDUCE_INSTRUCTION = (
+    "The document was analysed in excerpts. Using the notes from all excerpts below, "
+    "write one complete answer for the whole document, removing duplicates."
+)
+
+
+def needs_map_reduce(prompt: str, report: dict, field: str) -> bool:
+    """
+    True when the single prompt built by build_prompt (`prompt`, `report`)
+    would lose part of the document: `field` was cut to fit the token budget,
+    or the prompt exceeds PROMPT_CHAR_LIMIT once sanitized.
+    """
+    truncated = report["fields"].get(field, {}).get("truncated", False)
+    return LONGDOC_ENABLED and (truncated or prompt_chars(prompt) > PROMPT_CHAR_LIMIT)
+
+
+def _fit(text: str, max_chars: int) -> int:
+    """Longest prefix length of text whose prompt_chars is at most max_chars."""
+    cut = min(len(text), max_chars)
+    while prompt_chars(text[:cut]) > max_chars:
+        cut -= prompt_chars(text[:cut]) - max_chars
+    return cut
+
+
+def _units(text: str, max_chars: int) -> list:
+    """Sentences (with their trailing separator), none longer than max_chars once sanitized."""
+    units = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        sentences = [s for s in re.split(r"(?<=[.!?;:])\s+", paragraph.strip()) if s]
+        for i, sentence in enumerate(sentences):
+            sep = "\n\n" if i == len(sentences) - 1 else " "
+            while prompt_chars(sentence) > max_chars:
+                limit = _fit(sentence, max_chars - 1)  # room for the trailing space
+                cut = sentence.rfind(" ", 0, limit)
+                cut = cut if cut > limit // 2 else limit
+                units.append(sentence[:cut] + " ")
+                sentence = sentence[cut:].lstrip()
+            units.append(sentence + sep)
+    return units
+
+
+def _is_boundary(unit: str) -> bool:
+    digest = hashlib.sha1(unit.strip().encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % BOUNDARY_EVERY == 0
+
+
+def split_chunks(text: str, max_chars: int) -> list:
+    """Split text into chunks of at most max_chars (sanitized) with content-defined (edit-stable) boundaries."""
+    chunks, current, size = [], [], 0
+    for unit in _units(text, max_chars):
+        if current and size + prompt_chars(unit) > max_chars:
+            chunks.append("".join(current).strip())
+            current, size = [], 0
+        current.append(unit)
+        size += prompt_chars(unit)
+        if size >= max_chars // 2 and _is_boundary(unit):
+            chunks.append("".join(current).strip())
+            current, size = [], 0
+    if current:
+        chunks.append("".join(current).strip())
+    return [c for c in chunks if c]
+
+
+def _group(notes: list, max_chars: int) -> list:
+    """Consecutive groups of notes whose combined (sanitized) length fits max_chars."""
+    groups, current, size = [], [], 0
+    for note in notes:
+        if current and size + prompt_chars(note) > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(note)
+        size += prompt_chars(note)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _format_notes(notes: list, budget: int) -> str:
+    per_note = max(200, budget // max(1, len(notes)) - 20)  # 20 chars for the excerpt label
+    return "\n\n".join(f"[Excerpt {i + 1}]\n{note[:_fit(note, per_note)]}" for i, note in enumerate(notes))
+
+
+async def run_long_document(text: str, system_prompt: str, context: str = "", module: str = None,
+                            on_partial=None) -> str:
+    """
+    Map-reduce generation over a document too long for one prompt.
+    `context` (title, description, requirements...) is sent with every chunk;
+    the final reduce is streamed to `on_partial` like a normal generation.
+    """
+    started = time.perf_counter()
+    budget = max(MIN_CHUNK_CHARS, PROMPT_CHAR_LIMIT - prompt_chars(context) - 200)
+    chunks = split_chunks(text, min(LONGDOC_CHUNK_TOKENS * 4, budget))
+    print(f"[LongDoc] {module or 'default'}: {len(text)} chars -> {len(chunks)} chunks")
+
+    # Map: chunk notes are always cached (in chunk_cache), so unchanged chunks are free on re-runs
+    map_system = f"{system_prompt}\n\n{MAP_INSTRUCTION}"
+    notes = await asyncio.gather(*[
+        run_vertex_async(f"{context}\n\nDocument excerpt:\n{chunk}", system_prompt=map_system, module=module, cache=True,
+                         priority=BULK, prompt_cache=chunk_cache)
+        for chunk in chunks
+    ])
+    notes = [n for n in notes if n]
+
+    # Combine rounds until all notes fit in one reduce prompt
+    combine_system = f"{system_prompt}\n\n{COMBINE_INSTRUCTION}"
+    rounds = 0
+    while len(notes) > 1 and sum(prompt_chars(n) for n in notes) > budget:
+        groups = _group(notes, budget)
+        if len(groups) == len(notes):  # every note fills a prompt on its own; reduce truncates them
+            break
+        notes = await asyncio.gather(*[
+            run_vertex_async(f"{context}\n\n{_format_notes(group, budget)}", system_prompt=combine_system,
+                             module=module, cache=True, priority=BULK)
+            for group in groups
+        ])
+        rounds += 1
+
+    result = await run_vertex_async(
+        f"{context}\n\nNotes by excerpt:\n\n{_format_notes(notes, budget)}",
+        system_prompt=f"{system_prompt}\n\n{REDUCE_INSTRUCTION}",
+        module=module,
+        on_partial=on_partial,
+    )
+    print(f"[LongDoc] {module or 'default'}: {len(chunks)} chunks, {rounds} combine round(s), "
+          f"{(time.perf_counter() - started):.1f}s (~{estimate_tokens(text)} input tokens)")
+    return result
@@ -0,0 +1,107 @@
+import os
+import re
+
+from .utils import PROMPT_CHAR_LIMIT
+from .llm_scheduler import estimate_tokens
+
+# ----------------------------
+# Prompt Assembly with a Token Budget
+# ----------------------------
+# Agent prompts are built from labelled fields. Structured values (dicts,
+# lists) are rendered as compact "key: value" text without empty entries,
+# then the token budget is handed out by field priority: each field gets up
+# to its own cap, in priority order, until the budget is spent. Fields that
+# do not fit are cut at a word boundary, so the prompt never reaches the
+# blind PROMPT_CHAR_LIMIT truncation in sanitize_prompt.
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", PROMPT_CHAR_LIMIT // 4 - 50))
+TRUNCATION_MARK = " [...]"
+TRUNCATION_MARK_TOKENS = estimate_tokens(TRUNCATION_MARK)
+
+
+class PromptField:
+    """One labelled prompt field. Lower priority values are served first; max_tokens caps the field."""
+
+    def __init__(self, label: str, value, priority: int = 0, max_tokens: int = None):
+        self.label = label
+        self.value = value
+        self.priority = priority
+        self.max_tokens = max_tokens
+
+
+def compact(value) -> str:
+    """Render a value as short plain text: empty entries dropped, whitespace collapsed, no JSON punctuation."""
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        items = []
+        for key, item in value.items():
+            text = compact(item)
+            if text:
+                items.append(f"{key}: ({text})" if isinstance(item, dict) else f"{key}: {text}")
+        return "; ".join(items)
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(text for text in (compact(item) for item in value) if text)
+    return " ".join(str(value).split())
+
+
+def squeeze(text: str) -> str:
+    """Collapse runs of spaces and blank lines in free text, keeping paragraph breaks."""
+    text = re.sub(r"[ \t\r\f\v]+", " ", text or "")
+    return re.sub(r"\n\s*\n\s*", "\n\n", text).strip()
+
+
+def truncate_tokens(text: str, tokens: int) -> str:
+    """Cut text (at a word boundary) so that it plus TRUNCATION_MARK fits in `tokens` estimated tokens."""
+    limit = max(0, (tokens - TRUNCATION_MARK_TOKENS) * 4)
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit] + TRUNCATION_MARK
+
+
+def build_prompt(fields: list, budget: int = PROMPT_TOKEN_BUDGET):
+    """
+    Returns (prompt, report). Fields keep their given order in the prompt;
+    empty fields are left out. The report has per-field requested/used
+    tokens and whether the field was truncated.
+    """
+    rendered = []
+    for field in fields:
+        text = squeeze(field.value) if isinstance(field.value, str) else compact(field.value)
+        if text:
+            rendered.append((field, text))
+
+    remaining = budget - sum(estimate_tokens(f"{field.label}: \n") for field, _ in rendered)
+    allowed = {}
+    for field, text in sorted(rendered, key=lambda item: item[0].priority):
+        want = estimate_tokens(text)
+        if field.max_tokens:
+            want = min(want, field.max_tokens)
+        allowed[field.label] = max(0, min(want, remaining))
+        remaining -= allowed[field.label]
+
+    lines, report = [], {"budget": budget, "total": 0, "fields": {}}
+    for field, text in rendered:
+        requested, allowance = estimate_tokens(text), allowed[field.label]
+        if allowance >= requested:
+            used_text = text
+        else:
+            used_text = truncate_tokens(text, allowance) if allowance > TRUNCATION_MARK_TOKENS else ""
+        used = estimate_tokens(used_text) if used_text else 0
+        report["fields"][field.label] = {"requested": requested, "tokens": used, "truncated": used_text != text}
+        if used_text:
+            report["total"] += used + estimate_tokens(f"{field.label}: \n")
+            lines.append(f"{field.label}: {used_text}")
+    return "\n".join(lines), report
+
+
+def format_report(report: dict) -> str:
+    """One-line summary, e.g. '512/1700 tokens (Title 4, Metadata 80/200 truncated)'."""
+    parts = []
+    for label, usage in report["fields"].items():
+        if usage["truncated"]:
+            parts.append(f"{label} {usage['tokens']}/{usage['requested']} truncated")
+        else:
+            parts.append(f"{label} {usage['tokens']}")
+    return f"{report['total']}/{report['budget']} tokens ({', '.join(parts)})"
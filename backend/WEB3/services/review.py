@@ -1,7 +1,9 @@
 import asyncio
 from .utils import run_vertex_async
+from .longdoc import needs_map_reduce, run_long_document
+from .prompts import PromptField, build_prompt, format_report
 
-async def process(payload: dict):
+async def process(payload: dict, on_partial=None):
     """
     AI-powered review of uploaded legal document.
     Identify errors, inconsistencies, and suggest improvements.
@@ -14,17 +16,25 @@ async def process(payload: dict):
         "inconsistencies, missing clauses, and suggest improvements."
     )
 
-    user_msg = (
-        f"Document title: {payload.get('title', '')}\n"
-        f"Description: {payload.get('description', '')}\n"
-        f"File URL: {payload.get('file_url', '')}\n"
-        f"Requirements: {payload.get('requirements', {})}\n"
-        f"Extracted Text: {payload.get('extracted_text', '')}\n" 
-        f"Metadata: {payload.get('metadata', {})}"
-    )
-
+    # Prompt fields by budget priority: extracted text gets whatever the others leave
+    extracted_text = payload.get('extracted_text', '') or ''
+    context_fields = [
+        PromptField("Document title", payload.get("title", ""), priority=0, max_tokens=64),
+        PromptField("Description", payload.get("description", ""), priority=1, max_tokens=256),
+        PromptField("Requirements", payload.get("requirements", {}), priority=2, max_tokens=256),
+        PromptField("Metadata", payload.get("metadata", {}), priority=3, max_tokens=192),
+        PromptField("File URL", payload.get("file_url", ""), priority=5, max_tokens=64),
+    ]
+    user_msg, report = build_prompt(context_fields + [PromptField("Extracted Text", extracted_text, priority=4)])
 
-    generated_text = await run_vertex_async(user_msg, system_prompt=system_msg)
+    # Documents that do not fit the prompt budget are reviewed chunk by chunk instead of being truncated
+    if needs_map_reduce(user_msg, report, "Extracted Text"):
+        context, report = build_prompt(context_fields)
+        print(f"[Agent Review] Context prompt: {format_report(report)}")
+        generated_text = await run_long_document(extracted_text, system_msg, context, module="review", on_partial=on_partial)
+    else:
+        print(f"[Agent Review] Prompt: {format_report(report)}")
+        generated_text = await run_vertex_async(user_msg, system_prompt=system_msg, module="review", on_partial=on_partial)
     print(f"[Agent Review Output] {generated_text[:500]}{'...' if len(generated_text) > 500 else ''}")
 
     result = {
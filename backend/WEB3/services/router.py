@@ -1,5 +1,6 @@
 # services/router.py
 import os
+import time
 import asyncio
 import httpx
 import hashlib
@@ -10,6 +11,7 @@ from fastapi.responses import JSONResponse
 from fastapi import Body, HTTPException  # Need to make sure these are imported at the top
 
 from services import lens, draft, review, docs
+from services.utils import llm_cache, chunk_cache, llm_scheduler, llm_metrics
 from services.integrations import story, icp, dag  
 
 router = APIRouter()
@@ -24,6 +26,61 @@ DJANGO_CALLBACK_URL = os.getenv(
 # -----------------------------
 ICP_ENABLED = False
 
+# Partial generated_text pushed to Django while Gemini is still streaming. Off by default:
+# the callback saves the Document, and every save re-runs its post_save Story push.
+PROGRESS_ENABLED = os.getenv("AGENT_PROGRESS_ENABLED", "false").lower() in ["1", "true", "yes"]
+PROGRESS_INTERVAL_SECONDS = float(os.getenv("AGENT_PROGRESS_INTERVAL_SECONDS", 1.0))
+
+
+class ProgressReporter:
+    """
+    on_partial callback for streamed generation: posts the latest partial text
+    to the Django callback with status "processing", at most once per
+    `interval` seconds (the first chunk goes out immediately).
+    """
+
+    def __init__(self, document_id, interval: float = PROGRESS_INTERVAL_SECONDS):
+        self.document_id = document_id
+        self.interval = interval
+        self.pushes = 0
+        self._latest = None
+        self._sent_at = 0.0
+        self._posting = False
+        self._task = None
+
+    def __call__(self, text: str):
+        self._latest = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._push())
+
+    async def _push(self):
+        wait = self._sent_at + self.interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._posting = True
+        self._sent_at = time.monotonic()
+        payload = {"document_id": self.document_id, "status": "processing", "generated_text": self._latest}
+        try:
+            async with httpx.AsyncClient() as client:
+                resp = await client.post(DJANGO_CALLBACK_URL, json=payload, timeout=10)
+                resp.raise_for_status()
+            self.pushes += 1
+        except Exception as e:
+            print(f"[Agent Progress Error] Document {self.document_id}: {e}")
+        finally:
+            self._posting = False
+
+    async def close(self):
+        """Drop a pending push and let one already on the wire finish, so it cannot overtake the final callback."""
+        if self._task is None or self._task.done():
+            return
+        if not self._posting:
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
 # ---------------------------------------------------------
 # AGENT EXECUTION PIPELINE (Lens, Draft, Review)
 # ---------------------------------------------------------
@@ -31,9 +88,10 @@ async def run_and_report(module, payload: dict):
     document_id = payload.get("document_id")
     print(f"[Agent Task] Starting processing for document_id={document_id} using {module.__name__}")
 
-    # 1 Run AI module
+    # 1 Run AI module (streaming partial text to Django while it generates)
+    progress = ProgressReporter(document_id) if PROGRESS_ENABLED and document_id is not None else None
     try:
-        result, generated_text = await module.process(payload)
+        result, generated_text = await module.process(payload, on_partial=progress)
         status_value = "completed"
         print(f"[Agent Task] AI module completed for document_id={document_id}")
     except Exception as e:
@@ -41,6 +99,9 @@ async def run_and_report(module, payload: dict):
         generated_text = ""
         status_value = "failed"
         print(f"[Agent Task] AI module failed for document_id={document_id}: {e}")
+    finally:
+        if progress is not None:
+            await progress.close()
 
     # 2 Register with Story / ICP / DAG (only when generated_text exists)
     story_id = icp_id = dag_id = ipfs_cid = None
@@ -133,6 +194,18 @@ async def run_docs(payload: dict, background_tasks: BackgroundTasks):
     return {"message": "HakiDocs push started (metadata + hashes only)."}
 
 
+# ---------------------------------------------------------
+# LLM CACHE + SCHEDULER + CALL STATS
+# ---------------------------------------------------------
+@router.get("/llm/stats")
+async def llm_stats():
+    """Prompt/response cache hit rates, Gemini queue depth, in-flight calls, wait times and per-module call metrics."""
+    return {
+        "cache": llm_cache.stats(), "longdoc_chunk_cache": chunk_cache.stats(),
+        "scheduler": llm_scheduler.stats(), "calls": llm_metrics.stats(),
+    }
+
+
 # ---------------------------------------------------------
 # AGENT NOTIFY HANDLER (safe + resilient)
 # ---------------------------------------------------------
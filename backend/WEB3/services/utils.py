@@ -1,122 +1,234 @@
 import os
+import time
 import asyncio
+from types import SimpleNamespace
 from pathlib import Path
-from vertexai import init as vertex_init
-from vertexai.generative_models import GenerativeModel, HarmCategory, HarmBlockThreshold
+from concurrent.futures import ThreadPoolExecutor
+from .llm import get_llm_backend
+from .llm_cache import PromptCache, prompt_key
+from .llm_scheduler import LLMScheduler, INTERACTIVE, estimate_tokens
+from .llm_metrics import LLMMetrics, LLM_METRICS_FILE, LLM_METRICS_DIR
 
-
-"""
 # ----------------------------
-#  Setup Local dev GCP Credentials
+#  LLM Backend
 # ----------------------------
-SA_PATH = Path(r"C:/Users/hp/Desktop/agents/central-accord-475812-g4-6d21ba7b0230.json")
-
-if not SA_PATH.exists():
-    raise RuntimeError(f" Service account JSON not found at {SA_PATH}")
-
-# Set environment for Vertex AI
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(SA_PATH)
-print(f" Using service account: {SA_PATH}")
+# Gemini on Vertex AI by default (credentials and vertexai.init on the first
+# call, not at import); LLM_BACKEND=local selects the offline mock in
+# services/llm.py, so the app starts and can be load-tested without GCP.
 
-"""
 # ----------------------------
-#  Setup GCP Credentials (Render-friendly)
+#  Generation Config
 # ----------------------------
-# Prefer secret mounted on Render
-SA_PATH = Path("/etc/secrets/gcp_sa.json")
-if SA_PATH.exists():
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(SA_PATH)
-else:
-    # fallback to local dev
-    SA_PATH = Path(r"C:/Users/hp/Desktop/agents/central-accord-475812-g4-6d21ba7b0230.json")
-    if not SA_PATH.exists():
-        raise RuntimeError(f"Service account JSON not found at {SA_PATH}")
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(SA_PATH)
-
-# Normalize Windows paths (already done above, redundant but safe)
-GOOGLE_APPLICATION_CREDENTIALS = os.environ["GOOGLE_APPLICATION_CREDENTIALS"].replace("\\", "/")
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_APPLICATION_CREDENTIALS
+generation_config = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "max_output_tokens": 8192,
+}
 
 # ----------------------------
-#  Vertex AI Initialization
+#  Prompt/Response Cache
 # ----------------------------
-GCP_PROJECT_ID = "central-accord-475812-g4"
-GCP_LOCATION = "us-central1"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 512))  # 0 disables the cache
+LLM_CACHE_DISK = os.getenv("LLM_CACHE_DISK", "true").lower() in ["1", "true", "yes"]
+LLM_CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", Path(__file__).resolve().parent / "data" / "llm_cache"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 86400))
+# Disk tier size, split evenly between the prompt and chunk-note caches, and how often each is swept
+LLM_CACHE_MAX_DISK_MB = float(os.getenv("LLM_CACHE_MAX_DISK_MB", 512))  # 0 = unbounded
+LLM_CACHE_SWEEP_SECONDS = float(os.getenv("LLM_CACHE_SWEEP_SECONDS", 600))  # 0 = never
+# Modules that always get a fresh generation (drafts should not repeat verbatim)
+LLM_CACHE_BYPASS = {m.strip() for m in os.getenv("LLM_CACHE_BYPASS", "draft").split(",") if m.strip()}
 
-try:
-    vertex_init(project=GCP_PROJECT_ID, location=GCP_LOCATION)
-    print(f" Vertex AI initialized for project {GCP_PROJECT_ID} at {GCP_LOCATION}")
-except Exception as e:
-    raise RuntimeError(f" Vertex AI init failed: {e}")
+llm_cache = PromptCache(
+    LLM_CACHE_SIZE, LLM_CACHE_DIR if LLM_CACHE_DISK else None, LLM_CACHE_TTL_SECONDS,
+    max_disk_bytes=int(LLM_CACHE_MAX_DISK_MB * 2**20 / 2), sweep_seconds=LLM_CACHE_SWEEP_SECONDS,
+)
 
-# ----------------------------
-#  Load Gemini Model
-# ----------------------------
-try:
-    model = GenerativeModel("gemini-2.5-flash")
-    print("✅ Gemini 2.5 Flash model loaded")
-except Exception as e:
-    raise RuntimeError(f" Failed to load Gemini 2.5 Flash: {e}")
+# Map-step notes of long documents (services.longdoc) have their own cache and
+# TTL: notes on a chunk stay valid for as long as the chunk text is unchanged.
+LONGDOC_CHUNK_CACHE_SIZE = int(os.getenv("LONGDOC_CHUNK_CACHE_SIZE", 2048))
+LONGDOC_CHUNK_CACHE_TTL_SECONDS = float(os.getenv("LONGDOC_CHUNK_CACHE_TTL_SECONDS", 7 * 86400))
+
+chunk_cache = PromptCache(
+    LONGDOC_CHUNK_CACHE_SIZE, LLM_CACHE_DIR / "longdoc_chunks" if LLM_CACHE_DISK else None,
+    LONGDOC_CHUNK_CACHE_TTL_SECONDS,
+    max_disk_bytes=int(LLM_CACHE_MAX_DISK_MB * 2**20 / 2), sweep_seconds=LLM_CACHE_SWEEP_SECONDS,
+)
 
 # ----------------------------
-#  Safety Settings
+#  Call Scheduling (concurrency, quota budget, priorities)
 # ----------------------------
-safety_settings = {
-    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-}
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", 4))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 0))  # 0 = unlimited
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", 0))      # 0 = unlimited
+# Interactive agents are scheduled ahead of bulk jobs (docs / repository indexing)
+LLM_INTERACTIVE_MODULES = [m.strip() for m in os.getenv("LLM_INTERACTIVE_MODULES", "lens,draft,review").split(",") if m.strip()]
+LLM_QUOTA_RETRIES = int(os.getenv("LLM_QUOTA_RETRIES", 3))
+LLM_QUOTA_BACKOFF_SECONDS = float(os.getenv("LLM_QUOTA_BACKOFF_SECONDS", 2))
+
+# Gemini calls get their own threads instead of the default pool shared with everything else
+llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_IN_FLIGHT, thread_name_prefix="gemini")
+llm_scheduler = LLMScheduler(
+    LLM_MAX_IN_FLIGHT, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE,
+    priorities={m: INTERACTIVE for m in LLM_INTERACTIVE_MODULES},
+)
 
 # ----------------------------
-#  Generation Config
+#  Per-Call Metrics (histograms for /metrics + rolling JSONL in LLM_METRICS_DIR)
 # ----------------------------
-generation_config = {
-    "temperature": 0.7,
-    "top_p": 0.9,
-    "max_output_tokens": 8192,
-}
+llm_metrics = LLMMetrics(LLM_METRICS_DIR if LLM_METRICS_FILE else None)
 
 # ----------------------------
 #  Prompt Utilities
 # ----------------------------
+PROMPT_CHAR_LIMIT = 7000  # longer prompts are truncated; long documents go through services.longdoc
+
+
 def sanitize_prompt(prompt: str) -> str:
     """Sanitize long prompts to reduce model blocking and improve JSON parsing."""
-    if len(prompt) > 7000:
-        prompt = prompt[:7000] + "\n\n[...truncated large data...]"
+    if len(prompt) > PROMPT_CHAR_LIMIT:
+        prompt = prompt[:PROMPT_CHAR_LIMIT] + "\n\n[...truncated large data...]"
     prompt = prompt.replace("{", "\n{").replace("}", "}\n")
     return prompt
 
+
+def prompt_chars(text: str) -> int:
+    """Length of `text` after sanitize_prompt's brace escaping (one extra newline per brace)."""
+    return len(text) + text.count("{") + text.count("}")
+
+
+def is_quota_error(e: Exception) -> bool:
+    """Vertex quota / rate-limit rejection (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    return type(e).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in str(e)
+
+
+def chunk_text(chunk) -> str:
+    """Text of one streamed chunk ('' for blocked / candidate-less chunks)."""
+    try:
+        return chunk.text or ""
+    except (ValueError, AttributeError):
+        return ""
+
+
+def response_tokens(response) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    count = getattr(usage, "candidates_token_count", None)
+    return count if isinstance(count, int) else estimate_tokens(getattr(response, "text", "") or "")
+
+
+def prompt_tokens(response, prompt: str) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    count = getattr(usage, "prompt_token_count", None)
+    return count if isinstance(count, int) else estimate_tokens(prompt)
+
+
+async def generate_scheduled(generate_sync, prompt: str, module: str = None, call: dict = None,
+                             priority: int = None):
+    """
+    Run one blocking Gemini call under `llm_scheduler`. Prompt tokens are
+    paid up front, output tokens after the call. Quota rejections are
+    retried with exponential backoff instead of failing the document.
+    Queue wait, model time, attempts and retry reasons are added to `call`.
+    `priority` overrides the module's scheduler tier.
+    """
+    call = call if call is not None else {}
+    loop = asyncio.get_running_loop()
+    for attempt in range(LLM_QUOTA_RETRIES + 1):
+        waited_ms = await llm_scheduler.acquire(module, estimate_tokens(prompt), priority)
+        call["queue_ms"] = call.get("queue_ms", 0) + waited_ms
+        call["attempts"] = call.get("attempts", 0) + 1
+        used = 0
+        started = time.perf_counter()
+        try:
+            response = await loop.run_in_executor(llm_executor, generate_sync, prompt)
+            used = response_tokens(response)
+            call["prompt_tokens"] = call.get("prompt_tokens", 0) + prompt_tokens(response, prompt)
+            call["response_tokens"] = call.get("response_tokens", 0) + used
+            return response
+        except Exception as e:
+            if attempt == LLM_QUOTA_RETRIES or not is_quota_error(e):
+                raise
+            call.setdefault("retries", []).append("quota")
+            delay = LLM_QUOTA_BACKOFF_SECONDS * 2 ** attempt
+            print(f"[Vertex AI] Quota exceeded ({module or 'default'}), retrying in {delay:.0f}s...")
+        finally:
+            call["model_ms"] = call.get("model_ms", 0) + (time.perf_counter() - started) * 1000
+            llm_scheduler.release(used)
+        await asyncio.sleep(delay)
+
 # ----------------------------
 #  Async Vertex AI Query
 # ----------------------------
-async def run_vertex_async(prompt: str, system_prompt: str = None) -> str:
+async def run_vertex_async(prompt: str, system_prompt: str = None, module: str = None, cache: bool = None,
+                           on_partial=None, priority: int = None, prompt_cache: PromptCache = None) -> str:
     """
     Generate text asynchronously with Gemini 2.5 Flash.
     Combines system instructions with user prompt, retries with fallback if blocked or empty.
+    Identical requests are answered from `llm_cache` unless `cache` is False or
+    `module` is listed in LLM_CACHE_BYPASS.
+    With `on_partial`, the response is streamed and `on_partial(text_so_far)`
+    is called on the event loop after every chunk.
+    `priority` (INTERACTIVE / BULK) overrides the module's scheduler tier.
+    `prompt_cache` replaces `llm_cache` for this call (e.g. `chunk_cache`).
+    Every call is recorded in `llm_metrics` (module, cache hit, queue wait,
+    model time, tokens, retries with their reason, error).
     """
+    started = time.perf_counter()
+    sanitized = sanitize_prompt(prompt)
     full_prompt = ""
     if system_prompt:
         full_prompt += f"System instruction: {system_prompt}\n\n"
-    full_prompt += sanitize_prompt(prompt)
-
-    print("[Vertex AI] Sending prompt to Gemini 2.5 Flash...")
+    full_prompt += sanitized
+
+    if cache is None:
+        cache = module not in LLM_CACHE_BYPASS
+    prompt_cache = prompt_cache or llm_cache
+    backend = get_llm_backend()
+    call = {"module": module or "default", "model": backend.model_name, "cache_hit": False,
+            "stream": on_partial is not None, "attempts": 0, "retries": [], "queue_ms": 0.0,
+            "model_ms": 0.0, "prompt_tokens": 0, "response_tokens": 0}
+    key = prompt_key(backend.model_name, generation_config, system_prompt, sanitized)
+    if not cache:
+        prompt_cache.bypass(module)
+    else:
+        cached = prompt_cache.get(key, module)
+        if cached is not None:
+            print(f"[Vertex AI] Cache hit ({module or 'default'}), skipping Gemini call.")
+            call.update(cache_hit=True, total_ms=round((time.perf_counter() - started) * 1000, 2))
+            llm_metrics.record(call)
+            return cached
+
+    print(f"[Vertex AI] Sending prompt to {backend.model_name}...")
 
     def generate_sync(p):
-        return model.generate_content(
-            [p],
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
+        return backend.generate(p, generation_config)
+
+    loop = asyncio.get_running_loop()
+
+    def stream_sync(p):
+        parts, usage = [], None
+        stream_started = time.perf_counter()
+        for chunk in backend.stream(p, generation_config):
+            piece = chunk_text(chunk)
+            if piece:
+                if not parts:
+                    call["first_chunk_ms"] = round((time.perf_counter() - stream_started) * 1000, 2)
+                parts.append(piece)
+                loop.call_soon_threadsafe(on_partial, "".join(parts))
+            usage = getattr(chunk, "usage_metadata", None) or usage
+        return SimpleNamespace(text="".join(parts), usage_metadata=usage)
 
     try:
-        response = await asyncio.to_thread(generate_sync, full_prompt)
+        response = await generate_scheduled(stream_sync if on_partial else generate_sync, full_prompt, module, call,
+                                            priority)
         text = getattr(response, "text", "").strip()
+        if text and cache:
+            prompt_cache.put(key, text)
 
         if not text:
             print("[Vertex AI Warning] Response empty, retrying with short summary...")
+            call["retries"].append("empty_response")
             short_prompt = "Summarize the input briefly in plain English.\n\n" + full_prompt[:4000]
-            response = await asyncio.to_thread(generate_sync, short_prompt)
+            response = await generate_scheduled(generate_sync, short_prompt, module, call, priority)
             text = getattr(response, "text", "(empty Gemini response)").strip()
 
         print("[Vertex AI] Response received.")
@@ -124,11 +236,19 @@ async def run_vertex_async(prompt: str, system_prompt: str = None) -> str:
 
     except Exception as e:
         print(f"[Vertex AI Error] Failed to generate content: {e}")
+        call["error"] = type(e).__name__
         raise
 
+    finally:
+        call["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        call["queue_ms"] = round(call["queue_ms"], 2)
+        call["model_ms"] = round(call["model_ms"], 2)
+        llm_metrics.record(call)
+
 # ----------------------------
 #  Model Getter
 # ----------------------------
 def get_vertex_model():
-    """Return the initialized Gemini model instance."""
-    return model
+    """Return the configured backend's model (the Gemini GenerativeModel on Vertex)."""
+    backend = get_llm_backend()
+    return getattr(backend, "model", backend)
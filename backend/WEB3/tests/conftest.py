@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Offline backends and a throwaway data directory, set before any service module is imported
+DATA_DIR = tempfile.mkdtemp(prefix="web3-tests-")
+os.environ.setdefault("EMBEDDING_BACKEND", "local")
+os.environ.setdefault("LOCAL_EMBEDDING_DIM", "256")
+os.environ.setdefault("LLM_BACKEND", "local")
+os.environ.setdefault("LOCAL_LLM_LATENCY_MS", "0")
+os.environ.setdefault("LOCAL_LLM_CHUNK_MS", "0")
+os.environ.setdefault("DETECT_DATA_DIR", os.path.join(DATA_DIR, "detect"))
+os.environ.setdefault("LLM_CACHE_DIR", os.path.join(DATA_DIR, "llm_cache"))
+os.environ.setdefault("LLM_METRICS_FILE", "false")
+os.environ.setdefault("DETECT_RESULT_CACHE_SIZE", "0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # backend/WEB3
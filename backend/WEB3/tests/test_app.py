@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_lifespan_starts_and_stops_background_work(monkeypatch):
+    flushed = []
+    monkeypatch.setattr(main, "RESCAN_ENABLED", True)
+    monkeypatch.setattr(main, "INTEGRATIONS_WARMUP", False)
+    monkeypatch.setattr(main.index_persister, "flush", lambda: flushed.append(True))
+
+    with TestClient(main.app) as client:
+        assert client.get("/health").status_code == 200
+        assert main.rescan_scheduler.stats()["enabled"] is True
+    assert main.rescan_scheduler.stats()["enabled"] is False
+    assert flushed == [True]
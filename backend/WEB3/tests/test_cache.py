@@ -0,0 +1,32 @@
+import os
+import time
+from services.detect.cache import ResultCache
+
+
+def test_workers_on_different_versions_keep_each_others_entries(tmp_path):
+    old_worker, new_worker = ResultCache(16, tmp_path), ResultCache(16, tmp_path)
+    old_worker.set_version("v1")
+    old_worker.put("k", {"results": ["old"]})
+    new_worker.set_version("v2")
+    new_worker.put("k", {"results": ["new"]})
+
+    assert ResultCache(16, tmp_path).get("k") is None  # no version selected yet
+    reader = ResultCache(16, tmp_path)
+    reader.set_version("v1")
+    assert reader.get("k") == {"results": ["old"]}
+
+
+def test_unused_versions_expire_by_age_and_count(tmp_path):
+    cache = ResultCache(16, tmp_path, version_ttl_seconds=3600, max_versions=3)
+    for version in ("v1", "v2", "v3"):
+        cache.set_version(version)
+        cache.put("k", {"version": version})
+    stale = time.time() - 7200
+    os.utime(tmp_path / "v1", (stale, stale))
+
+    cache.set_version("v4")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["v2", "v3", "v4"]
+    os.utime(tmp_path / "v2", (time.time() - 60,) * 2)
+    cache.set_version("v5")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["v3", "v4", "v5"]
+    assert cache.stats()["expired_versions"] == 2
@@ -0,0 +1,76 @@
+import multiprocessing
+import pytest
+from services.detect.corpus import SuspectStore
+
+ROUNDS = 10
+
+
+def _entries(prefix, n):
+    return [{"url": f"https://{prefix}.example/{i}", "text": f"{prefix} suspect number {i}"} for i in range(n)]
+
+
+def _appender(root, worker, barrier):
+    store = SuspectStore(root)
+    store.refresh()
+    barrier.wait()
+    for i in range(ROUNDS):
+        store.append(_entries(f"w{worker}-r{i}", 2))
+
+
+def test_concurrent_appends_from_several_processes_are_all_kept(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(4)
+    workers = [ctx.Process(target=_appender, args=(tmp_path, w, barrier)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+
+    store = SuspectStore(tmp_path)
+    status = store.status()
+    assert status["suspects"] == 4 * ROUNDS * 2
+    assert status["segments"] == status["version"] == 4 * ROUNDS
+    files = [s["file"] for s in store._manifest["segments"]]
+    assert len(set(files)) == len(files)
+
+
+def test_instances_pick_up_each_others_segments(tmp_path):
+    server, cli = SuspectStore(tmp_path), SuspectStore(tmp_path)
+    server.refresh()
+    cli.refresh()
+    server.append(_entries("server", 3))
+    cli.append(_entries("cli", 2))
+    server.refresh()
+    assert len(server) == 5
+    assert [s["version"] for s in server._manifest["segments"]] == [1, 2]
+
+
+def test_rollback_before_compaction_is_refused(tmp_path):
+    store = SuspectStore(tmp_path)
+    for i in range(3):
+        store.append(_entries(f"batch{i}", 2))
+    assert store.compact()["segments_after"] == 1
+    compacted_from = store.compacted_from
+    assert compacted_from == 3
+
+    with pytest.raises(ValueError, match="compacted"):
+        store.rollback(2)
+    assert len(store) == 6
+
+    store.append(_entries("after", 1))
+    assert store.rollback(compacted_from) == 1
+    assert len(store) == 6
+    reader = SuspectStore(tmp_path)
+    reader.refresh()
+    assert len(reader) == 6
+
+
+def test_removing_many_suspects_applies_tombstones(tmp_path):
+    store = SuspectStore(tmp_path)
+    store.append(_entries("bulk", 50))
+    doomed = [s["id"] for s in store.suspects[::2]]
+    assert store.remove(doomed) == 25
+    assert len(store) == 25
+    assert not set(doomed) & {s["id"] for s in store.suspects}
+    assert [s["url"] for s in store.suspects] == [f"https://bulk.example/{i}" for i in range(1, 50, 2)]
@@ -0,0 +1,169 @@
+import pytest
+from services.detect import detect
+
+ORIGINAL = (
+    "The licensee shall indemnify and hold harmless the licensor against every claim arising "
+    "from unauthorised distribution of the licensed works within the territory"
+)
+NEAR_COPY = ORIGINAL.replace("unauthorised distribution", "unauthorised publication")
+SUSPECTS = [
+    {"url": "https://a.com", "text": ORIGINAL},
+    {"url": "https://c.com/3", "text": NEAR_COPY},
+    {"url": "https://d.com", "text": "Quarterly rainfall figures for the northern highlands and coastal plains"},
+    {"url": "https://e.com", "text": "A recipe for slow cooked beans with onions, garlic and smoked paprika"},
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def corpus():
+    detect.ingest_suspects(SUSPECTS)
+
+
+def _by_url(results):
+    return {r["url"]: r for r in results}
+
+
+def test_exact_copy_does_not_hide_near_copies():
+    results = _by_url(detect.run_detection(ORIGINAL, top_k=3)["results"])
+    # Below the MinHash threshold, so only the embedding search can find it
+    assert "https://c.com/3" in results
+    assert results["https://c.com/3"]["match_type"] == "semantic"
+    assert results["https://a.com"]["match_type"] == "exact"
+    assert results["https://a.com"]["lexical_similarity"] == 1.0
+    assert "lexical_similarity" not in results["https://c.com/3"]
+    assert results["https://c.com/3"]["similarity"] > 0.8
+
+
+def test_similarity_is_always_the_cosine_score():
+    result = _by_url(detect.run_detection(ORIGINAL, top_k=3)["results"])["https://a.com"]
+    assert result["similarity"] < 1.0  # suspect embeddings include the URL
+    assert result["infringement"] == (result["similarity"] > detect.INFRINGEMENT_THRESHOLD)
+
+
+def test_batch_and_stream_agree_with_single_detection():
+    single = detect.run_detection(ORIGINAL, top_k=3)["results"]
+    batch = detect.run_detection_batch([{"registered_text": ORIGINAL}], top_k=3)[0]["results"]
+    summary = [payload for event, payload in detect.iter_detection(ORIGINAL, top_k=3) if event == "summary"][0]
+    assert [r["url"] for r in batch] == [r["url"] for r in single]
+    assert [r["url"] for r in summary["results"]] == [r["url"] for r in single]
+    assert {"https://a.com", "https://c.com/3"} <= {r["url"] for r in single}
+
+
+def test_stream_matches_are_provisional_and_summary_is_final_top_k():
+    events = list(detect.iter_detection(ORIGINAL, top_k=2))
+    matches = [payload for event, payload in events if event == "match"]
+    summary = events[-1][1]["results"]
+    assert all(m["provisional"] for m in matches)
+    assert len(summary) == 2
+    assert [r["similarity"] for r in summary] == sorted((r["similarity"] for r in summary), reverse=True)
+
+
+def test_metadata_filters_tell_apart_suspects_with_identical_text():
+    text = "Exclusive distribution rights for the recorded performances are reserved by the label"
+    detect.ingest_suspects([
+        {"url": "https://ke.example/1", "text": text, "jurisdiction": "KE", "category": "music"},
+        {"url": "https://ng.example/1", "text": text, "jurisdiction": "NG", "category": "film"},
+    ])
+    # Without URLs both suspects share one content key
+    for include_urls in (True, False):
+        for jurisdiction, url in (("KE", "https://ke.example/1"), ("NG", "https://ng.example/1")):
+            results = detect.run_detection(text, include_suspect_urls=include_urls, top_k=5,
+                                           filters={"jurisdiction": [jurisdiction]})["results"]
+            assert [r["url"] for r in results] == [url]
+
+
+def test_appended_segments_update_the_metadata_index_incrementally(monkeypatch):
+    detect.load_corpus()
+    monkeypatch.setattr(detect.MetadataIndex, "sync", lambda *a: pytest.fail("full metadata sync on append"))
+    detect.ingest_suspects([{"url": "https://tz.example", "text": "Fresh suspect text about maritime salvage law",
+                             "jurisdiction": "TZ"}])
+    results = detect.run_detection("maritime salvage law", top_k=5, filters={"jurisdiction": ["tz"]})["results"]
+    assert [r["url"] for r in results] == ["https://tz.example"]
+
+
+def test_ingestion_mid_request_does_not_mix_corpus_versions(monkeypatch):
+    query = "Salvage awards for the rescue of cargo vessels are apportioned among the crews of the salving ships"
+    ingested = []
+
+    class IngestOnFirstLookup(detect.ResultCache):
+        def get(self, key):
+            # Another request ingests a copy of the query right after this one loaded the corpus
+            if not ingested:
+                ingested.append(True)
+                detect.ingest_suspects([{"url": "https://late.example", "text": query}])
+                detect.load_corpus()
+            return super().get(key)
+
+    monkeypatch.setattr(detect, "result_cache", IngestOnFirstLookup(64))
+    first = detect.run_detection(query, top_k=5)["results"]
+    assert "https://late.example" not in {r["url"] for r in first}
+
+    second = detect.run_detection(query, top_k=5)["results"]
+    assert second[0]["url"] == "https://late.example"
+    assert second[0]["match_type"] == "exact"
+
+
+def test_appended_refresh_keeps_indexes_in_memory_and_saves_them_later(monkeypatch):
+    detect.load_corpus()
+    for cls, method in ((detect.LexicalIndex, "load"), (detect.LexicalIndex, "save"),
+                        (detect.MetadataIndex, "load"), (detect.MetadataIndex, "save")):
+        monkeypatch.setattr(cls, method, lambda *a, **k: pytest.fail("index read/written during refresh"))
+    text = "Charter party demurrage accrues once laytime expires at the discharge port"
+    detect.ingest_suspects([{"url": "https://demurrage.example", "text": text, "jurisdiction": "SG"}])
+    results = detect.run_detection(text, top_k=3, filters={"jurisdiction": ["sg"]})["results"]
+    assert results[0]["url"] == "https://demurrage.example"
+    assert results[0]["match_type"] == "exact"
+
+    monkeypatch.undo()
+    assert detect.index_persister.flush()
+    saved = detect.LexicalIndex.load(detect.LEXICAL_INDEX_PATH)
+    assert len(saved) == detect.load_corpus().lexical_size
+    assert detect.MetadataIndex.load(detect.METADATA_INDEX_PATH).fields.keys() == detect.load_corpus().id_positions.keys()
+
+
+@pytest.mark.parametrize("setting, value, engine_type", [
+    ("VECTOR_MODE", "int8", detect.QuantizedEngine),
+    ("DETECT_INDEX", "ivf", detect.IVFIndex),
+])
+def test_quantized_and_ivf_engines_pick_up_appended_suspects(monkeypatch, setting, value, engine_type):
+    monkeypatch.setattr(detect, setting, value)
+    monkeypatch.setitem(detect._corpus, "signature", None)  # full build with the setting
+    before = detect.load_corpus()
+    assert isinstance(before.engine, engine_type)
+    monkeypatch.setattr(engine_type, "__init__", lambda *a, **k: pytest.fail("engine rebuilt on append"))
+
+    text = f"Bills of lading issued under the {value} charter are negotiable documents of title"
+    detect.ingest_suspects([{"url": f"https://{value}.example", "text": text}])
+    after = detect.load_corpus()
+    assert isinstance(after.engine, engine_type)
+    assert len(after.engine) == len(before.engine) + 1
+    assert len(after.keys) == len(before.keys) + 1
+    results = detect.run_detection(text, top_k=3)["results"]
+    assert results[0]["url"] == f"https://{value}.example"
+
+    monkeypatch.undo()
+    detect._corpus["signature"] = None  # back to the exact engine for the other tests
+
+
+@pytest.mark.parametrize("path, index", [
+    ("LEXICAL_INDEX_PATH", "exact"),
+    ("METADATA_INDEX_PATH", "exact"),
+    ("ANN_INDEX_PATH", "ivf"),
+])
+def test_unreadable_persisted_index_is_rebuilt(monkeypatch, path, index):
+    monkeypatch.setattr(detect, "DETECT_INDEX", index)
+    detect.index_persister.flush()
+    getattr(detect, path).parent.mkdir(parents=True, exist_ok=True)
+    getattr(detect, path).write_bytes(b"truncated")
+    monkeypatch.setitem(detect._corpus, "signature", None)
+    monkeypatch.setitem(detect._corpus, "snapshot", None)  # cold start: indexes come from disk
+    results = _by_url(detect.run_detection(ORIGINAL, top_k=3)["results"])
+    assert results["https://a.com"]["match_type"] == "exact"
+
+
+def test_chunked_queries_do_not_grow_the_passage_store():
+    detect.load_passage_index(detect.load_corpus())
+    stored = len(detect.passage_store)
+    query = "An entirely new memorandum on the carriage of perishable goods by air. " * 20
+    detect.run_detection(query, top_k=3, chunked=True)
+    assert len(detect.passage_store) == stored
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from services.embeddings import EmbeddingMicroBatcher
+
+
+def _embed(texts):
+    if any(t == "bad" for t in texts):
+        raise ValueError("bad input")
+    return np.array([[len(t)] for t in texts], dtype=np.float32)
+
+
+def _submit_together(batcher, requests):
+    """Queue every request within the batching window, so they share one batched call."""
+    futures = [batcher.submit(texts) for texts in requests]
+    for future in futures:
+        future.exception(5)
+    assert batcher.stats()["batches"] == 1
+    return futures
+
+
+def test_one_bad_request_fails_only_its_caller():
+    batcher = EmbeddingMicroBatcher(_embed, max_wait_ms=200, max_in_flight=1)
+    futures = _submit_together(batcher, [["a"], ["bb", "ccc"], ["bad"], ["dddd"]])
+
+    assert futures[0].result(5).tolist() == [[1.0]]
+    assert futures[1].result(5).tolist() == [[2.0], [3.0]]
+    with pytest.raises(ValueError, match="bad input"):
+        futures[2].result(5)
+    assert futures[3].result(5).tolist() == [[4.0]]
+    stats = batcher.stats()
+    assert stats["failed_requests"] == 1
+    assert stats["split_retries"] >= 1
+
+
+def test_wrong_row_count_is_an_error_not_a_misassignment():
+    batcher = EmbeddingMicroBatcher(lambda texts: np.zeros((1, 2), dtype=np.float32), max_wait_ms=200)
+    futures = _submit_together(batcher, [["a"], ["b", "c"]])
+    assert futures[0].result(5).shape == (1, 2)
+    with pytest.raises(ValueError, match="returned 1 vectors for 2 texts"):
+        futures[1].result(5)
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.detect.executor import DetectionExecutor, DetectionOverloaded
+
+
+def test_requests_beyond_workers_and_queue_are_rejected_with_a_retry_hint():
+    async def scenario():
+        executor = DetectionExecutor(workers=1, max_queue=1)
+        release = threading.Event()
+        running = executor.submit(release.wait)
+        queued = executor.submit(lambda: "queued")
+        with pytest.raises(DetectionOverloaded) as rejected:
+            executor.submit(lambda: "rejected")
+        release.set()
+        await asyncio.gather(running, queued)
+        assert await executor.run(lambda: "admitted") == "admitted"  # slots are freed again
+        return rejected.value.retry_after, executor.stats()
+
+    retry_after, stats = asyncio.run(scenario())
+    assert retry_after >= 1
+    assert (stats["rejected"], stats["completed"], stats["queued"]) == (1, 3, 0)
+
+
+def test_detect_endpoint_answers_503_with_retry_after_when_overloaded(monkeypatch):
+    async def overloaded(*args, **kwargs):
+        raise DetectionOverloaded(7)
+
+    monkeypatch.setattr(main.detection_executor, "run", overloaded)
+    response = TestClient(main.app).post("/detect", json={
+        "assetId": 1, "title": "Lease", "contentHash": "0x1", "owner": "alice",
+        "metadata": {"description": "A lease"}, "text": "The tenant shall pay rent monthly",
+    })
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
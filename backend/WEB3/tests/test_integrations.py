@@ -0,0 +1,66 @@
+import time
+import asyncio
+import threading
+import pytest
+from services.integrations.registry import IntegrationRegistry
+
+
+def test_clients_are_created_once_on_first_use():
+    created = []
+    registry = IntegrationRegistry()
+
+    def factory():
+        time.sleep(0.05)
+        created.append(object())
+        return created[-1]
+
+    registry.register("story", factory)
+    assert created == [] and registry.stats()["story"]["ready"] is False
+
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(registry.get("story"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and all(c is created[0] for c in clients)
+    assert registry.stats()["story"]["ready"] is True
+    assert registry.stats()["story"]["init_ms"] >= 50
+
+
+def test_failed_init_is_recorded_and_retried_after_the_backoff(monkeypatch):
+    attempts = []
+    registry = IntegrationRegistry(retry_seconds=30)
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("rpc down")
+        return "client"
+
+    registry.register("icp", factory)
+    with pytest.raises(ConnectionError):
+        registry.get("icp")
+    with pytest.raises(RuntimeError, match="icp integration unavailable"):
+        registry.get("icp")  # within the backoff: no new attempt
+    assert len(attempts) == 1
+    assert registry.stats()["icp"]["error"] == "ConnectionError: rpc down"
+
+    later = time.monotonic() + 31
+    monkeypatch.setattr("services.integrations.registry.time.monotonic", lambda: later)
+    assert registry.get("icp") == "client"
+    assert registry.stats()["icp"]["ready"] is True and registry.stats()["icp"]["error"] is None
+
+
+def test_warmup_initializes_everything_concurrently_and_tolerates_failures():
+    registry = IntegrationRegistry()
+    registry.register("llm", lambda: time.sleep(0.2) or "llm")
+    registry.register("embeddings", lambda: time.sleep(0.2) or "embeddings")
+    registry.register("pinata", lambda: 1 / 0)
+
+    started = time.perf_counter()
+    asyncio.run(registry.warmup())
+    assert time.perf_counter() - started < 0.35
+    stats = registry.stats()
+    assert stats["llm"]["ready"] and stats["embeddings"]["ready"]
+    assert not stats["pinata"]["ready"] and stats["pinata"]["error"].startswith("ZeroDivisionError")
@@ -0,0 +1,38 @@
+from collections import Counter
+from services.llm import MockLLMBackend, MockQuotaError
+from services.utils import is_quota_error
+
+
+def _outcome(backend, prompt):
+    try:
+        response = backend.generate(prompt, {"max_output_tokens": 64})
+    except MockQuotaError as e:
+        assert is_quota_error(e)  # retried with backoff like a Vertex 429
+        return "quota"
+    except RuntimeError:
+        return "error"
+    return "ok" if response.text else "empty"
+
+
+def test_mock_backend_fails_and_returns_empty_answers_at_the_configured_rates():
+    backend = MockLLMBackend(latency_ms=0, chunk_ms=0, error_rate=0.2, quota_error_rate=0.1, empty_rate=0.1, seed=7)
+    counts = Counter(_outcome(backend, f"prompt {i}") for i in range(4000))
+    assert backend.calls == 4000
+    for outcome, rate in {"error": 0.2, "quota": 0.1, "empty": 0.1, "ok": 0.6}.items():
+        assert abs(counts[outcome] / 4000 - rate) < 0.03, (outcome, counts)
+
+
+def test_mock_answers_depend_only_on_the_prompt():
+    config = {"max_output_tokens": 50}
+    first = MockLLMBackend(latency_ms=0, chunk_ms=0, chunk_tokens=7, seed=1)
+    second = MockLLMBackend(latency_ms=0, chunk_ms=0, chunk_tokens=7, seed=2)
+    answer = first.generate("Summarise the lease", config)
+    assert answer.text == second.generate("Summarise the lease", config).text
+    assert answer.text != first.generate("Summarise the deed", config).text
+    assert len(answer.text.split()) <= 50 + 2  # max_output_tokens; the "Mock answer <id>:" prefix is one token
+
+    chunks = list(second.stream("Summarise the lease", config))
+    assert "".join(c.text for c in chunks).strip() == answer.text
+    assert all(c.usage_metadata is None for c in chunks[:-1])
+    assert chunks[-1].usage_metadata.candidates_token_count == len(answer.text.split())
+    assert MockLLMBackend(latency_ms=0, chunk_ms=0, empty_rate=1.0).generate("x", config).text == ""
@@ -0,0 +1,62 @@
+import os
+import time
+import asyncio
+from services import llm_cache as llm_cache_module
+from services.llm_cache import PromptCache
+from services.utils import run_vertex_async
+
+
+def test_memory_tier_evicts_the_least_recently_used_entry():
+    cache = PromptCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_in_both_tiers(tmp_path, monkeypatch):
+    cache = PromptCache(max_entries=8, disk_dir=tmp_path, ttl_seconds=60, sweep_seconds=0)
+    cache.put("k", "cached")
+    assert PromptCache(max_entries=8, disk_dir=tmp_path, ttl_seconds=60).get("k") == "cached"  # disk hit
+
+    later = time.time() + 120
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: later)
+    assert cache.get("k") is None  # memory entry expired, then the disk record
+    assert PromptCache(max_entries=8, disk_dir=tmp_path, ttl_seconds=60).get("k") is None
+    assert not list(tmp_path.glob("*/*.json"))
+    assert cache.stats()["expired"] == 2
+
+
+def test_bypassed_modules_skip_the_cache_and_stats_track_hit_rates():
+    cache = PromptCache(max_entries=8)
+
+    async def calls():
+        for _ in range(3):
+            await run_vertex_async("Summarise the lease terms", module="lens", prompt_cache=cache)
+        await run_vertex_async("Summarise the lease terms", module="draft", prompt_cache=cache)
+
+    asyncio.run(calls())
+    stats = cache.stats()
+    assert stats["modules"]["lens"] == {"hits": 2, "misses": 1, "bypassed": 0, "hit_rate": 0.6667}
+    assert stats["modules"]["draft"] == {"hits": 0, "misses": 0, "bypassed": 1, "hit_rate": 0.0}
+    assert (stats["hits"], stats["misses"], stats["bypassed"], stats["stores"]) == (2, 1, 1, 1)
+    assert stats["hit_rate"] == 0.6667
+
+
+def test_disk_sweep_removes_expired_files_then_the_oldest_beyond_the_size_bound(tmp_path):
+    cache = PromptCache(max_entries=8, disk_dir=tmp_path, ttl_seconds=3600, sweep_seconds=0)
+    for i, key in enumerate(["aa1", "bb2", "cc3", "dd4"]):
+        cache.put(key, "x" * 100)
+        age = time.time() - 7200 + i * 2000  # aa1 and bb2 expired, cc3 older than dd4
+        os.utime(cache._disk_path(key), (age, age))
+    (tmp_path / "longdoc_chunks" / "ee").mkdir(parents=True)
+    (tmp_path / "longdoc_chunks" / "ee" / "ee5.json").write_text("{}")  # another cache's file
+
+    cache.max_disk_bytes = cache._disk_path("dd4").stat().st_size
+    assert cache.sweep() == 3
+    assert [p.name for p in tmp_path.glob("*/*.json")] == ["dd4.json"]
+    assert (tmp_path / "longdoc_chunks" / "ee" / "ee5.json").exists()
+    assert cache.stats()["disk_swept"] == 3
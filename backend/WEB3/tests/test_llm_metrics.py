@@ -0,0 +1,47 @@
+import json
+from services.llm_metrics import LLMMetrics, call_cost
+
+
+def test_call_log_is_opened_by_the_first_record_and_flushed_on_close(tmp_path):
+    metrics = LLMMetrics(tmp_path / "llm_metrics")
+    assert not (tmp_path / "llm_metrics").exists()  # nothing happens at construction/import
+
+    metrics.record({"module": "lens", "attempts": 1, "total_ms": 12.0})
+    metrics.close()
+    with open(tmp_path / "llm_metrics" / "llm_calls.jsonl") as f:
+        assert [json.loads(line)["module"] for line in f] == ["lens"]
+
+
+def test_cache_hits_only_count_towards_total_latency_and_retries_are_counted_by_reason():
+    metrics = LLMMetrics()
+    metrics.record({"module": "review", "cache_hit": True, "total_ms": 3.0})
+    metrics.record({"module": "review", "attempts": 3, "retries": ["quota", "quota", "empty_response"],
+                    "queue_ms": 40.0, "model_ms": 900.0, "total_ms": 950.0,
+                    "prompt_tokens": 1000, "response_tokens": 400})
+    metrics.record({"module": "review", "attempts": 1, "error": "boom", "total_ms": 20.0})
+
+    review = metrics.stats()["review"]
+    assert (review["calls"], review["cache_hits"], review["errors"], review["model_attempts"]) == (3, 1, 1, 4)
+    assert review["retries"] == {"quota": 2, "empty_response": 1}
+    assert review["total_ms"]["count"] == 3
+    assert review["model_ms"] == {"count": 1, "avg": 900.0, "p50_le": 1000, "p95_le": 1000}
+    assert review["cost_usd"] == round(call_cost(1000, 400), 6)
+
+
+def test_prometheus_exposition():
+    metrics = LLMMetrics()
+    metrics.record({"module": "lens", "attempts": 2, "retries": ["quota"], "total_ms": 120.0, "model_ms": 80.0})
+    metrics.record({"module": "lens", "cache_hit": True, "total_ms": 5.0})
+    lines = metrics.prometheus({"llm_in_flight": 2}).splitlines()
+
+    assert lines[:2] == ["# TYPE llm_in_flight gauge", "llm_in_flight 2"]
+    assert 'llm_calls_total{module="lens"} 2' in lines
+    assert 'llm_cache_hits_total{module="lens"} 1' in lines
+    assert 'llm_retries_total{module="lens",reason="quota"} 1' in lines
+    # Cumulative buckets: 5 ms falls in le=10, 120 ms in le=250
+    assert 'llm_total_ms_bucket{module="lens",le="10"} 1' in lines
+    assert 'llm_total_ms_bucket{module="lens",le="100"} 1' in lines
+    assert 'llm_total_ms_bucket{module="lens",le="250"} 2' in lines
+    assert 'llm_total_ms_bucket{module="lens",le="+Inf"} 2' in lines
+    assert 'llm_total_ms_sum{module="lens"} 125.0' in lines
+    assert 'llm_model_ms_count{module="lens"} 1' in lines
@@ -0,0 +1,45 @@
+import asyncio
+
+from services import longdoc
+from services.llm_scheduler import LLMScheduler, INTERACTIVE, BULK
+from services.utils import llm_scheduler
+
+
+def test_bulk_override_waits_behind_interactive_calls_of_the_same_module():
+    async def scenario():
+        scheduler = LLMScheduler(max_in_flight=1, priorities={"review": INTERACTIVE})
+        await scheduler.acquire("review")
+        order = []
+
+        async def call(name, priority=None):
+            await scheduler.acquire("review", priority=priority)
+            order.append(name)
+            scheduler.release()
+
+        background = asyncio.create_task(call("map step", BULK))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call("answer"))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == {"interactive": 1, "bulk": 1}
+        scheduler.release()
+        await asyncio.gather(background, interactive)
+        return order
+
+    assert asyncio.run(scenario()) == ["answer", "map step"]
+
+
+def test_long_document_map_steps_run_in_the_bulk_tier(monkeypatch):
+    priorities = []
+    acquire = llm_scheduler.acquire
+
+    async def recording_acquire(module=None, tokens=0, priority=None):
+        priorities.append(llm_scheduler.priority(module) if priority is None else priority)
+        return await acquire(module, tokens, priority)
+
+    monkeypatch.setattr(llm_scheduler, "acquire", recording_acquire)
+    text = " ".join(f"Clause {i} grants the licensee a distinct right number {i}." for i in range(800))
+    asyncio.run(longdoc.run_long_document(text, "Review the contract.", module="review"))
+
+    assert priorities[-1] == INTERACTIVE  # the reduce step answers the user
+    assert set(priorities[:-1]) == {BULK}
+    assert len(priorities) > 2
@@ -0,0 +1,61 @@
+import asyncio
+
+from services import longdoc, utils
+
+# Brace-heavy text with no sentence ends, so chunks are filled to the limit
+JSON_HEAVY = " ".join(f'clause {i} {{{{"fee" {{"amount" {i}}}}}}}' for i in range(1500))
+
+
+def test_chunks_fit_the_limit_after_brace_escaping():
+    for chunk in longdoc.split_chunks(JSON_HEAVY, 2000):
+        assert len(utils.sanitize_prompt(chunk)) <= 2000
+
+
+def test_map_prompts_are_never_truncated_and_use_the_chunk_cache(monkeypatch):
+    sizes = []
+    sanitize = utils.sanitize_prompt
+
+    def recording_sanitize(prompt):
+        sizes.append(utils.prompt_chars(prompt))
+        return sanitize(prompt)
+
+    monkeypatch.setattr(utils, "sanitize_prompt", recording_sanitize)
+    stores = utils.chunk_cache.stats()["stores"]
+    context = 'Requirements: {"format": "notes"}'
+    asyncio.run(longdoc.run_long_document(JSON_HEAVY, "Summarize.", context, module="lens"))
+
+    assert len(sizes) > 2
+    assert max(sizes) <= utils.PROMPT_CHAR_LIMIT
+    assert utils.chunk_cache.stats()["stores"] > stores
+    assert utils.chunk_cache.ttl_seconds == utils.LONGDOC_CHUNK_CACHE_TTL_SECONDS
+
+
+def test_documents_cut_by_the_prompt_budget_go_through_map_reduce(monkeypatch):
+    from services import review
+
+    chunked = []
+
+    async def fake_long_document(text, system_prompt, context, module=None, on_partial=None):
+        chunked.append(text)
+        return "notes"
+
+    async def fake_vertex(prompt, **kwargs):
+        return "answer"
+
+    monkeypatch.setattr(review, "run_long_document", fake_long_document)
+    monkeypatch.setattr(review, "run_vertex_async", fake_vertex)
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda _: sleep(0))
+    words = lambda n, w: " ".join([w] * n)
+    payload = {
+        "title": "Lease", "description": words(200, "context"),
+        "requirements": {"focus": words(200, "clauses")}, "metadata": {"parties": words(150, "tenant")},
+    }
+
+    # Fits 7000 characters, but not the token budget left after the context
+    document = words(450, "covenant")
+    asyncio.run(review.process({**payload, "extracted_text": document}))
+    assert chunked == [document]
+
+    asyncio.run(review.process({**payload, "extracted_text": words(50, "covenant")}))
+    assert len(chunked) == 1
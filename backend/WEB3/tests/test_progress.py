@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from services import router
+from services.router import ProgressReporter
+
+
+@pytest.fixture
+def django(monkeypatch):
+    """Stands in for the Django callback: records partial texts; a post waits while `gate` is set and closed."""
+    callback = SimpleNamespace(texts=[], gate=None)
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+    class Client:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+        async def post(self, url, json, timeout):
+            if callback.gate is not None:
+                await callback.gate.wait()
+            callback.texts.append(json["generated_text"])
+            return Response()
+
+    monkeypatch.setattr(router.httpx, "AsyncClient", Client)
+    return callback
+
+
+def test_partial_pushes_are_throttled_to_the_latest_text(django):
+    async def scenario():
+        reporter = ProgressReporter(1, interval=0.05)
+        reporter("a")
+        await asyncio.sleep(0.01)  # the first chunk goes out right away
+        reporter("ab")
+        reporter("abc")
+        await asyncio.sleep(0.1)
+        return reporter.pushes
+
+    assert asyncio.run(scenario()) == 2
+    assert django.texts == ["a", "abc"]
+
+
+def test_close_drops_a_pending_push(django):
+    async def scenario():
+        reporter = ProgressReporter(1, interval=60)
+        reporter("a")
+        await asyncio.sleep(0.01)
+        reporter("ab")  # throttled: waits for the interval
+        await asyncio.wait_for(reporter.close(), timeout=1)
+
+    asyncio.run(scenario())
+    assert django.texts == ["a"]
+
+
+def test_close_waits_for_a_push_already_on_the_wire(django):
+    async def scenario():
+        django.gate = asyncio.Event()
+        reporter = ProgressReporter(1, interval=60)
+        reporter("a")
+        await asyncio.sleep(0.01)
+        closing = asyncio.create_task(reporter.close())
+        await asyncio.sleep(0.01)
+        assert not closing.done()
+        django.gate.set()
+        await closing
+        django.texts.append("final callback")
+
+    asyncio.run(scenario())
+    assert django.texts == ["a", "final callback"]
+
@@ -0,0 +1,21 @@
+from services.llm_scheduler import estimate_tokens
+from services.prompts import PromptField, build_prompt, truncate_tokens, TRUNCATION_MARK
+
+
+def test_truncated_text_fits_its_token_allowance():
+    text = " ".join(f"word{i}" for i in range(500))
+    for tokens in (3, 5, 10, 64, 200):
+        cut = truncate_tokens(text, tokens)
+        assert cut.endswith(TRUNCATION_MARK)
+        assert estimate_tokens(cut) <= tokens
+
+
+def test_small_allowances_keep_part_of_the_field():
+    prompt, report = build_prompt([
+        PromptField("Title", "A title that fills most of the budget " * 3, priority=0),
+        PromptField("Notes", " ".join(f"note{i}" for i in range(100)), priority=1),
+    ], budget=40)
+    notes = report["fields"]["Notes"]
+    assert notes["truncated"] and 0 < notes["tokens"]
+    assert report["total"] <= report["budget"]
+    assert "Notes: " in prompt
@@ -0,0 +1,35 @@
+import numpy as np
+from services.detect.engine import SimilarityEngine
+from services.detect.quantize import QuantizedEngine
+
+
+def _corpus(n=2000, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=(20, dim))
+    return (base[rng.integers(0, 20, n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def test_slack_is_measured_from_the_quantization_error():
+    vectors = _corpus()
+    assert QuantizedEngine(vectors, mode="float32").rerank_slack < 1e-4
+    int8 = QuantizedEngine(vectors, mode="int8").rerank_slack
+    truncated = QuantizedEngine(vectors, mode="int8", dims=16).rerank_slack
+    assert 0 < int8 < truncated
+    assert QuantizedEngine(vectors, mode="int8", rerank_slack=0.2).rerank_slack == 0.2
+
+
+def test_threshold_search_caps_exact_rerank_without_losing_hits():
+    vectors = _corpus()
+    fetched = []
+    engine = QuantizedEngine(vectors, mode="int8", rerank_fn=lambda ids: fetched.append(len(ids)) or vectors[ids],
+                             max_rerank=50)
+    query = vectors[0]
+    exact = SimilarityEngine(vectors).search(query, threshold=0.5)
+    hits = engine.search(query, threshold=0.5)
+
+    assert fetched == [50]
+    assert len(exact) > 50
+    assert {i for i, _ in exact} <= {i for i, _ in hits}
+    assert [i for i, _ in hits[:10]] == [i for i, _ in exact[:10]]
+    scores = [score for _, score in hits]
+    assert scores == sorted(scores, reverse=True)  # approximate tail merged in by score
@@ -0,0 +1,33 @@
+from services.detect import detect
+from services.detect.rescan import AssetRegistry, RescanScheduler
+
+ASSET = (
+    "The distributor shall remit quarterly royalties on every licensed copy sold within the territory "
+    "together with a statement of account certified by its auditors"
+)
+
+
+def test_rescan_across_workers_pushes_each_new_match_once(tmp_path):
+    detect.ingest_suspects([{"url": "https://before.example", "text": ASSET}])
+    # Two workers sharing the same rescan directory
+    first = RescanScheduler(AssetRegistry(tmp_path))
+    second = RescanScheduler(AssetRegistry(tmp_path))
+
+    # The corpus present at the first pass was already checked by /detect
+    assert first.scan() == []
+    first.registry.register(7, registered_text=ASSET)
+    assert second.scan() == []
+
+    detect.ingest_suspects([{"url": "https://copy.example", "text": ASSET}])
+    records = second.scan()  # asset registered by the other worker
+    assert [r["document_id"] for r in records] == [7]
+    assert [m["url"] for m in records[0]["matches"]] == ["https://copy.example"]
+    assert first.scan() == []
+
+    # A re-registration with the match already known does not bring it back
+    first.registry.register(7, registered_text=ASSET, matched_urls=["https://copy.example"])
+    detect.ingest_suspects([{"url": "https://other.example", "text": "Minutes of the annual general meeting"}])
+    assert first.scan() == [] and second.scan() == []
+    fresh = AssetRegistry(tmp_path)
+    fresh.refresh()
+    assert fresh.matched[7] == {"https://copy.example"}
@@ -0,0 +1,52 @@
+import os
+import copy
+import subprocess
+import sys
+
+import numpy as np
+
+from services.detect.shards import ShardedEngine
+
+
+def test_builds_of_other_workers_survive(tmp_path):
+    # A live worker (our parent) and one that has exited
+    live = tmp_path / f"build-{os.getppid()}-1"
+    live.mkdir()
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    dead = tmp_path / f"build-{int(exited.stdout)}-1"
+    dead.mkdir()
+
+    vectors = np.random.default_rng(0).normal(size=(20, 8)).astype(np.float32)
+    engines = [ShardedEngine(vectors, tmp_path, shards=2, workers=1) for _ in range(4)]
+
+    assert live.exists()
+    assert not dead.exists()
+    own = sorted(tmp_path.glob(f"build-{os.getpid()}-*"))
+    assert own == [engines[-2].build_dir, engines[-1].build_dir]
+
+
+def test_appends_fill_the_last_shard_before_starting_a_new_one(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(20, 8)).astype(np.float32)
+    engine = ShardedEngine(vectors, tmp_path, shards=2, workers=1, min_shard_rows=1)
+    assert engine.shard_rows == 10
+
+    snapshots = [engine]
+    for size in (3, 4, 5, 9):
+        engine = copy.copy(engine)  # as load_corpus does: older snapshots keep searching their shards
+        new = rng.normal(size=(size, 8)).astype(np.float32)
+        assert list(engine.add(new)) == list(range(len(vectors), len(vectors) + size))
+        vectors = np.concatenate([vectors, new])
+        snapshots.append(engine)
+    assert [rows for _, _, rows in engine.shards] == [10, 10, 10, 10, 1]
+    assert [offset for _, offset, _ in engine.shards] == [0, 10, 20, 30, 40]
+
+    # The previous snapshot's files are still there; the ones replaced two adds earlier are gone
+    assert all(os.path.exists(path) for path, _, _ in snapshots[-2].shards)
+    assert not all(os.path.exists(path) for path, _, _ in snapshots[-4].shards)
+    assert len(list(engine.build_dir.glob("*.npy"))) == 5 + 2  # current shards + the last two replaced ones
+
+    query = vectors[27]
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:3]
+    assert [i for i, _ in engine.search(query, k=3)] == list(expected)
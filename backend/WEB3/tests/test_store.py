@@ -0,0 +1,59 @@
+import multiprocessing
+import numpy as np
+from services.detect.store import EmbeddingStore
+
+DIM = 4
+ROUNDS = 10
+
+
+def _writer(root, worker, barrier, errors):
+    store = EmbeddingStore(root, "test-model")
+    store.load()
+    barrier.wait()
+    for i in range(ROUNDS):
+        key = f"w{worker}-k{i}"
+        store.add([key], np.full((1, DIM), worker * 100 + i, dtype=np.float32))
+        if store.get_many([key])[0][0] != worker * 100 + i:
+            errors.put(key)
+
+
+def test_concurrent_writers_keep_their_own_vectors(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    barrier, errors = ctx.Barrier(4), ctx.Queue()
+    workers = [ctx.Process(target=_writer, args=(tmp_path, w, barrier, errors)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+    assert errors.empty()
+
+    store = EmbeddingStore(tmp_path, "test-model")
+    store.load()
+    assert len(store) == 4 * ROUNDS
+    for w in range(4):
+        keys = [f"w{w}-k{i}" for i in range(ROUNDS)]
+        assert store.get_many(keys)[:, 0].tolist() == [w * 100 + i for i in range(ROUNDS)]
+    files = [seg["file"] for seg in store._manifest["segments"]]
+    assert len(set(files)) == len(files) == 4 * ROUNDS
+
+
+def test_reader_picks_up_segments_from_other_instances(tmp_path):
+    server, cli = EmbeddingStore(tmp_path, "test-model"), EmbeddingStore(tmp_path, "test-model")
+    server.load()
+    cli.add(["k1"], np.ones((1, DIM), dtype=np.float32))
+
+    calls = []
+    vectors = server.ensure(["k1"], ["text"], lambda texts: calls.append(texts) or np.zeros((len(texts), DIM)))
+    assert calls == []
+    assert vectors.tolist() == [[1.0] * DIM]
+
+
+def test_add_skips_keys_stored_by_another_instance(tmp_path):
+    a, b = EmbeddingStore(tmp_path, "test-model"), EmbeddingStore(tmp_path, "test-model")
+    a.load()
+    b.load()
+    a.add(["k1"], np.full((1, DIM), 1, dtype=np.float32))
+    b.add(["k1", "k2"], np.stack([np.full(DIM, 7), np.full(DIM, 2)]).astype(np.float32))
+    assert b.get_many(["k1", "k2"])[:, 0].tolist() == [1.0, 2.0]
+    assert [seg["keys"] for seg in b._manifest["segments"]] == [["k1"], ["k2"]]
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import main
+
+PAYLOAD = {
+    "assetId": 1, "title": "t", "contentHash": "h", "owner": "o", "text": "some text",
+    "metadata": {"description": "", "tags": []},
+}
+
+
+class GoneRequest:
+    """A client that disconnected before reading anything."""
+
+    async def is_disconnected(self):
+        return True
+
+
+def test_disconnect_before_body_frees_the_detection_worker(monkeypatch):
+    stopped = threading.Event()
+
+    def endless(**kwargs):
+        try:
+            while True:
+                yield "match", {"url": "https://x.com", "similarity": 0.9, "infringement": True}
+        finally:
+            stopped.set()
+
+    monkeypatch.setattr(main, "iter_detection", endless)
+    monkeypatch.setattr(main, "STREAM_QUEUE_SIZE", 2)
+    monkeypatch.setattr(main, "STREAM_DISCONNECT_POLL_SECONDS", 0.01)
+
+    async def request_and_leave():
+        response = await main.detect_ip_stream(main.DetectionPayload(**PAYLOAD), GoneRequest())
+        # The body is never iterated
+        for _ in range(200):
+            if stopped.is_set():
+                break
+            await asyncio.sleep(0.05)
+        return response
+
+    asyncio.run(request_and_leave())
+    assert stopped.wait(5)
+
+
+def test_stalled_client_times_out(monkeypatch):
+    stopped = threading.Event()
+
+    def endless(**kwargs):
+        try:
+            while True:
+                yield "match", {"url": "https://x.com", "similarity": 0.9, "infringement": True}
+        finally:
+            stopped.set()
+
+    class StillThere:
+        async def is_disconnected(self):
+            return False
+
+    monkeypatch.setattr(main, "iter_detection", endless)
+    monkeypatch.setattr(main, "STREAM_QUEUE_SIZE", 2)
+    monkeypatch.setattr(main, "STREAM_PUT_TIMEOUT_SECONDS", 0.2)
+
+    async def request_and_stall():
+        await main.detect_ip_stream(main.DetectionPayload(**PAYLOAD), StillThere())
+        for _ in range(100):
+            if stopped.is_set():
+                break
+            await asyncio.sleep(0.05)
+
+    asyncio.run(request_and_stall())
+    assert stopped.wait(5)